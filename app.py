@@ -1,19 +1,351 @@
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, request, render_template, jsonify, g
 import os
+import sys
+import time
+import hashlib
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from operator import itemgetter
 import json
 import re
+import gzip
+import zlib
 import random
+import cProfile
+import contextvars
+import tracemalloc
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.serving import BaseWSGIServer
+from launcher import PooledWSGIServer
+
+try:
+    import resource  # 仅类Unix系统可用，用于统计进程峰值内存
+except ImportError:
+    resource = None
+
+try:
+    import orjson  # 可选依赖：更快的JSON序列化，可直接序列化NumPy数组和标量
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # 可选依赖：brotli响应压缩
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl  # 仅类Unix系统可用，用于多进程间的文件锁
+except ImportError:
+    fcntl = None
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size（单个请求，更大的文件使用分块上传）
 app.secret_key = 'your-secret-key-here'
+# 是否在上传时保留Excel中的全部列（默认保留，关键字归类导出和图表明细需要完整数据；
+# 设为False时只保留统计分析用到的列，减少内存占用，但导出和明细中只有这些列）
+app.config['INGEST_ALL_COLUMNS'] = True
+# 多文件/多工作表并行解析的进程数（None为CPU核数），总大小低于阈值时在当前进程中依次解析
+app.config['INGEST_PROCESSES'] = None
+app.config['INGEST_PARALLEL_MIN_BYTES'] = 1024 * 1024
+# 分块续传上传：未完成的上传保存在UPLOAD_PARTIAL_FOLDER，超过UPLOAD_PARTIAL_TTL未继续上传则清理
+app.config['UPLOAD_PARTIAL_FOLDER'] = os.path.join('uploads', 'partial')
+app.config['UPLOAD_PARTIAL_TTL'] = 24 * 3600
+app.config['UPLOAD_CHUNK_BYTES'] = 8 * 1024 * 1024  # 建议的分块大小，每个分块请求仍受MAX_CONTENT_LENGTH限制
+app.config['UPLOAD_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # 分块上传的单个文件上限
+# 解析结果缓存目录（按文件内容哈希存储列式数据）及容量上限
+app.config['CACHE_FOLDER'] = os.path.join('uploads', 'cache')
+app.config['CACHE_MAX_BYTES'] = 1024 * 1024 * 1024  # 1GB
+# 会话存储：内存预算（按DataFrame实际内存占用计算）、溢出目录和过期时间
+app.config['SESSION_FOLDER'] = os.path.join('uploads', 'sessions')
+app.config['SESSION_MEMORY_BUDGET'] = 2 * 1024 * 1024 * 1024  # 2GB
+app.config['SESSION_TTL'] = 24 * 3600  # 24小时未访问则过期
+# 多进程部署（--workers大于1，或在gunicorn等多进程服务器下设置环境变量DEFECT_TOOL_SHARED_SESSIONS=1）时，
+# 会话数据在上传后立即写入共享的列式存储，各工作进程通过内存映射读取
+app.config['SESSION_SHARED'] = os.environ.get('DEFECT_TOOL_SHARED_SESSIONS') == '1'
+# 后台导出：工作线程数和排队上限（超出上限时拒绝新的导出，避免占满资源影响图表请求）
+app.config['EXPORT_WORKERS'] = 1
+app.config['EXPORT_QUEUE_SIZE'] = 4
+# 导出任务状态目录（多进程部署时各进程共享）
+app.config['EXPORT_STATUS_FOLDER'] = os.path.join('uploads', 'exports')
+# 超过该大小的JSON响应按Accept-Encoding压缩（br优先，其次gzip）
+app.config['JSON_COMPRESS_MIN_BYTES'] = 1024
+app.config['JSON_COMPRESS_LEVEL'] = 6
+# 请求性能分析：按比例（0-1，环境变量DEFECT_TOOL_PROFILE）抽样用cProfile分析请求，结果保存到PROFILE_FOLDER
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('DEFECT_TOOL_PROFILE') or 0)
+app.config['PROFILE_FOLDER'] = 'logs'
 
 # 确保上传文件夹存在
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# 性能埋点：记录请求（或导出任务）中各环节的耗时、处理行数和分配的内存，
+# 通过Server-Timing响应头返回，并汇总为/metrics中的Prometheus指标（各工作进程分别统计）
+def _prometheus_labels(labels):
+    """格式化Prometheus标签{name="value",...}，值中的反斜杠、引号和换行需要转义"""
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+class Histogram:
+    """按一个标签分组的Prometheus直方图（线程安全）"""
+    
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, label_value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['counts']):
+                    labels = _prometheus_labels({self.label: label_value, 'le': repr(float(bound))})
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _prometheus_labels({self.label: label_value, 'le': '+Inf'})
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = _prometheus_labels({self.label: label_value})
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+class Counter:
+    """按一个标签分组的Prometheus计数器（线程安全）"""
+    
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, value, label_value):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + value
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_value, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_prometheus_labels({self.label: label_value})} {value}')
+        return lines
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+REQUEST_SECONDS = Histogram('defect_tool_request_duration_seconds', '请求处理耗时（秒）', 'endpoint', LATENCY_BUCKETS)
+STAGE_SECONDS = Histogram('defect_tool_stage_duration_seconds', '各处理环节耗时（秒）', 'stage', LATENCY_BUCKETS)
+STAGE_ROWS = Counter('defect_tool_stage_rows_total', '各处理环节处理的行数', 'stage')
+STAGE_BYTES = Counter('defect_tool_stage_allocated_bytes_total', '各处理环节新分配的内存（字节，近似值）', 'stage')
+
+_current_stages = contextvars.ContextVar('current_stages', default=None)
+
+def _allocated_bytes():
+    """
+    当前进程已分配的内存（字节）：启用tracemalloc（如PYTHONTRACEMALLOC=1）时使用其统计，
+    否则使用常驻内存（仅Linux）；进程级统计，并发请求时为近似值
+    """
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return _resident_memory_bytes()
+
+def _resident_memory_bytes():
+    """进程当前常驻内存（字节），仅Linux可用，其他平台返回None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class StageRecorder:
+    """一次请求或一个导出任务中各环节的记录：(环节名称, 耗时秒数, 处理行数, 新分配的内存字节数)"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+    
+    def add(self, name, seconds, rows=None, nbytes=None):
+        self.stages.append((name, seconds, rows, nbytes))
+        STAGE_SECONDS.observe(seconds, name)
+        if rows:
+            STAGE_ROWS.inc(rows, name)
+        if nbytes and nbytes > 0:
+            STAGE_BYTES.inc(nbytes, name)
+    
+    def elapsed(self):
+        return time.perf_counter() - self.started
+    
+    def server_timing(self):
+        """Server-Timing响应头：各环节的耗时（毫秒），desc中为处理行数和新分配的内存"""
+        parts = []
+        for name, seconds, rows, nbytes in self.stages:
+            desc = []
+            if rows is not None:
+                desc.append(f'rows={rows}')
+            if nbytes and nbytes > 0:
+                desc.append(f'alloc={nbytes / 1024:.0f}KB')
+            parts.append(f'{name};dur={seconds * 1000:.2f}' + (f';desc="{" ".join(desc)}"' if desc else ''))
+        parts.append(f'total;dur={self.elapsed() * 1000:.2f}')
+        return ', '.join(parts)
+    
+    def as_list(self):
+        return [{'stage': name, 'seconds': round(seconds, 4), 'rows': rows, 'allocated_bytes': nbytes}
+                for name, seconds, rows, nbytes in self.stages]
+
+@contextmanager
+def record_stage(name, rows=None):
+    """
+    记录一个处理环节（当前没有进行中的记录时不做任何统计）
+    with record_stage('parse') as stage: ... 在代码块中可设置stage.rows；退出后stage.seconds为耗时
+    """
+    stage = SimpleNamespace(rows=rows, seconds=0.0)
+    recorder = _current_stages.get()
+    start_bytes = _allocated_bytes() if recorder is not None else None
+    start = time.perf_counter()
+    try:
+        yield stage
+    finally:
+        stage.seconds = time.perf_counter() - start
+        if recorder is not None:
+            end_bytes = _allocated_bytes() if start_bytes is not None else None
+            recorder.add(name, stage.seconds, stage.rows, None if end_bytes is None else end_bytes - start_bytes)
+
+# 同一时间只分析一个请求（cProfile在部分Python版本中不能同时启用多个）
+_profile_lock = threading.Lock()
+
+@app.before_request
+def start_request_timing():
+    """开始记录本次请求的各环节，按抽样比例启用cProfile"""
+    g.stage_token = _current_stages.set(StageRecorder())
+    rate = app.config['PROFILE_SAMPLE_RATE']
+    if rate > 0 and random.random() < rate and _profile_lock.acquire(blocking=False):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+def _finish_profile(endpoint):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    try:
+        profiler.disable()
+        if endpoint is not None:
+            os.makedirs(app.config['PROFILE_FOLDER'], exist_ok=True)
+            path = os.path.join(app.config['PROFILE_FOLDER'],
+                                f"profile_{endpoint}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.prof")
+            profiler.dump_stats(path)
+            app.logger.info('请求性能分析结果已保存: %s（python -m pstats查看）', path)
+    except OSError as e:
+        app.logger.warning('保存性能分析结果失败: %s', e)
+    finally:
+        _profile_lock.release()
+
+@app.after_request
+def finish_request_timing(response):
+    """
+    在响应头中返回各环节耗时，并计入请求耗时直方图
+    最先注册，因此在其他after_request（如响应压缩）之后执行，压缩耗时也计入
+    """
+    recorder = _current_stages.get()
+    if recorder is not None:
+        response.headers['Server-Timing'] = recorder.server_timing()
+        REQUEST_SECONDS.observe(recorder.elapsed(), request.endpoint or 'unknown')
+    _finish_profile(request.endpoint or 'unknown')
+    return response
+
+@app.teardown_request
+def reset_request_timing(exc):
+    _finish_profile(None)
+    token = g.pop('stage_token', None)
+    if token is not None:
+        _current_stages.reset(token)
+
+# JSON序列化
+def _json_default(obj):
+    """标准json模块（以及orjson未覆盖的情况）无法直接序列化的NumPy/pandas类型"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f'无法序列化的类型: {type(obj).__name__}')
+
+def json_dumps_bytes(obj):
+    """序列化为UTF-8编码的JSON字节串：优先使用orjson，未安装时使用标准json模块"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify和app.json.dumps使用json_dumps_bytes，保持键的插入顺序"""
+    
+    def dumps(self, obj, **kwargs):
+        return json_dumps_bytes(obj).decode('utf-8')
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(json_dumps_bytes(obj), mimetype=self.mimetype)
+
+app.json = FastJSONProvider(app)
+
+def negotiate_encoding():
+    """根据请求的Accept-Encoding选择压缩方式，不压缩时返回None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def compress_body(body, encoding):
+    """按指定方式压缩响应体"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=min(app.config['JSON_COMPRESS_LEVEL'], 11))
+    return gzip.compress(body, compresslevel=app.config['JSON_COMPRESS_LEVEL'])
+
+@app.after_request
+def compress_json_response(response):
+    """压缩较大的JSON响应；已设置Content-Encoding（如/analyze缓存的压缩结果）或流式响应不处理"""
+    if (response.mimetype != 'application/json' or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < app.config['JSON_COMPRESS_MIN_BYTES']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding:
+        with record_stage('compress'):
+            response.set_data(compress_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 # 状态映射规则
 STATUS_MAPPING = {
     '新建': '待修复',
@@ -23,6 +355,437 @@ STATUS_MAPPING = {
     '处理中': '待修复'   # 兼容不同命名
 }
 
+# 时间列
+TIME_COLUMNS = ['创建时间', '更新时间', '完成时间']
+# 缺陷分析类型列（支持多种列名，按优先级排列）
+ANALYSIS_TYPE_COLUMNS = ['缺陷分析类型', '缺陷分析归类', '缺陷分类']
+# 流式读取时保留的列：统计分析用到的列 + 事项ID
+INGEST_COLUMNS = ['事项ID', '标题', '状态', '缺陷模块'] + TIME_COLUMNS + ANALYSIS_TYPE_COLUMNS
+# 流式读取时每块的行数
+INGEST_CHUNK_ROWS = 50000
+# 日期序号列：时间列按天取整后的天数（1970-01-01起），用于快速按天统计
+DAY_COLUMNS = {'创建时间': '创建日', '更新时间': '更新日', '完成时间': '完成日'}
+# 日期序号列中表示空值的哨兵值
+DAY_NA = np.iinfo(np.int32).min
+# 多文件/多工作表上传时记录每行数据来源（文件名/工作表名）的列
+SOURCE_COLUMN = '来源'
+# 上传时转换为category类型的列
+CATEGORY_COLUMNS = ['状态', '原始状态', '映射后状态', '缺陷模块', SOURCE_COLUMN] + ANALYSIS_TYPE_COLUMNS
+# 缺陷停留时长的默认分段：(最小天数, 最大天数, 名称)，最大天数为None表示不设上限
+STAY_DURATION_BUCKETS = [
+    (0, 3, '0-3天'),
+    (4, 7, '4-7天'),
+    (8, 14, '8-14天'),
+    (15, 30, '15-30天'),
+    (31, None, '30天以上'),
+]
+# 每日新增/修复统计的时间粒度；auto按日期范围的跨度选择（不超过AUTO_DAY_SPAN天按天，不超过AUTO_WEEK_SPAN天按周，否则按月）
+DAILY_GRANULARITIES = ('day', 'week', 'month', 'auto')
+AUTO_DAY_SPAN = 92
+AUTO_WEEK_SPAN = 731
+# 预处理时派生的列（导出Excel时去除）
+DERIVED_COLUMNS = ['原始状态', '映射后状态'] + list(DAY_COLUMNS.values())
+
+# 导出格式（格式名 -> 文件扩展名），CSV类格式可以边生成边下载
+EXPORT_FORMATS = {'xlsx': '.xlsx', 'csv': '.csv', 'csv.gz': '.csv.gz'}
+STREAMABLE_EXPORT_FORMATS = ('csv', 'csv.gz')
+# 导出时每块写出的行数
+EXPORT_CHUNK_ROWS = 20000
+# Excel单个工作表的行数上限（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+def _peak_memory_mb():
+    """获取进程峰值内存（MB），不支持的平台返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux下单位为KB，macOS下单位为字节
+    if sys.platform == 'darwin':
+        return round(peak / 1024 / 1024, 1)
+    return round(peak / 1024, 1)
+
+def _build_chunk(rows, names):
+    """将一块行数据转换为按列组织的带类型DataFrame"""
+    columns = {}
+    for name, values in zip(names, zip(*rows)):
+        if name in TIME_COLUMNS:
+            # 时间列直接解析为datetime64，解析失败的置为NaT
+            columns[name] = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce')
+        else:
+            columns[name] = pd.Series(values)
+    return pd.DataFrame(columns, columns=names)
+
+def read_defect_excel(source, columns=INGEST_COLUMNS, chunk_rows=INGEST_CHUNK_ROWS, sheet=0):
+    """
+    流式读取Excel文件的一个工作表（默认第一个）
+    使用openpyxl的read_only/values_only模式逐行读取，只保留需要的列，
+    并按块构建带类型的列，避免一次性在内存中构建整个工作簿
+    
+    Args:
+        source: 文件路径或文件对象
+        columns: 需要保留的列名列表，None表示保留全部列
+        chunk_rows: 每块的行数
+        sheet: 工作表序号或名称
+    
+    Returns:
+        (df, ingest_stats) ingest_stats包含行数、耗时、每秒行数和进程峰值内存
+    """
+    from openpyxl import load_workbook
+    
+    start = time.perf_counter()
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        
+        # 确定要保留的列及其位置（重复列名只取第一个）
+        positions = {}
+        for i, name in enumerate(header):
+            if name is None:
+                continue
+            name = str(name)
+            if name not in positions and (columns is None or name in columns):
+                positions[name] = i
+        names = list(positions.keys())
+        
+        chunks = []
+        total_rows = 0
+        if names:
+            getter = itemgetter(*positions.values())
+            width = max(positions.values()) + 1
+            buffer = []
+            for row in rows:
+                # 跳过整行为空的行
+                if not any(v is not None for v in row):
+                    continue
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                picked = getter(row)
+                buffer.append(picked if len(names) > 1 else (picked,))
+                if len(buffer) >= chunk_rows:
+                    chunks.append(_build_chunk(buffer, names))
+                    total_rows += len(buffer)
+                    buffer = []
+            if buffer:
+                chunks.append(_build_chunk(buffer, names))
+                total_rows += len(buffer)
+    finally:
+        wb.close()
+    
+    if chunks:
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    else:
+        df = pd.DataFrame(columns=names)
+    
+    elapsed = time.perf_counter() - start
+    ingest_stats = {
+        'rows': total_rows,
+        'columns': names,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': int(total_rows / elapsed) if elapsed > 0 else None,
+        'peak_memory_mb': _peak_memory_mb()
+    }
+    return df, ingest_stats
+
+def list_sheet_names(source):
+    """获取Excel文件中全部工作表的名称"""
+    from openpyxl import load_workbook
+    
+    wb = load_workbook(source, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def _parse_sheet(task):
+    """解析一个工作表（在进程池中执行，参数和返回值都需要可以pickle）"""
+    path, sheet, columns = task
+    return read_defect_excel(path, columns=columns, sheet=sheet)
+
+def read_defect_sources(sources, columns=INGEST_COLUMNS, all_sheets=False, processes=None, parallel_min_bytes=0):
+    """
+    读取多个Excel文件（以及每个文件的全部工作表）并合并为一个数据框
+    各工作表在进程池中并行解析，合并后增加来源列（"文件名/工作表名"）
+    
+    Args:
+        sources: [(文件路径, 显示的文件名)]
+        columns: 需要保留的列名列表，None表示保留全部列
+        all_sheets: 是否读取每个文件的全部工作表（否则只读第一个）
+        processes: 进程池大小，默认为CPU核数
+        parallel_min_bytes: 文件总大小低于该值时在当前进程中依次解析（启动进程池的开销大于收益）
+    
+    Returns:
+        (df, ingest_stats) ingest_stats['sources']为每个工作表的行数和解析耗时；
+        没有可识别列的工作表（如汇总表）跳过，标记为skipped
+    """
+    start = time.perf_counter()
+    tasks, labels = [], []
+    for path, name in sources:
+        sheets = list_sheet_names(path)
+        for sheet in (sheets if all_sheets else sheets[:1]):
+            tasks.append((path, sheet, columns))
+            labels.append((name, sheet))
+    
+    total_bytes = sum(os.path.getsize(path) for path, _ in sources)
+    workers = min(len(tasks), processes or os.cpu_count() or 1)
+    if total_bytes < parallel_min_bytes:
+        workers = 1
+    if workers > 1:
+        # 使用spawn方式启动子进程：多线程的服务进程中fork不安全
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(_parse_sheet, tasks))
+    else:
+        results = [_parse_sheet(task) for task in tasks]
+    
+    frames, source_labels, counts, source_stats = [], [], [], []
+    for (name, sheet), (df, stats) in zip(labels, results):
+        skipped = len(stats['columns']) == 0
+        source_stats.append({
+            'file': name,
+            'sheet': sheet,
+            'rows': stats['rows'],
+            'seconds': stats['seconds'],
+            'skipped': skipped
+        })
+        if skipped:
+            continue
+        label = f'{name}/{sheet}'
+        # 同名文件上传多次时加序号区分
+        suffix = 2
+        while label in source_labels:
+            label = f'{name}/{sheet} ({suffix})'
+            suffix += 1
+        frames.append(df)
+        source_labels.append(label)
+        counts.append(len(df))
+    
+    if frames:
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    else:
+        df = pd.DataFrame(columns=columns or [])
+    # 来源列直接由各工作表的行数生成编码，不逐行构造字符串
+    df[SOURCE_COLUMN] = pd.Categorical.from_codes(
+        np.repeat(np.arange(len(source_labels), dtype=np.int32), counts), categories=pd.Index(source_labels, dtype=object)
+    ) if source_labels else pd.Categorical([])
+    
+    elapsed = time.perf_counter() - start
+    total_rows = len(df)
+    ingest_stats = {
+        'rows': total_rows,
+        'columns': list(df.columns),
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': int(total_rows / elapsed) if elapsed > 0 else None,
+        'peak_memory_mb': _peak_memory_mb(),
+        'processes': workers,
+        'sources': source_stats
+    }
+    return df, ingest_stats
+
+# 列式存储格式版本，格式变化时递增以使旧缓存失效
+FRAME_STORE_VERSION = 2
+
+def save_frame(df, directory, replace=False):
+    """
+    将DataFrame按列保存为NumPy数组（.npy），便于以内存映射方式快速加载
+    时间列保存为int64，数值列直接保存，文本列保存为编码+取值表
+    先写入临时目录再重命名，保证目录要么完整要么不存在
+    目标已存在时默认保留已有的；replace为True时替换已有的目录（用于格式过旧或已损坏的数据）
+    """
+    parent = os.path.dirname(directory) or '.'
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = os.path.join(parent, f'.tmp_{uuid.uuid4().hex}')
+    os.makedirs(tmp_dir)
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            dtype = series.dtype
+            col = {'name': str(name), 'dtype': str(dtype)}
+            if isinstance(dtype, pd.CategoricalDtype):
+                col['kind'] = 'category'
+                codes = series.cat.codes.to_numpy()
+                categories = series.cat.categories
+            elif pd.api.types.is_datetime64_dtype(dtype):
+                col['kind'] = 'datetime'
+                np.save(os.path.join(tmp_dir, f'{i}.npy'), series.to_numpy().view('i8'))
+                columns.append(col)
+                continue
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+                col['kind'] = 'numeric'
+                np.save(os.path.join(tmp_dir, f'{i}.npy'), series.to_numpy())
+                columns.append(col)
+                continue
+            else:
+                col['kind'] = 'text'
+                codes, categories = pd.factorize(series.astype(object), use_na_sentinel=True)
+                categories = pd.Index(categories, dtype=object)
+            np.save(os.path.join(tmp_dir, f'{i}.npy'), codes)
+            values = categories.to_numpy(dtype=object)
+            # 全部为字符串时保存为定长Unicode数组，否则保存为对象数组
+            if all(isinstance(v, str) for v in values):
+                np.save(os.path.join(tmp_dir, f'{i}_values.npy'), values.astype(str))
+            else:
+                col['pickled'] = True
+                np.save(os.path.join(tmp_dir, f'{i}_values.npy'), values, allow_pickle=True)
+            columns.append(col)
+        
+        meta = {'version': FRAME_STORE_VERSION, 'rows': len(df), 'columns': columns}
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        
+        old_dir = None
+        if replace and os.path.exists(directory):
+            # 目录不能直接覆盖：先将旧目录移开再放入新目录，之后删除旧目录
+            old_dir = os.path.join(parent, f'.old_{uuid.uuid4().hex}')
+            os.rename(directory, old_dir)
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # 目标已存在（并发写入同一份数据），保留已有的
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def frame_is_complete(directory):
+    """save_frame保存的目录存在、格式版本为当前版本且数据文件齐全"""
+    try:
+        with open(os.path.join(directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if meta.get('version') != FRAME_STORE_VERSION:
+        return False
+    for i, col in enumerate(meta['columns']):
+        names = [f'{i}.npy'] if col['kind'] in ('datetime', 'numeric') else [f'{i}.npy', f'{i}_values.npy']
+        if not all(os.path.isfile(os.path.join(directory, name)) for name in names):
+            return False
+    return True
+
+def load_frame(directory, mmap=True):
+    """
+    加载save_frame保存的DataFrame，数值和时间列以只读内存映射方式加载
+    目录不存在或格式不兼容时返回None
+    """
+    meta_path = os.path.join(directory, 'meta.json')
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != FRAME_STORE_VERSION:
+        return None
+    
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    for i, col in enumerate(meta['columns']):
+        array = np.load(os.path.join(directory, f'{i}.npy'), mmap_mode=mmap_mode)
+        kind = col['kind']
+        if kind == 'datetime':
+            data[col['name']] = pd.Series(array.view(col['dtype']), copy=False)
+        elif kind == 'numeric':
+            data[col['name']] = pd.Series(array, copy=False)
+        else:
+            values = np.load(os.path.join(directory, f'{i}_values.npy'),
+                             allow_pickle=col.get('pickled', False))
+            if kind == 'category':
+                data[col['name']] = pd.Series(pd.Categorical.from_codes(array, categories=values))
+            else:
+                series = pd.Series(pd.Categorical.from_codes(array, categories=values.astype(object)))
+                series = series.astype(object)
+                if col['dtype'] != 'object':
+                    try:
+                        series = series.astype(col['dtype'])
+                    except (TypeError, ValueError):
+                        pass
+                data[col['name']] = series
+    df = pd.DataFrame(data, columns=[col['name'] for col in meta['columns']], copy=False)
+    return df
+
+_cache_lock = threading.Lock()
+
+def _cache_dir(cache_key):
+    return os.path.join(app.config['CACHE_FOLDER'], cache_key)
+
+def _dir_size(directory):
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            total += entry.stat().st_size
+    return total
+
+def load_cached_frame(cache_key):
+    """从解析缓存加载DataFrame，命中时刷新访问时间（用于LRU淘汰），未命中或缓存已损坏返回None"""
+    directory = _cache_dir(cache_key)
+    try:
+        df = load_frame(directory)
+    except (OSError, ValueError) as e:
+        app.logger.warning('解析缓存 %s 已损坏: %s', cache_key, e)
+        return None
+    if df is not None:
+        try:
+            os.utime(os.path.join(directory, 'meta.json'))
+        except OSError:
+            pass
+    return df
+
+def store_cached_frame(cache_key, df):
+    """
+    将解析后的DataFrame写入缓存，并按LRU淘汰超出容量上限的缓存
+    已有的缓存项格式版本过旧（FRAME_STORE_VERSION变化）或数据文件不全时替换为新数据
+    """
+    directory = _cache_dir(cache_key)
+    if not frame_is_complete(directory):
+        save_frame(df, directory, replace=True)
+    evict_cache(app.config['CACHE_MAX_BYTES'])
+
+def evict_cache(max_bytes):
+    """按最近访问时间淘汰缓存，直到总大小不超过max_bytes"""
+    cache_folder = app.config['CACHE_FOLDER']
+    if not os.path.isdir(cache_folder):
+        return
+    with _cache_lock:
+        entries = []
+        total = 0
+        for entry in os.scandir(cache_folder):
+            if not entry.is_dir() or entry.name.startswith('.'):
+                continue
+            meta_path = os.path.join(entry.path, 'meta.json')
+            try:
+                last_used = os.stat(meta_path).st_mtime
+            except OSError:
+                continue
+            size = _dir_size(entry.path)
+            entries.append((last_used, size, entry.path))
+            total += size
+        
+        entries.sort()
+        for last_used, size, path in entries:
+            if total <= max_bytes:
+                break
+            # 先删除meta.json使缓存失效，再删除数据文件（Windows下被映射的文件可能暂时无法删除）
+            try:
+                os.remove(os.path.join(path, 'meta.json'))
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+def _save_upload(file, filepath, chunk_size=1024 * 1024):
+    """分块保存上传的文件，同时计算内容的SHA-256哈希"""
+    digest = hashlib.sha256()
+    with open(filepath, 'wb') as f:
+        while True:
+            chunk = file.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
 def apply_status_mapping(df):
     """
     应用状态映射规则：新建、修复中、待修复 → 统一映射为待修复
@@ -36,303 +799,2300 @@ def apply_status_mapping(df):
         df['映射后状态'] = df['原始状态'].map(lambda x: STATUS_MAPPING.get(x, x))
     return df
 
-def analyze_defect_data(df, selected_modules=None, selected_statuses=None, classification_mode='manual', keywords=None):
+def _to_day_numbers(series):
+    """将datetime64列转换为天序号（int32），空值为DAY_NA"""
+    days = series.to_numpy().astype('datetime64[D]')
+    return np.where(np.isnat(days), DAY_NA, days.view('i8')).astype(np.int32)
+
+def _day_numbers_to_str(days):
+    """将天序号数组转换为'YYYY-MM-DD'格式的字符串列表"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype(str).tolist()
+
+def is_normalized(df):
+    """判断数据框是否已经过normalize_defect_frame预处理"""
+    if '状态' in df.columns and '映射后状态' not in df.columns:
+        return False
+    return all(day_col in df.columns for col, day_col in DAY_COLUMNS.items() if col in df.columns)
+
+def normalize_defect_frame(df):
+    """
+    上传时对数据进行一次性预处理，之后每次分析直接复用：
+    - 时间列解析为datetime64，并生成按天取整的日期序号列（创建日、更新日、完成日）
+    - 应用状态映射，生成原始状态、映射后状态列
+    - 状态、模块、缺陷分析类型等列转换为category类型
+    会直接修改并返回传入的数据框
+    """
+    with record_stage('normalize.dates', rows=len(df)):
+        for col, day_col in DAY_COLUMNS.items():
+            if col in df.columns:
+                if not pd.api.types.is_datetime64_dtype(df[col].dtype):
+                    df[col] = pd.to_datetime(df[col], errors='coerce')
+                df[day_col] = _to_day_numbers(df[col])
+    
+    with record_stage('normalize.status_mapping', rows=len(df)):
+        apply_status_mapping(df)
+    
+    with record_stage('normalize.categories', rows=len(df)):
+        for col in CATEGORY_COLUMNS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+    return df
+
+def export_frame(df):
+    """去除预处理派生的列，得到用于导出的数据框"""
+    return df.drop(columns=[col for col in DERIVED_COLUMNS if col in df.columns])
+
+def iter_export_chunks(df, extra_columns=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    按行分块产出导出数据（不含派生列），每次只复制一块数据
+    extra_columns: {列名: 与df同索引的Series}，追加在末尾（如关键字归类）
+    """
+    columns = [col for col in df.columns if col not in DERIVED_COLUMNS]
+    extra_columns = extra_columns or {}
+    for start in range(0, max(len(df), 1), chunk_rows):
+        stop = start + chunk_rows
+        chunk = df.iloc[start:stop][columns]
+        if extra_columns:
+            chunk = chunk.assign(**{name: values.iloc[start:stop].to_numpy()
+                                    for name, values in extra_columns.items()})
+        yield chunk
+
+def _write_xlsx_chunks(chunks, path, total_rows, progress):
+    """
+    流式写出xlsx：优先使用xlsxwriter的constant_memory模式，
+    未安装时使用openpyxl的write_only模式，两者都不在内存中保留整个工作簿
+    """
+    if total_rows + 1 > EXCEL_MAX_ROWS:
+        raise ValueError(f'数据共{total_rows}行，超过Excel单表行数上限，请选择CSV格式导出')
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+    
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True,
+                                              'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+        worksheet = workbook.add_worksheet('Sheet1')
+        next_row = [0]
+        
+        def append(values):
+            worksheet.write_row(next_row[0], 0, values)
+            next_row[0] += 1
+        close = workbook.close
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Sheet1')
+        append = worksheet.append
+        close = lambda: workbook.save(path)
+    
+    written = 0
+    for index, chunk in enumerate(chunks):
+        if index == 0:
+            append(list(chunk.columns))
+        # 缺失值（NaN/NaT）写为空单元格
+        values = chunk.astype(object)
+        values = values.where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            append(row)
+        written += len(chunk)
+        if progress is not None and total_rows:
+            progress(written / total_rows)
+    close()
+
+def _write_csv_chunks(chunks, path, total_rows, progress, compress=False):
+    """流式写出CSV（UTF-8带BOM，Excel可直接打开），可选gzip压缩"""
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8-sig', newline='') as f:
+        written = 0
+        for index, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(index == 0), index=False, date_format='%Y-%m-%d %H:%M:%S')
+            # 每块写完立即刷到磁盘，边生成边下载时客户端可以读到
+            f.flush()
+            written += len(chunk)
+            if progress is not None and total_rows:
+                progress(written / total_rows)
+
+def write_export(df, path, export_format='xlsx', extra_columns=None, progress=None,
+                 chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    分块写出导出文件，内存占用与数据总行数无关
+    
+    Args:
+        df: 数据框（预处理派生的列不会导出）
+        path: 输出路径
+        export_format: 'xlsx'、'csv'或'csv.gz'
+        extra_columns: 追加的列，{列名: Series}
+        progress: 进度回调，参数为已完成比例（0~1）
+    """
+    chunks = iter_export_chunks(df, extra_columns, chunk_rows)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {export_format}')
+    with record_stage(f'export.{export_format}', rows=len(df)):
+        if export_format == 'xlsx':
+            _write_xlsx_chunks(chunks, path, len(df), progress)
+        else:
+            _write_csv_chunks(chunks, path, len(df), progress, compress=export_format == 'csv.gz')
+
+def _normalize_keywords(keywords):
+    """去除关键字首尾空白，过滤空关键字并去重（保持原有顺序）"""
+    result = []
+    for keyword in keywords or []:
+        if keyword and str(keyword).strip():
+            keyword = str(keyword).strip()
+            if keyword not in result:
+                result.append(keyword)
+    return result
+
+def _trie_regex(words):
+    """将关键字构建为前缀树形式的正则（共享前缀只比较一次，贪婪匹配最长的关键字）"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != '']
+        if not branches:
+            return ''
+        inner = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 当前节点本身是一个完整关键字时，后续部分可选
+        return '(?:' + inner + ')?' if '' in node else inner
+    
+    return build(trie)
+
+def classify_by_keywords(titles, keywords, rng=None):
+    """
+    根据标题关键字进行归类
+    规则：关键字不区分大小写模糊匹配标题；未匹配任何关键字归类为"其他"；
+    匹配到多个关键字时随机选择一个
+    
+    实现：所有关键字编译为一个前缀树正则（前瞻匹配，可找出所有位置上的关键字），
+    只对去重后的标题做一次扫描，再用NumPy向量化地为每一行随机选择命中的关键字
+    
+    Args:
+        titles: 标题列（Series）
+        keywords: 关键字列表
+        rng: numpy随机数生成器，为None时使用非确定性的随机数
+    
+    Returns:
+        与titles索引对齐的归类结果Series
+    """
+    keywords = _normalize_keywords(keywords)
+    result = np.full(len(titles), '其他', dtype=object)
+    if not keywords or len(titles) == 0:
+        return pd.Series(result, index=titles.index, name='关键字归类')
+    if rng is None:
+        rng = np.random.default_rng()
+    
+    lowered_keywords = [k.lower() for k in keywords]
+    # 前缀树正则在每个位置匹配最长的关键字，被它包含的较短关键字通过closure补全，
+    # 从而得到标题包含的全部关键字
+    distinct = set(lowered_keywords)
+    closure = {m: [j for j, k in enumerate(lowered_keywords) if k in m] for m in distinct}
+    pattern = re.compile('(?=(' + _trie_regex(distinct) + '))')
+    
+    # 标题去重后匹配（缺陷标题重复率通常很高），空标题的编码为-1
+    codes, uniques = pd.factorize(titles, use_na_sentinel=True)
+    counts = np.zeros(len(uniques), dtype=np.int64)
+    offsets = np.zeros(len(uniques), dtype=np.int64)
+    flat_hits = []
+    for i, title in enumerate(uniques):
+        found = set(pattern.findall(str(title).lower()))
+        if not found:
+            continue
+        hits = sorted({j for m in found for j in closure[m]})
+        offsets[i] = len(flat_hits)
+        counts[i] = len(hits)
+        flat_hits.extend(hits)
+    
+    if flat_hits:
+        row_counts = np.where(codes >= 0, counts[codes], 0)
+        matched = np.flatnonzero(row_counts)
+        # 在每一行命中的关键字中均匀随机选择一个
+        picks = (rng.random(len(matched)) * row_counts[matched]).astype(np.int64)
+        chosen = np.asarray(flat_hits, dtype=np.int64)[offsets[codes[matched]] + picks]
+        result[matched] = np.asarray(keywords, dtype=object)[chosen]
+    
+    return pd.Series(result, index=titles.index, name='关键字归类')
+
+def keyword_rng(keywords):
+    """
+    根据关键字集合生成确定性的随机数生成器
+    相同的关键字集合总是得到相同的随机选择，保证图表与导出的Excel一致
+    """
+    key = '\n'.join(sorted(_normalize_keywords(keywords)))
+    seed = int.from_bytes(hashlib.sha256(key.encode('utf-8')).digest()[:8], 'little')
+    return np.random.default_rng(seed)
+
+def classify_keywords_deterministic(titles, keywords):
+    """使用确定性随机数对标题进行关键字归类，结果为category类型以节省内存"""
+    keywords = sorted(_normalize_keywords(keywords))
+    result = classify_by_keywords(titles, keywords, rng=keyword_rng(keywords))
+    return result.astype('category')
+
+def _original_statuses(selected_statuses, all_original_statuses):
+    """
+    将选中的映射后状态（如"待修复"）转换为原始状态集合
+    不在映射表中的状态本身就是原始状态（如"已关闭"、"已解决"等），数据中存在时直接使用
+    """
+    # 创建反向映射：从映射后的状态找到所有对应的原始状态
+    reverse_mapping = {}
+    for original_status, mapped_status in STATUS_MAPPING.items():
+        reverse_mapping.setdefault(mapped_status, []).append(original_status)
+    
+    original_statuses = set()
+    for mapped_status in selected_statuses:
+        if mapped_status in reverse_mapping:
+            # 找到映射到这个状态的所有原始状态
+            original_statuses.update(reverse_mapping[mapped_status])
+        elif mapped_status in all_original_statuses:
+            original_statuses.add(mapped_status)
+    return original_statuses
+
+def build_filter_mask(df, selected_modules=None, selected_statuses=None, filter_index=None):
+    """
+    根据模块和状态选择构建行过滤掩码（numpy布尔数组），不复制数据框
+    
+    Args:
+        df: 数据框
+        selected_modules: 选中的模块列表，包含"（空）"时同时选中模块为空的行
+        selected_statuses: 选中的状态列表（映射后的状态，如"待修复"）
+        filter_index: 上传时为该数据框建立的FilterIndex，提供时通过位图运算过滤
+    """
+    if filter_index is not None and filter_index.rows == len(df):
+        return filter_index.mask(selected_modules, selected_statuses)
+    
+    mask = np.ones(len(df), dtype=bool)
+    
+    # 如果指定了模块过滤
+    if selected_modules and '缺陷模块' in df.columns:
+        modules = df['缺陷模块']
+        # 移除"（空）"选项，单独处理
+        named_modules = [m for m in selected_modules if m != '（空）']
+        module_mask = modules.isin(named_modules).to_numpy() if named_modules else np.zeros(len(df), dtype=bool)
+        # 选中了"（空）"：模块为空的行也保留
+        if '（空）' in selected_modules:
+            module_mask = module_mask | modules.isna().to_numpy()
+        mask &= module_mask
+    
+    # 如果指定了状态过滤
+    # selected_statuses 是映射后的状态（如"待修复"），需要转换为原始状态进行筛选
+    if selected_statuses:
+        status_col = '原始状态' if '原始状态' in df.columns else '状态'
+        if status_col in df.columns:
+            original_statuses = _original_statuses(selected_statuses, set(df[status_col].dropna().unique().tolist()))
+            if original_statuses:
+                mask &= df[status_col].isin(list(original_statuses)).to_numpy()
+    
+    return mask
+
+def build_analysis_mask(df, selected_modules=None, selected_statuses=None, filter_index=None):
+    """模块/状态过滤，并且只保留标题非空的行（统计规则均为count(标题)）"""
+    if filter_index is not None and filter_index.rows == len(df):
+        return filter_index.mask(selected_modules, selected_statuses, require_title=True)
+    mask = build_filter_mask(df, selected_modules, selected_statuses)
+    if '标题' in df.columns:
+        mask &= df['标题'].notna().to_numpy()
+    return mask
+
+class FilterIndex:
+    """
+    模块/状态过滤的位图索引，上传时建立一次
+    每个模块取值（包括空值）和每个原始状态取值各对应一个按位压缩的位图（每行1位），
+    任意模块/状态组合的过滤只需对选中取值的位图做按位或、再对模块和状态做按位与，不再逐行比较字符串；
+    标题非空的行同样保存为位图（统计和明细都只包含标题非空的行）
+    """
+    
+    def __init__(self, df):
+        self.rows = len(df)
+        self.modules = self._bitmaps(df['缺陷模块']) if '缺陷模块' in df.columns else None
+        status_col = '原始状态' if '原始状态' in df.columns else '状态'
+        self.statuses = self._bitmaps(df[status_col]) if status_col in df.columns else None
+        self.titled = np.packbits(df['标题'].notna().to_numpy()) if '标题' in df.columns else None
+    
+    def _bitmaps(self, series):
+        """{取值: 位图}，空值的键为None；只为实际出现的取值建立位图"""
+        codes, labels = _codes_and_labels(series)
+        # 按编码排序一次得到每个取值的行号范围，不对每个取值扫描整列
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(-1, len(labels) + 1))
+        bits = np.zeros(self.rows, dtype=bool)
+        bitmaps = {}
+        for code in range(-1, len(labels)):
+            rows = order[bounds[code + 1]:bounds[code + 2]]
+            if len(rows) == 0:
+                continue
+            bits[:] = False
+            bits[rows] = True
+            bitmaps[None if code < 0 else labels[code]] = np.packbits(bits)
+        return bitmaps
+    
+    @property
+    def nbytes(self):
+        total = sum(bitmap.nbytes for bitmaps in (self.modules, self.statuses) if bitmaps for bitmap in bitmaps.values())
+        return total + (self.titled.nbytes if self.titled is not None else 0)
+    
+    def updated(self, df, rows):
+        """
+        数据中只有rows（修改的行和追加在末尾的行）变化时返回更新后的索引，原索引不变：
+        只复制这些行的原取值和新取值的位图，其余位图与原索引共用（比数据短的部分视为0）
+        """
+        index = FilterIndex.__new__(FilterIndex)
+        index.rows = len(df)
+        rows = np.asarray(rows, dtype=np.int64)
+        old_rows = rows[rows < self.rows]
+        status_col = '原始状态' if '原始状态' in df.columns else '状态'
+        index.modules = (index._updated_bitmaps(self.modules, df['缺陷模块'], rows, old_rows)
+                         if self.modules is not None else None)
+        index.statuses = (index._updated_bitmaps(self.statuses, df[status_col], rows, old_rows)
+                          if self.statuses is not None else None)
+        index.titled = None
+        if self.titled is not None:
+            index.titled = index._padded(self.titled)
+            np.bitwise_and.at(index.titled, rows >> 3, ~_row_bits(rows))
+            titled_rows = rows[df['标题'].iloc[rows].notna().to_numpy()]
+            np.bitwise_or.at(index.titled, titled_rows >> 3, _row_bits(titled_rows))
+        return index
+    
+    def _padded(self, bitmap):
+        """按当前行数补齐的位图副本"""
+        result = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        if bitmap is not None:
+            result[:len(bitmap)] = bitmap
+        return result
+    
+    def _updated_bitmaps(self, bitmaps, series, rows, old_rows):
+        """清除old_rows在原取值位图中的位，再按rows的新取值置位；不再出现的取值去掉"""
+        result = dict(bitmaps)
+        copied = set()
+        
+        def writable(key):
+            if key not in copied:
+                result[key] = self._padded(result.get(key))
+                copied.add(key)
+            return result[key]
+        
+        old_bytes, old_bits = old_rows >> 3, _row_bits(old_rows)
+        for key, bitmap in bitmaps.items():
+            hit = (bitmap[old_bytes] & old_bits) != 0
+            if hit.any():
+                np.bitwise_and.at(writable(key), old_bytes[hit], ~old_bits[hit])
+        codes, labels = _codes_and_labels(series.iloc[rows])
+        for code in np.unique(codes):
+            selected = rows[codes == code]
+            np.bitwise_or.at(writable(None if code < 0 else labels[code]), selected >> 3, _row_bits(selected))
+        return {key: bitmap for key, bitmap in result.items() if key not in copied or bitmap.any()}
+    
+    def _union(self, bitmaps, keys):
+        """
+        选中取值的位图按位或；选中超过一半时改为对未选中的取值求或再取反
+        增量更新后未变化的位图可能比当前行数短，只与对应的前缀按位或
+        """
+        keys = {key for key in keys if key in bitmaps}
+        if len(keys) * 2 > len(bitmaps):
+            result = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+            for key, bitmap in bitmaps.items():
+                if key not in keys:
+                    result[:len(bitmap)] |= bitmap
+            return np.invert(result, out=result)
+        result = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        for key in keys:
+            result[:len(bitmaps[key])] |= bitmaps[key]
+        return result
+    
+    def mask(self, selected_modules=None, selected_statuses=None, require_title=False):
+        """与build_filter_mask相同的过滤规则，返回numpy布尔数组；require_title为True时只保留标题非空的行"""
+        packed = None
+        if selected_modules and self.modules is not None:
+            keys = [None if m == '（空）' else m for m in selected_modules]
+            packed = self._union(self.modules, keys)
+        if selected_statuses and self.statuses is not None:
+            all_original_statuses = {key for key in self.statuses if key is not None}
+            original_statuses = _original_statuses(selected_statuses, all_original_statuses)
+            if original_statuses:
+                status_bits = self._union(self.statuses, original_statuses)
+                packed = status_bits if packed is None else np.bitwise_and(packed, status_bits, out=packed)
+        if require_title and self.titled is not None:
+            packed = self.titled.copy() if packed is None else np.bitwise_and(packed, self.titled, out=packed)
+        if packed is None:
+            return np.ones(self.rows, dtype=bool)
+        return np.unpackbits(packed, count=self.rows).view(bool)
+
+def _row_bits(rows):
+    """行号在np.packbits位图中对应字节内的位（高位在前）"""
+    return (0x80 >> (rows & 7)).astype(np.uint8)
+
+def _sorted_dict(keys, values):
+    """按键排序生成字典，跳过数量为0的项（键类型无法比较时保持原顺序）"""
+    items = [(k, v) for k, v in zip(keys, values) if v]
+    try:
+        items.sort(key=lambda item: item[0])
+    except TypeError:
+        pass
+    return dict(items)
+
+def _codes_and_labels(series):
+    """返回列的整数编码（空值为-1）和取值表；category列直接使用其编码"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories.tolist()
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return codes, list(uniques)
+
+def _code_counts(codes, labels, na_label=None):
+    """
+    对整数编码计数，返回按取值排序的{取值: 数量}
+    na_label不为None时，空值（编码-1）计入na_label（与同名取值合并）
+    """
+    counts = np.bincount(codes[codes >= 0], minlength=len(labels)).tolist()
+    result = dict(zip(labels, counts))
+    if na_label is not None:
+        na_count = int((codes < 0).sum())
+        if na_count:
+            result[na_label] = result.get(na_label, 0) + na_count
+    return _sorted_dict(result.keys(), result.values())
+
+def _day_counts(days):
+    """统计每个天序号出现的次数，返回按日期排序的{日期字符串: 数量}"""
+    if len(days) == 0:
+        return {}
+    min_day = int(days.min())
+    counts = np.bincount(days.astype(np.int64) - min_day)
+    nonzero = np.flatnonzero(counts)
+    return dict(zip(_day_numbers_to_str(nonzero + min_day), counts[nonzero].tolist()))
+
+def _daily_columns(new_days, fixed_days):
+    """
+    每日新增/修复的列式数据{'dates': [...], 'new': [...], 'fixed': [...]}
+    日期为两者有数据的日期（升序），数量数组与日期一一对应，没有数据的一方为0
+    """
+    new_days = np.asarray(new_days, dtype=np.int64)
+    fixed_days = np.asarray(fixed_days, dtype=np.int64)
+    if len(new_days) == 0 and len(fixed_days) == 0:
+        return {'dates': [], 'new': [], 'fixed': []}
+    all_days = np.concatenate([new_days, fixed_days])
+    min_day = int(all_days.min())
+    size = int(all_days.max()) - min_day + 1
+    new = np.bincount(new_days - min_day, minlength=size)
+    fixed = np.bincount(fixed_days - min_day, minlength=size)
+    present = np.flatnonzero(new | fixed)
+    return {'dates': _day_numbers_to_str(present + min_day), 'new': new[present], 'fixed': fixed[present]}
+
+def parse_day(value):
+    """将'YYYY-MM-DD'格式的日期（或date对象）转换为天序号，None或空字符串返回None；格式错误时抛出ValueError"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        raise ValueError(f'日期格式错误: {value}')
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+def _period_numbers(days, granularity):
+    """天序号转换为周期序号：按周为1970-01-05（周一）起的周数，按月为1970-01起的月数"""
+    days = np.asarray(days, dtype=np.int64)
+    if granularity == 'week':
+        return (days - 4) // 7
+    if granularity == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return days
+
+def _period_labels(periods, granularity):
+    """周期序号转换为标签：按天、按周为（周一的）日期'YYYY-MM-DD'，按月为'YYYY-MM'"""
+    periods = np.asarray(periods, dtype=np.int64)
+    if granularity == 'week':
+        return _day_numbers_to_str(periods * 7 + 4)
+    if granularity == 'month':
+        return periods.astype('datetime64[M]').astype(str).tolist()
+    return _day_numbers_to_str(periods)
+
+def _period_series(new_days, fixed_days, date_from=None, date_to=None, granularity='day'):
+    """
+    按日期范围截取每日新增/修复的天序号，按粒度汇总，范围内没有数据的周期补0
+    未指定范围的一端使用数据中的最早/最晚日期
+    
+    Returns:
+        (周期标签列表, 新增数量数组, 修复数量数组, 实际使用的粒度)
+    """
+    new_days = np.asarray(new_days, dtype=np.int64)
+    fixed_days = np.asarray(fixed_days, dtype=np.int64)
+    if date_from is not None:
+        new_days = new_days[new_days >= date_from]
+        fixed_days = fixed_days[fixed_days >= date_from]
+    if date_to is not None:
+        new_days = new_days[new_days <= date_to]
+        fixed_days = fixed_days[fixed_days <= date_to]
+    all_days = np.concatenate([new_days, fixed_days])
+    start = date_from if date_from is not None else (int(all_days.min()) if len(all_days) else None)
+    end = date_to if date_to is not None else (int(all_days.max()) if len(all_days) else None)
+    if granularity == 'auto':
+        span = end - start + 1 if start is not None and end is not None else 0
+        granularity = 'day' if span <= AUTO_DAY_SPAN else 'week' if span <= AUTO_WEEK_SPAN else 'month'
+    if start is None or end is None or start > end:
+        empty = np.empty(0, dtype=np.int64)
+        return [], empty, empty, granularity
+    
+    first, last = _period_numbers([start, end], granularity).tolist()
+    size = last - first + 1
+    new = np.bincount(_period_numbers(new_days, granularity) - first, minlength=size)
+    fixed = np.bincount(_period_numbers(fixed_days, granularity) - first, minlength=size)
+    return _period_labels(np.arange(first, last + 1), granularity), new, fixed, granularity
+
+def aggregate_chart_stats(df, mask, keyword_classification=None, stay_buckets=None, compact=False, daily_window=None,
+                          timings=None):
+    """
+    聚合引擎：在一次过滤后的行集合上计算全部图表数据
+    先取出过滤后的行号，每个需要的列只按行号取值一次，
+    状态/模块/分析类型使用整数编码、日期使用天序号，全部通过np.bincount计数
+    
+    Args:
+        df: 已预处理的数据框（见normalize_defect_frame）
+        mask: 行过滤掩码（已包含标题非空条件）
+        keyword_classification: 关键字归类结果，不为None时饼图按关键字归类统计
+        stay_buckets: 缺陷停留时长分段，见analyze_defect_data
+        compact: 为True时停留时长和每日统计返回列式数组（见analyze_defect_data）
+        daily_window: (开始天序号, 结束天序号, 粒度)，不为None时每日统计按日期范围截取、按粒度汇总并补0
+        timings: 不为None时（字典）记录各项统计的耗时（秒），用于性能测试；
+            各项统计同时作为analyze.<名称>环节记录到当前请求的性能埋点中
+    """
+    recorder = _current_stages.get()
+    checkpoint = [time.perf_counter(), _allocated_bytes() if recorder is not None else None]
+    
+    def lap(name):
+        # 记录上一个检查点到当前的耗时（和新分配的内存）
+        now = time.perf_counter()
+        if timings is not None:
+            timings[name] = now - checkpoint[0]
+        if recorder is not None:
+            now_bytes = _allocated_bytes()
+            nbytes = None if now_bytes is None or checkpoint[1] is None else now_bytes - checkpoint[1]
+            # 处理行数为过滤后的行数
+            recorder.add(f'analyze.{name}', now - checkpoint[0], len(rows), nbytes)
+            checkpoint[1] = now_bytes
+        checkpoint[0] = now
+    
+    rows = np.flatnonzero(mask)
+    has_title = '标题' in df.columns
+    status_col = '原始状态' if '原始状态' in df.columns else '状态'
+    
+    # 原始状态编码，用于待验证/已关闭的判断
+    raw_codes = raw_labels = None
+    if status_col in df.columns:
+        raw_codes, raw_labels = _codes_and_labels(df[status_col])
+        raw_codes = raw_codes[rows]
+    
+    def raw_status_is(status):
+        if raw_codes is None or status not in raw_labels:
+            return np.zeros(len(rows), dtype=bool)
+        return raw_codes == raw_labels.index(status)
+    
+    stats = {}
+    lap('rows')
+    
+    # 1. 不同状态下，统计缺陷数量【count(标题)】
+    # 使用映射后状态，将新建、修复中、待修复合并显示为"待修复"
+    display_col = '映射后状态' if '映射后状态' in df.columns else '状态'
+    mapped_codes = mapped_labels = None
+    if display_col in df.columns and has_title:
+        mapped_codes, mapped_labels = _codes_and_labels(df[display_col])
+        mapped_codes = mapped_codes[rows]
+        stats['status_count'] = _code_counts(mapped_codes, mapped_labels)
+    else:
+        stats['status_count'] = {}
+    
+    lap('status_count')
+    
+    # 2. 缺陷停留时长
+    # 统计映射后状态为待修复的缺陷，停留时长 = 当前日期 - 创建日期（单位：天）
+    created = df['创建日'].to_numpy()[rows] if '创建日' in df.columns else None
+    stay_days = np.empty(0, dtype=np.int64)
+    if (display_col == '映射后状态' and mapped_codes is not None and created is not None
+            and '待修复' in mapped_labels):
+        pending = (mapped_codes == mapped_labels.index('待修复')) & (created != DAY_NA)
+        stay_days = _today_day_number() - created[pending].astype(np.int64)
+    if len(stay_days) > 0:
+        # 偏移到非负后使用bincount计数
+        min_day = int(stay_days.min())
+        counts = np.bincount(stay_days - min_day)
+        nonzero = np.flatnonzero(counts)
+        if compact:
+            stats['stay_duration'] = {'days': nonzero + min_day, 'counts': counts[nonzero]}
+        else:
+            # 字符串键方便JSON序列化
+            stats['stay_duration'] = dict(zip((nonzero + min_day).astype(str).tolist(), counts[nonzero].tolist()))
+    else:
+        stats['stay_duration'] = {'days': [], 'counts': []} if compact else {}
+    if stay_buckets:
+        buckets = STAY_DURATION_BUCKETS if stay_buckets is True else stay_buckets
+        stats['stay_duration_buckets'] = bucket_stay_duration(stay_days, buckets)
+    
+    lap('stay_duration')
+    
+    # 3. 每日新增/修复缺陷情况
+    # 每日新增：创建时间为对应天的缺陷数量
+    if created is not None and has_title:
+        new_days = created[created != DAY_NA]
+    else:
+        new_days = np.empty(0, dtype=np.int64)
+    
+    # 每日修复：待验证状态且更新时间为对应天 + 已关闭状态且完成时间为对应天（使用原始状态）
+    fixed_days = []
+    if raw_codes is not None and has_title:
+        if '更新日' in df.columns:
+            updated = df['更新日'].to_numpy()[rows]
+            fixed_days.append(updated[raw_status_is('待验证') & (updated != DAY_NA)])
+        if '完成日' in df.columns:
+            completed = df['完成日'].to_numpy()[rows]
+            fixed_days.append(completed[raw_status_is('已关闭') & (completed != DAY_NA)])
+    fixed_days = np.concatenate(fixed_days) if fixed_days else np.empty(0, dtype=np.int64)
+    if daily_window is not None:
+        labels, new, fixed, granularity = _period_series(new_days, fixed_days, *daily_window)
+        if compact:
+            stats['daily_stats'] = {'dates': labels, 'new': new, 'fixed': fixed, 'granularity': granularity}
+        else:
+            stats['daily_stats'] = {
+                'daily_new': dict(zip(labels, new.tolist())),
+                'daily_fixed': dict(zip(labels, fixed.tolist())),
+                'granularity': granularity
+            }
+    elif compact:
+        stats['daily_stats'] = _daily_columns(new_days, fixed_days)
+    else:
+        stats['daily_stats'] = {'daily_new': _day_counts(new_days), 'daily_fixed': _day_counts(fixed_days)}
+    
+    lap('daily_stats')
+    
+    # 4. 缺陷分析归类统计（饼图）
+    if keyword_classification is not None and has_title:
+        # 关键字匹配归类模式：使用全量数据的归类结果
+        codes, labels = _codes_and_labels(keyword_classification)
+        stats['analysis_type_count'] = _code_counts(codes[rows], labels)
+    else:
+        # 人工归类模式：支持多种列名，空值显示为"（空）"
+        analysis_col = next((col for col in ANALYSIS_TYPE_COLUMNS if col in df.columns), None)
+        if analysis_col and has_title:
+            codes, labels = _codes_and_labels(df[analysis_col])
+            stats['analysis_type_count'] = _code_counts(codes[rows], labels, na_label='（空）')
+        else:
+            stats['analysis_type_count'] = {}
+    
+    lap('analysis_type_count')
+    
+    return stats
+
+def _today_day_number():
+    """当前日期的天序号"""
+    return int(np.datetime64(datetime.now().date(), 'D').astype(np.int64))
+
+def bucket_stay_duration(days, buckets=STAY_DURATION_BUCKETS):
+    """
+    将停留天数按区间分段统计，返回{区间名称: 数量}（保留数量为0的区间）
+    小于第一个区间下限的天数（例如创建时间晚于当前日期的负天数）计入第一个区间
+    """
+    days = np.asarray(days, dtype=np.int64)
+    lower_bounds = np.array([low for low, _, _ in buckets], dtype=np.int64)
+    positions = np.searchsorted(lower_bounds, days, side='right') - 1
+    positions = np.clip(positions, 0, None)
+    # 落在区间之间空隙中的天数（区间不连续时）不计入
+    upper_bounds = np.array([np.iinfo(np.int64).max if high is None else high for _, high, _ in buckets])
+    valid = (days <= upper_bounds[positions]) | (days < lower_bounds[0])
+    counts = np.bincount(positions[valid], minlength=len(buckets))
+    return {name: count for (_, _, name), count in zip(buckets, counts.tolist())}
+
+def _stay_bucket_range(buckets, position):
+    """
+    第position个区间包含的停留天数范围（最小值, 最大值），None表示不限，与bucket_stay_duration的规则一致：
+    第一个区间包含小于下限的天数，区间重叠时属于下限较大的区间
+    """
+    low, high, _ = buckets[position]
+    if position == 0:
+        low = None
+    if position + 1 < len(buckets):
+        next_low = buckets[position + 1][0] - 1
+        high = next_low if high is None else min(high, next_low)
+    return low, high
+
+def _label_mask(series, value, na_label=None):
+    """取值等于value的行（布尔数组），na_label不为None且value等于na_label时空值也选中"""
+    codes, labels = _codes_and_labels(series)
+    mask = codes == labels.index(value) if value in labels else np.zeros(len(codes), dtype=bool)
+    if na_label is not None and value == na_label:
+        mask |= codes < 0
+    return mask
+
+def segment_mask(df, segment, keyword_classification=None, stay_buckets=STAY_DURATION_BUCKETS):
+    """
+    图表中某一部分对应的行（全量数据上的布尔数组，规则与aggregate_chart_stats的统计一致）
+    segment为字典，type取值：
+        status          状态分布图中的状态（映射后状态），{'type': 'status', 'value': '待修复'}
+        stay            停留天数或停留时长区间，{'type': 'stay', 'days': 3} 或 {'type': 'stay', 'bucket': '4-7天'}
+        daily           某个周期的新增或修复，{'type': 'daily', 'date': '2024-01-15', 'kind': 'new'/'fixed',
+                        'granularity': 'day'/'week'/'month'}，按周为该周任意一天，按月为'YYYY-MM'
+        classification  缺陷分析归类图中的归类（关键字模式下为关键字归类结果），{'type': 'classification', 'value': ...}
+    参数不合法时抛出ValueError
+    """
+    if not isinstance(segment, dict):
+        raise ValueError('segment参数格式错误')
+    segment_type = segment.get('type')
+    display_col = '映射后状态' if '映射后状态' in df.columns else '状态'
+    status_col = '原始状态' if '原始状态' in df.columns else '状态'
+    
+    if segment_type == 'status':
+        if display_col not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        return _label_mask(df[display_col], segment.get('value'))
+    
+    if segment_type == 'stay':
+        if display_col != '映射后状态' or '创建日' not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        # 停留天数 = 当前日期 - 创建日，停留天数的范围转换为创建日的范围，直接比较天序号
+        if segment.get('bucket') is not None:
+            names = [name for _, _, name in stay_buckets]
+            if segment['bucket'] not in names:
+                raise ValueError(f"不存在的停留时长区间: {segment['bucket']}")
+            low, high = _stay_bucket_range(stay_buckets, names.index(segment['bucket']))
+        else:
+            try:
+                low = high = int(segment.get('days'))
+            except (TypeError, ValueError):
+                raise ValueError('停留天数格式错误')
+        today = _today_day_number()
+        created = df['创建日'].to_numpy()
+        mask = _label_mask(df[display_col], '待修复') & (created != DAY_NA)
+        if high is not None:
+            mask &= created >= today - high
+        if low is not None:
+            mask &= created <= today - low
+        return mask
+    
+    if segment_type == 'daily':
+        granularity = segment.get('granularity') or 'day'
+        if granularity not in ('day', 'week', 'month'):
+            raise ValueError(f'不支持的统计粒度: {granularity}')
+        kind = segment.get('kind')
+        if kind not in ('new', 'fixed'):
+            raise ValueError('kind应为new或fixed')
+        # 周期转换为天序号范围[first, last]，直接比较天序号列
+        try:
+            if not isinstance(segment.get('date'), str) or not segment['date']:
+                raise ValueError('缺少日期')
+            if granularity == 'month':
+                month = np.datetime64(segment.get('date'), 'M')
+                first = int(month.astype('datetime64[D]').astype(np.int64))
+                last = int((month + 1).astype('datetime64[D]').astype(np.int64)) - 1
+            else:
+                day = parse_day(segment.get('date'))
+                if day is None:
+                    raise ValueError('缺少日期')
+                first = int(_period_numbers([day], granularity)[0]) * 7 + 4 if granularity == 'week' else day
+                last = first + 6 if granularity == 'week' else day
+        except (TypeError, ValueError):
+            raise ValueError('日期格式错误，应为YYYY-MM-DD（按月为YYYY-MM）')
+        
+        def in_period(day_col):
+            # 空值DAY_NA小于任何日期，不会落在范围内
+            days = df[day_col].to_numpy()
+            return (days >= first) & (days <= last)
+        
+        if kind == 'new':
+            return in_period('创建日') if '创建日' in df.columns else np.zeros(len(df), dtype=bool)
+        mask = np.zeros(len(df), dtype=bool)
+        if status_col in df.columns:
+            if '更新日' in df.columns:
+                mask |= _label_mask(df[status_col], '待验证') & in_period('更新日')
+            if '完成日' in df.columns:
+                mask |= _label_mask(df[status_col], '已关闭') & in_period('完成日')
+        return mask
+    
+    if segment_type == 'classification':
+        if keyword_classification is not None:
+            return _label_mask(keyword_classification, segment.get('value'))
+        analysis_col = next((col for col in ANALYSIS_TYPE_COLUMNS if col in df.columns), None)
+        if analysis_col is None:
+            return np.zeros(len(df), dtype=bool)
+        return _label_mask(df[analysis_col], segment.get('value'), na_label='（空）')
+    
+    raise ValueError(f'不支持的图表类型: {segment_type}')
+
+def select_segment_rows(df, segment, selected_modules=None, selected_statuses=None, filter_index=None,
+                        keyword_classification=None):
+    """
+    图表明细：模块/状态过滤（与analyze_defect_data相同，包括标题非空）后，属于图表中该部分的行号（升序，int32）
+    """
+    mask = build_analysis_mask(df, selected_modules, selected_statuses, filter_index)
+    mask &= segment_mask(df, segment, keyword_classification)
+    return np.flatnonzero(mask).astype(np.int32)
+
+def _take_values(series, rows):
+    """按行号取值为列表：category列按编码查取值表，时间格式化为'YYYY-MM-DD HH:MM:SS'，空值为None"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        labels = series.cat.categories.to_numpy(dtype=object)
+        return [labels[code] if code >= 0 else None for code in series.cat.codes.to_numpy()[rows].tolist()]
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        values = series.to_numpy()[rows].astype('datetime64[s]')
+        return [None if np.isnat(value) else str(value).replace('T', ' ') for value in values]
+    return series.array.take(rows).to_numpy(dtype=object, na_value=None).tolist()
+
+def rows_to_records(df, rows, columns, extra_columns=None):
+    """按行号取出指定列，返回行列表；只对取出的行转换，不复制整列"""
+    values = [_take_values(extra_columns[col] if extra_columns and col in extra_columns else df[col], rows)
+              for col in columns]
+    return [list(row) for row in zip(*values)]
+
+def analyze_defect_data(df, selected_modules=None, selected_statuses=None, classification_mode='manual', keywords=None,
+                        keyword_classification=None, stay_buckets=None, compact=False, filter_index=None,
+                        date_from=None, date_to=None, granularity=None, timings=None):
+    """
+    根据缺陷数据生成统计分析
+    按照图片中的统计规则实现
+    过滤条件组合为一个布尔掩码，每项统计只读取需要的列，不复制数据框
+    
+    Args:
+        df: 数据框
+        selected_modules: 选中的模块列表
+        selected_statuses: 选中的状态列表
+        keyword_classification: 预先计算好的全量数据关键字归类结果（与df索引对齐），
+            为None时在过滤前对全量数据进行归类
+        stay_buckets: 缺陷停留时长分段，True表示使用默认分段STAY_DURATION_BUCKETS，
+            也可传入自定义的[(最小天数, 最大天数, 名称), ...]；结果保存在stay_duration_buckets中
+        compact: 为True时返回列式数据，数量为NumPy数组，由json_dumps_bytes直接序列化：
+            stay_duration为{'days': [...], 'counts': [...]}，
+            daily_stats为{'dates': [...], 'new': [...], 'fixed': [...]}
+        filter_index: 该数据框的FilterIndex（上传时建立），模块/状态过滤通过位图运算完成
+        date_from, date_to: 每日统计的日期范围（'YYYY-MM-DD'，包含两端），只影响每日新增/修复统计
+        granularity: 每日统计的粒度（day/week/month/auto），与日期范围任一指定时，
+            每日统计按周期汇总，范围内没有数据的周期补0，daily_stats中返回实际使用的粒度
+        timings: 不为None时（字典）记录过滤和各项统计的耗时（秒），见aggregate_chart_stats
+    """
+    # 未经上传预处理的数据（例如直接读取的Excel）先进行预处理
+    if not is_normalized(df):
+        df = normalize_defect_frame(df.copy())
+    
+    # 关键字归类在过滤前对全量数据进行，过滤后的统计与全量导出使用同一份结果
+    if classification_mode == 'keyword' and keywords and '标题' in df.columns:
+        if keyword_classification is None:
+            with record_stage('keyword_classification', rows=len(df)):
+                keyword_classification = classify_keywords_deterministic(df['标题'], keywords)
+        elif not keyword_classification.index.equals(df.index):
+            keyword_classification = keyword_classification.reindex(df.index)
+    else:
+        keyword_classification = None
+    
+    # 模块和状态过滤；统计规则均为count(标题)，只统计标题非空的行
+    with record_stage('analyze.filter', rows=len(df)) as stage:
+        mask = build_analysis_mask(df, selected_modules, selected_statuses, filter_index)
+    if timings is not None:
+        timings['filter'] = stage.seconds
+    
+    daily_window = None
+    if granularity is not None or date_from or date_to:
+        if granularity is not None and granularity not in DAILY_GRANULARITIES:
+            raise ValueError(f'不支持的统计粒度: {granularity}')
+        daily_window = (parse_day(date_from), parse_day(date_to), granularity or 'day')
+    
+    return aggregate_chart_stats(df, mask, keyword_classification, stay_buckets, compact, daily_window, timings)
+
+def get_module_list(df):
+    """
+    获取缺陷模块列表（去重），包含空值选项
+    """
+    if '缺陷模块' in df.columns:
+        # 获取非空模块
+        modules = df['缺陷模块'].dropna().unique().tolist()
+        modules = sorted(modules)
+        
+        # 检查是否有空模块，如果有则添加"（空）"选项
+        has_empty = df['缺陷模块'].isna().any()
+        if has_empty:
+            modules.insert(0, '（空）')  # 在列表开头添加空选项
+        
+        return modules
+    return []
+
+def get_status_list(df):
+    """
+    获取状态列表（去重），返回映射后的状态
+    新建、修复中、待修复等会合并显示为"待修复"
+    只对去重后的状态做映射，不复制数据框
+    """
+    if '映射后状态' in df.columns:
+        # 已预处理的数据直接使用映射后状态
+        statuses = df['映射后状态'].dropna().unique().tolist()
+    elif '原始状态' in df.columns or '状态' in df.columns:
+        status_col = '原始状态' if '原始状态' in df.columns else '状态'
+        statuses = {STATUS_MAPPING.get(x, x) for x in df[status_col].dropna().unique().tolist()}
+    else:
+        return []
+    return sorted(statuses)
+
+def _record_keys(series):
+    """
+    主键统一转换为字符串用于比较（同一ID在不同文件中可能被读成整数、小数或文本）
+    """
+    if pd.api.types.is_float_dtype(series.dtype):
+        non_null = series.dropna()
+        if (non_null % 1 == 0).all():
+            series = series.astype('Int64')
+    return series.astype(str).str.strip().to_numpy(dtype=object)
+
+def _row_fingerprints(df, columns):
+    """按指定的列计算每行的指纹"""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+
+def _missing_column(base_col, length):
+    """增量数据缺少某列时，按已有数据的类型生成全空列"""
+    if base_col.name in DAY_COLUMNS.values():
+        return pd.Series(np.full(length, DAY_NA, dtype=np.int32))
+    if pd.api.types.is_datetime64_any_dtype(base_col.dtype):
+        return pd.Series(pd.NaT, index=range(length), dtype=base_col.dtype)
+    return pd.Series([None] * length, dtype=object)
+
+def _concat_column(base_col, delta_col):
+    """
+    拼接一列：category列先把增量数据中的新取值追加到取值表（已有行的编码不变），
+    再按同一取值表拼接，避免pd.concat遇到不同取值表时退化为object
+    """
+    if isinstance(base_col.dtype, pd.CategoricalDtype):
+        categories = base_col.cat.categories
+        extra = [v for v in pd.unique(delta_col.dropna().to_numpy(dtype=object)) if v not in categories]
+        if extra:
+            base_col = base_col.cat.add_categories(extra)
+        delta_col = pd.Series(pd.Categorical(delta_col.to_numpy(dtype=object), categories=base_col.cat.categories))
+    return pd.concat([base_col.reset_index(drop=True), delta_col.reset_index(drop=True)], ignore_index=True)
+
+def _row_key_hashes(df, mode, columns):
+    """每行主键（mode为'key'时columns只有主键列）或按columns计算的整行指纹的64位哈希"""
+    if mode == 'key':
+        return pd.util.hash_array(_record_keys(df[columns[0]]))
+    return _row_fingerprints(df, list(columns))
+
+def _same_values(base_col, delta_col):
+    """两列的取值逐行相同（按取值哈希比较，空值视为相同，不受category取值表和索引的影响）"""
+    return np.array_equal(pd.util.hash_pandas_object(base_col, index=False).to_numpy(),
+                          pd.util.hash_pandas_object(delta_col, index=False).to_numpy())
+
+class RowKeyIndex:
+    """
+    增量合并用的行键索引：已有数据每行主键（无主键时为整行指纹）的64位哈希排序保存，
+    合并时对增量数据的哈希二分查找，不再对已有数据逐行计算主键；追加新行后只插入新行的哈希
+    主键模式下哈希相同还要比较主键本身，哈希冲突的行按新行处理
+    """
+    
+    def __init__(self, mode, columns, hashes, positions=None):
+        self.mode = mode
+        self.columns = tuple(columns)
+        if positions is None:
+            positions = np.argsort(hashes, kind='stable')
+            hashes = hashes[positions]
+        self.hashes = hashes
+        self.positions = positions.astype(np.int64, copy=False)
+    
+    @property
+    def rows(self):
+        return len(self.hashes)
+    
+    def matches(self, mode, columns, rows):
+        """索引适用于按mode和columns合并、共rows行的数据"""
+        return self.mode == mode and self.columns == tuple(columns) and self.rows == rows
+    
+    def candidates(self, hashes):
+        """哈希相同的所有（增量数据行号, 已有数据行号）组合"""
+        left = np.searchsorted(self.hashes, hashes, side='left')
+        counts = np.searchsorted(self.hashes, hashes, side='right') - left
+        delta_rows = np.repeat(np.arange(len(hashes)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return delta_rows, self.positions[np.repeat(left, counts) + offsets]
+    
+    def appended(self, hashes):
+        """在数据末尾追加新行后的索引（原索引不变）"""
+        where = np.searchsorted(self.hashes, hashes, side='right')
+        positions = np.arange(self.rows, self.rows + len(hashes), dtype=np.int64)
+        return RowKeyIndex(self.mode, self.columns, np.insert(self.hashes, where, hashes),
+                           np.insert(self.positions, where, positions))
+
+def merge_delta_frame(base, delta, key_column='事项ID', key_index=None):
+    """
+    将增量数据合并（upsert）到已有数据
+    - 两份数据都有主键列且增量数据主键无空值时：主键相同的行用增量数据原位更新，其余追加
+    - 否则按整行指纹：只追加已有数据中不存在的行（无法识别"修改"，修改后的行视为新行）
+    增量数据中重复的主键/指纹只保留最后一行；已有数据中主键重复时更新第一行并删除其余行，新数据追加在末尾
+    统计信息：inserted新增、updated修改、unchanged与已有行完全相同、duplicates增量数据中重复的行数
+    两份数据都应已经过normalize_defect_frame预处理，合并结果沿用已有数据的列；
+    没有变化的列直接沿用已有数据的列，有变化的列只写入修改和追加的行
+    key_index为已有数据的RowKeyIndex（上一次合并返回的索引）时直接使用，不再计算已有数据每行的主键
+    
+    Returns:
+        (合并后的数据, 被修改或删除的原有行, 统计信息)
+        统计信息中的_key_index为合并后数据的RowKeyIndex，_changed_rows为合并后数据中修改和追加的行号；
+        删除了已有数据的行（行号变化）时两者都为None，派生的索引需要重新建立
+    """
+    if key_column in base.columns and key_column in delta.columns and delta[key_column].notna().all():
+        mode, columns = 'key', [key_column]
+    else:
+        # 只使用两份数据共有的原始列（不含预处理派生的列）
+        mode = 'fingerprint'
+        columns = [col for col in base.columns if col in delta.columns and col not in DERIVED_COLUMNS]
+    if key_index is None or not key_index.matches(mode, columns, len(base)):
+        key_index = RowKeyIndex(mode, columns, _row_key_hashes(base, mode, columns))
+    
+    received = len(delta)
+    delta_keys = _record_keys(delta[key_column]) if mode == 'key' else _row_fingerprints(delta, columns)
+    latest = ~pd.Index(delta_keys).duplicated(keep='last')
+    delta, delta_keys = delta[latest].reset_index(drop=True), delta_keys[latest]
+    delta_hashes = pd.util.hash_array(delta_keys) if mode == 'key' else delta_keys
+    
+    delta_rows, base_rows = key_index.candidates(delta_hashes)
+    if mode == 'key' and len(base_rows):
+        same = _record_keys(base[key_column].iloc[base_rows]) == delta_keys[delta_rows]
+        delta_rows, base_rows = delta_rows[same], base_rows[same]
+    # 每个增量行对应已有数据中行号最小的一行，主键重复的其余行删除
+    order = np.lexsort((base_rows, delta_rows))
+    delta_rows, base_rows = delta_rows[order], base_rows[order]
+    first = np.ones(len(delta_rows), dtype=bool)
+    first[1:] = delta_rows[1:] != delta_rows[:-1]
+    target = np.full(len(delta), -1, dtype=np.int64)
+    target[delta_rows[first]] = base_rows[first]
+    existing = target >= 0
+    
+    if mode == 'key':
+        dropped = base_rows[~first]
+        # 与已有行内容完全相同的行（主键在已有数据中唯一，且全部原始列的值都相同）不算修改，保留原有行
+        unchanged = np.zeros(len(delta), dtype=bool)
+        original = [col for col in base.columns if col not in DERIVED_COLUMNS]
+        if existing.any() and all(col in delta.columns for col in original):
+            check = np.flatnonzero(existing & (np.bincount(delta_rows, minlength=len(delta)) == 1))
+            unchanged[check] = (_row_fingerprints(base.iloc[target[check]], original) ==
+                                _row_fingerprints(delta.iloc[check], original))
+    else:
+        # 指纹相同即内容相同，无需重复追加
+        dropped = np.zeros(0, dtype=np.int64)
+        unchanged = existing
+    
+    updates = np.flatnonzero(existing & ~unchanged)
+    inserts = np.flatnonzero(~existing)
+    targets = target[updates]
+    changes = delta.iloc[np.concatenate([updates, inserts])]
+    n = len(base)
+    indexer = None
+    if len(targets):
+        # 合并后的行号 -> 拼接（已有数据 + 修改的行 + 新增的行）后的行号
+        indexer = np.arange(n, dtype=np.int64)
+        indexer[targets] = n + np.arange(len(targets))
+        indexer = np.concatenate([np.delete(indexer, dropped), n + len(targets) + np.arange(len(inserts))])
+    
+    merged_columns = {}
+    for col in base.columns:
+        base_col = base[col].reset_index(drop=True)
+        delta_col = changes[col] if col in changes.columns else _missing_column(base_col, len(changes))
+        if len(changes) == 0 or (len(inserts) == 0 and len(dropped) == 0 and
+                                 _same_values(base_col.iloc[targets], delta_col)):
+            # 该列没有变化，沿用已有数据的列
+            merged_columns[col] = base_col
+            continue
+        column = _concat_column(base_col, delta_col)
+        merged_columns[col] = column if indexer is None else column.take(indexer).reset_index(drop=True)
+    merged = pd.DataFrame(merged_columns, copy=False)
+    
+    stats = {
+        'mode': mode,
+        'key_column': key_column if mode == 'key' else None,
+        'rows': received,
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'unchanged': int(unchanged.sum()),
+        'duplicates': received - int(latest.sum())
+    }
+    if len(dropped):
+        stats.update({'_key_index': None, '_changed_rows': None})
+    else:
+        stats.update({
+            '_key_index': key_index.appended(delta_hashes[inserts]) if len(inserts) else key_index,
+            '_changed_rows': np.concatenate([targets, n + np.arange(len(inserts))])
+        })
+    replaced = base.iloc[np.sort(np.concatenate([targets, dropped]))]
+    return merged, replaced, stats
+
+def _update_value_list(values, merged_col, replaced_col, delta_col):
+    """
+    增量更新取值列表（不含空值）：加入增量数据中的取值；
+    只在被替换的行中出现、增量数据中没有的取值，检查合并后的数据中是否仍存在
+    """
+    added = set(delta_col.dropna().unique().tolist())
+    candidates = set(replaced_col.dropna().unique().tolist()) - added
+    gone = set()
+    if candidates:
+        remaining = merged_col[merged_col.isin(list(candidates))]
+        gone = candidates - set(remaining.dropna().unique().tolist())
+    return (set(values) | added) - gone
+
+def update_session_lists(session, merged, replaced, delta):
+    """根据增量数据更新会话的模块列表和状态列表，返回（modules, statuses）"""
+    modules = session.get('modules', [])
+    if '缺陷模块' in merged.columns:
+        delta_modules = delta['缺陷模块'] if '缺陷模块' in delta.columns else pd.Series([None] * len(delta))
+        values = _update_value_list([m for m in modules if m != '（空）'], merged['缺陷模块'],
+                                    replaced['缺陷模块'], delta_modules)
+        # 空模块选项：增量数据有空模块时加入；被替换的行中有空模块时确认合并后是否仍存在
+        has_empty = '（空）' in modules
+        if delta_modules.isna().any():
+            has_empty = True
+        elif has_empty and replaced['缺陷模块'].isna().any():
+            has_empty = bool(merged['缺陷模块'].isna().any())
+        modules = sorted(values)
+        if has_empty:
+            modules.insert(0, '（空）')
+    
+    statuses = session.get('statuses', [])
+    if '映射后状态' in merged.columns and '映射后状态' in delta.columns:
+        statuses = sorted(_update_value_list(statuses, merged['映射后状态'],
+                                             replaced['映射后状态'], delta['映射后状态']))
+    return modules, statuses
+
+class LRUCache:
+    """线程安全的LRU缓存，记录命中/未命中次数"""
+    
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def discard_if(self, predicate):
+        """删除满足predicate(key)的所有缓存项"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+class SessionStore:
+    """
+    上传数据的会话存储
+    - 按DataFrame的memory_usage(deep=True)控制内存预算，超出时按LRU将数据溢出到磁盘
+    - 被溢出的会话在下次访问时从磁盘懒加载（内存映射），不会因内存回收而"过期"
+    - 超过TTL未访问的会话连同磁盘数据一起删除
+    - shared=True（多进程部署）时，上传的数据立即写入磁盘的列式存储，
+      各进程都通过内存映射读取同一份数据，任一进程都能处理任一会话的请求
+    - 会话数据每次替换（如增量合并）时数据版本号（entry['version']）递增，按版本号分目录保存；
+      共享模式下其他进程访问会话时发现版本变化，改用新版本的数据并清理本进程的派生缓存
+    - 基于当前数据生成新数据再替换（如增量合并）时，在update_lock内读取和替换，避免并发的修改互相覆盖
+    """
+    
+    # 磁盘上过期会话的清理间隔（秒）
+    DISK_SWEEP_INTERVAL = 600
+    # 共享模式下刷新磁盘上会话访问时间的最小间隔（秒）
+    DISK_TOUCH_INTERVAL = 60
+    
+    def __init__(self, folder, memory_budget, ttl, shared=False):
+        self.folder = folder
+        self.memory_budget = memory_budget
+        self.ttl = ttl
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._last_disk_sweep = 0
+        self._eviction_listeners = []
+        self._update_locks = {}
+    
+    def add_eviction_listener(self, listener):
+        """注册回调listener(session_id)：会话数据被替换、溢出到磁盘或删除时调用，用于清理派生缓存"""
+        self._eviction_listeners.append(listener)
+    
+    def _notify_eviction(self, session_id):
+        for listener in self._eviction_listeners:
+            listener(session_id)
+    
+    @staticmethod
+    def new_id():
+        """生成会话ID：秒级时间戳 + 随机后缀，同一秒内的多次上传也不会冲突"""
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    
+    @staticmethod
+    def valid_id(session_id):
+        """会话ID符合new_id生成的格式（会话ID来自请求参数，用于拼接磁盘路径前必须校验）"""
+        return isinstance(session_id, str) and bool(re.fullmatch(r'\d{8}_\d{6}_[0-9a-f]{8}', session_id))
+    
+    def _session_dir(self, session_id):
+        if not self.valid_id(session_id):
+            raise ValueError(f'无效的会话ID: {session_id!r}')
+        return os.path.join(self.folder, session_id)
+    
+    @contextmanager
+    def update_lock(self, session_id):
+        """
+        串行化同一会话的"读取-修改-替换"：进程内按会话ID加锁，
+        共享模式下再对会话目录中的.lock文件加文件锁（不支持fcntl的系统上只使用进程内的锁）
+        """
+        directory = self._session_dir(session_id)
+        with self._lock:
+            lock = self._update_locks.setdefault(session_id, threading.Lock())
+        with lock:
+            if not self.shared or fcntl is None:
+                yield
+                return
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, '.lock'), 'a') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                yield
+    
+    def __setitem__(self, session_id, entry):
+        entry = dict(entry)
+        df = entry.get('dataframe')
+        nbytes = int(df.memory_usage(deep=True).sum()) if df is not None else 0
+        # 新版本号大于本进程和磁盘上（其他进程写入）的版本号
+        with self._lock:
+            current = self._entries.get(session_id)
+            version = current['entry'].get('version', 0) if current else 0
+        disk_meta = self._read_disk_meta(session_id)
+        entry['version'] = max(version, disk_meta.get('version', 0) if disk_meta else 0) + 1
+        item = {
+            'entry': entry,
+            'nbytes': nbytes,
+            'last_access': time.time(),
+            'on_disk': False
+        }
+        if self.shared and df is not None:
+            # 写入共享存储，并改用内存映射的数据，与其他进程共享同一份页缓存
+            self._write_to_disk(session_id, entry)
+            item['on_disk'] = True
+            item['disk_stat'] = self._disk_stat(session_id)
+            entry['dataframe'] = load_frame(self._frame_dir(session_id, entry))
+            item['nbytes'] = int(entry['dataframe'].memory_usage(deep=True).sum())
+        with self._lock:
+            if session_id in self._entries:
+                self._notify_eviction(session_id)
+            self._entries[session_id] = item
+            self._entries.move_to_end(session_id)
+            self._expire()
+            self._enforce_budget(keep=session_id)
+    
+    def get(self, session_id, default=None):
+        """获取会话数据（包含dataframe），不存在、已过期或会话ID无效时返回default"""
+        if not self.valid_id(session_id):
+            return default
+        with self._lock:
+            self._expire()
+            item = self._entries.get(session_id)
+            if item is None:
+                item = self._load_from_disk(session_id)
+                if item is None:
+                    return default
+                self._entries[session_id] = item
+            elif self.shared:
+                item = self._refresh_from_disk(session_id, item)
+            
+            if 'dataframe' not in item['entry']:
+                df = load_frame(self._frame_dir(session_id, item['entry']))
+                if df is None:
+                    del self._entries[session_id]
+                    return default
+                item['entry']['dataframe'] = df
+                item['nbytes'] = int(df.memory_usage(deep=True).sum())
+            
+            if self.shared and item['on_disk'] and time.time() - item['last_access'] > self.DISK_TOUCH_INTERVAL:
+                # 刷新磁盘上的访问时间，避免其他进程按TTL清理仍在使用的会话
+                self._touch_disk(session_id)
+                item['disk_stat'] = self._disk_stat(session_id)
+            item['last_access'] = time.time()
+            self._entries.move_to_end(session_id)
+            self._enforce_budget(keep=session_id)
+            # 返回浅拷贝，避免数据被溢出后调用方持有的字典缺少dataframe
+            return dict(item['entry'])
+    
+    def touch(self, session_id):
+        """
+        刷新会话的访问时间（不加载数据），会话在内存索引中且未过期时返回True
+        共享模式下其他进程已替换会话数据时同时清理本进程的派生缓存
+        """
+        if not self.valid_id(session_id):
+            return False
+        with self._lock:
+            item = self._entries.get(session_id)
+            if item is None or time.time() - item['last_access'] > self.ttl:
+                return False
+            if self.shared:
+                item = self._refresh_from_disk(session_id, item)
+            item['last_access'] = time.time()
+            self._entries.move_to_end(session_id)
+            return True
+    
+    def __getitem__(self, session_id):
+        entry = self.get(session_id)
+        if entry is None:
+            raise KeyError(session_id)
+        return entry
+    
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+    
+    def __delitem__(self, session_id):
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._update_locks.pop(session_id, None)
+            shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+            self._notify_eviction(session_id)
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+    
+    def session_counts(self):
+        """本进程中的会话数：{'memory': 数据驻留内存的会话数, 'disk': 数据已溢出到磁盘的会话数}"""
+        with self._lock:
+            in_memory = sum(1 for item in self._entries.values() if 'dataframe' in item['entry'])
+            return {'memory': in_memory, 'disk': len(self._entries) - in_memory}
+    
+    def memory_usage(self):
+        """当前驻留内存的DataFrame总大小（字节）"""
+        with self._lock:
+            return sum(item['nbytes'] for item in self._entries.values()
+                       if 'dataframe' in item['entry'])
+    
+    def _frame_dir(self, session_id, entry):
+        """会话数据的列式存储目录：按数据版本号分子目录（没有版本号的旧数据直接保存在会话目录中）"""
+        if 'version' not in entry:
+            return self._session_dir(session_id)
+        return os.path.join(self._session_dir(session_id), f"v{entry['version']}")
+    
+    def _write_to_disk(self, session_id, entry):
+        """
+        将会话的DataFrame（列式存储）和元数据写入磁盘
+        数据写入该版本的子目录，再用临时文件原子替换session.json，其他进程读取时要么是完整的旧版本，
+        要么是完整的新版本；保留上一个版本供正在加载它的进程使用，更早的版本删除
+        """
+        directory = self._session_dir(session_id)
+        save_frame(entry['dataframe'], self._frame_dir(session_id, entry))
+        meta = {k: v for k, v in entry.items() if k != 'dataframe'}
+        tmp_path = os.path.join(directory, f'.session_{uuid.uuid4().hex[:8]}.json')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, 'session.json'))
+        for name in os.listdir(directory):
+            match = re.fullmatch(r'v(\d+)', name)
+            if match and int(match.group(1)) < entry['version'] - 1:
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    
+    def _disk_stat(self, session_id):
+        """磁盘上session.json的(inode, 修改时间)，替换或刷新访问时间后都会变化；不存在返回None"""
+        try:
+            stat = os.stat(os.path.join(self._session_dir(session_id), 'session.json'))
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+    
+    def _read_disk_meta(self, session_id):
+        try:
+            with open(os.path.join(self._session_dir(session_id), 'session.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _refresh_from_disk(self, session_id, item):
+        """共享模式：磁盘上的数据版本比本进程的新（其他进程替换了会话数据）时改用磁盘上的版本，并清理派生缓存"""
+        stat = self._disk_stat(session_id)
+        if stat is None or stat == item.get('disk_stat'):
+            return item
+        fresh = self._load_from_disk(session_id)
+        if fresh is None or fresh['entry'].get('version', 0) <= item['entry'].get('version', 0):
+            # 只是访问时间被刷新
+            item['disk_stat'] = stat
+            return item
+        self._entries[session_id] = fresh
+        self._notify_eviction(session_id)
+        return fresh
+    
+    def _touch_disk(self, session_id):
+        try:
+            os.utime(os.path.join(self._session_dir(session_id), 'session.json'))
+        except OSError:
+            pass
+    
+    def _disk_is_fresh(self, session_id, now):
+        """磁盘上的会话在TTL内被访问过（共享模式下可能是其他进程访问的）"""
+        try:
+            return now - os.path.getmtime(os.path.join(self._session_dir(session_id), 'session.json')) <= self.ttl
+        except OSError:
+            return False
+    
+    def _spill(self, session_id, item):
+        """将会话的DataFrame写入磁盘并从内存中释放"""
+        entry = item['entry']
+        if not item['on_disk']:
+            self._write_to_disk(session_id, entry)
+            item['on_disk'] = True
+        entry.pop('dataframe', None)
+        item['nbytes'] = 0
+        self._notify_eviction(session_id)
+    
+    def _load_from_disk(self, session_id):
+        """加载磁盘上的会话元数据（进程重启后仍可访问已溢出的会话）"""
+        path = os.path.join(self._session_dir(session_id), 'session.json')
+        stat = self._disk_stat(session_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return {'entry': entry, 'nbytes': 0, 'last_access': time.time(), 'on_disk': True, 'disk_stat': stat}
+    
+    def _enforce_budget(self, keep=None):
+        """超出内存预算时，按最近最少使用的顺序溢出会话"""
+        total = sum(item['nbytes'] for item in self._entries.values())
+        for session_id, item in list(self._entries.items()):
+            if total <= self.memory_budget:
+                break
+            if session_id == keep or 'dataframe' not in item['entry']:
+                continue
+            nbytes = item['nbytes']
+            try:
+                self._spill(session_id, item)
+            except OSError as e:
+                app.logger.warning('会话数据写入磁盘失败: %s', e)
+                continue
+            total -= nbytes
+    
+    def _expire(self):
+        """删除超过TTL未访问的会话"""
+        now = time.time()
+        for session_id, item in list(self._entries.items()):
+            if now - item['last_access'] > self.ttl:
+                del self._entries[session_id]
+                self._update_locks.pop(session_id, None)
+                # 共享模式下其他进程仍在使用的会话只从本进程内存中移除
+                if not (self.shared and self._disk_is_fresh(session_id, now)):
+                    shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+                self._notify_eviction(session_id)
+        
+        # 定期清理磁盘上遗留的过期会话（例如进程重启前溢出的数据）
+        if now - self._last_disk_sweep < self.DISK_SWEEP_INTERVAL or not os.path.isdir(self.folder):
+            return
+        self._last_disk_sweep = now
+        for entry in os.scandir(self.folder):
+            if not entry.is_dir() or entry.name in self._entries:
+                continue
+            try:
+                expired = now - os.path.getmtime(os.path.join(entry.path, 'session.json')) > self.ttl
+            except OSError:
+                expired = not entry.name.startswith('.')
+            if expired:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+# 存储上传的文件数据（按内存预算和过期时间管理的会话存储）
+uploaded_data = SessionStore(
+    app.config['SESSION_FOLDER'],
+    memory_budget=app.config['SESSION_MEMORY_BUDGET'],
+    ttl=app.config['SESSION_TTL'],
+    shared=app.config['SESSION_SHARED']
+)
+
+# 关键字归类结果缓存：按（会话ID, 关键字集合）缓存全量数据的归类结果
+app.config['KEYWORD_CACHE_SIZE'] = 16
+keyword_classification_cache = LRUCache(app.config['KEYWORD_CACHE_SIZE'])
+uploaded_data.add_eviction_listener(
+    lambda session_id: keyword_classification_cache.discard_if(lambda key: key[0] == session_id)
+)
+
+# /analyze结果缓存：按（会话ID, 归类方式, 过滤条件签名）缓存序列化后的JSON
+app.config['ANALYZE_CACHE_SIZE'] = 256
+analyze_result_cache = LRUCache(app.config['ANALYZE_CACHE_SIZE'])
+uploaded_data.add_eviction_listener(
+    lambda session_id: analyze_result_cache.discard_if(lambda key: key[0] == session_id)
+)
+
+# 模块/状态过滤位图索引：按会话ID缓存，上传时建立，会话数据替换或溢出时失效
+app.config['FILTER_INDEX_CACHE_SIZE'] = 16
+filter_index_cache = LRUCache(app.config['FILTER_INDEX_CACHE_SIZE'])
+uploaded_data.add_eviction_listener(lambda session_id: filter_index_cache.discard_if(lambda key: key == session_id))
+
+# 增量合并的行键索引（RowKeyIndex）：按会话ID缓存合并后数据的索引，下一次增量合并直接使用，会话数据替换或溢出时失效
+app.config['MERGE_KEY_CACHE_SIZE'] = 16
+merge_key_cache = LRUCache(app.config['MERGE_KEY_CACHE_SIZE'])
+uploaded_data.add_eviction_listener(lambda session_id: merge_key_cache.discard_if(lambda key: key == session_id))
+
+# 图表明细（/rows）的行号缓存：按（会话ID, 过滤条件和图表部分的签名）缓存匹配的行号，翻页时直接切片
+app.config['ROWS_CACHE_SIZE'] = 16
+app.config['ROWS_PAGE_SIZE'] = 100
+app.config['ROWS_MAX_PAGE_SIZE'] = 1000
+rows_selection_cache = LRUCache(app.config['ROWS_CACHE_SIZE'])
+uploaded_data.add_eviction_listener(
+    lambda session_id: rows_selection_cache.discard_if(lambda key: key[0] == session_id)
+)
+
+def get_filter_index(session_id, df):
+    """获取会话数据的过滤位图索引，不存在时（其他进程上传或已失效）重新建立"""
+    index = filter_index_cache.get(session_id)
+    if index is None or index.rows != len(df):
+        index = FilterIndex(df)
+        filter_index_cache.put(session_id, index)
+    return index
+
+def analyze_cache_key(session_id, params):
+    """
+    根据/analyze的请求参数生成缓存键
+    模块、状态、关键字按集合处理（与顺序无关），并包含关键字文件版本；停留天数随日期变化，包含当前日期
+    """
+    mode = params.get('classification_mode', 'manual')
+    signature = {
+        'modules': sorted({str(m) for m in params.get('modules') or []}),
+        'statuses': sorted({str(s) for s in params.get('statuses') or []}),
+        'classification_mode': mode,
+        'keywords': sorted(_normalize_keywords(params.get('keywords'))) if mode == 'keyword' else [],
+        'export_format': params.get('export_format', 'xlsx') if mode == 'keyword' else None,
+        'stay_buckets': bool(params.get('stay_buckets', False)),
+        'compact': bool(params.get('compact', False)),
+        'date_from': params.get('date_from') or None,
+        'date_to': params.get('date_to') or None,
+        'granularity': params.get('granularity'),
+        'today': _today_day_number(),
+        'keywords_version': keyword_registry.version
+    }
+    digest = hashlib.sha256(json.dumps(signature, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return (session_id, mode, digest.hexdigest())
+
+def rows_cache_key(session_id, params):
+    """根据/rows的请求参数生成行号缓存键（不包含分页和列参数）；停留天数随日期变化，包含当前日期"""
+    mode = params.get('classification_mode', 'manual')
+    signature = {
+        'modules': sorted({str(m) for m in params.get('modules') or []}),
+        'statuses': sorted({str(s) for s in params.get('statuses') or []}),
+        'classification_mode': mode,
+        'keywords': sorted(_normalize_keywords(params.get('keywords'))) if mode == 'keyword' else [],
+        'segment': params.get('segment'),
+        'today': _today_day_number(),
+        'keywords_version': keyword_registry.version
+    }
+    digest = hashlib.sha256(json.dumps(signature, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return (session_id, digest.hexdigest())
+
+def _analyze_response(bodies, cache_status):
     """
-    根据缺陷数据生成统计分析
-    按照图片中的统计规则实现
-    
-    Args:
-        df: 数据框
-        selected_modules: 选中的模块列表
-        selected_statuses: 选中的状态列表
+    返回/analyze的JSON响应
+    bodies为缓存项{编码: 响应体}，'identity'为未压缩的响应体；
+    按Accept-Encoding选择的压缩结果首次计算后存回缓存项，缓存命中时不再重复压缩
+    """
+    body = bodies['identity']
+    encoding = negotiate_encoding() if len(body) >= app.config['JSON_COMPRESS_MIN_BYTES'] else None
+    if encoding:
+        if encoding not in bodies:
+            with record_stage('compress'):
+                bodies[encoding] = compress_body(body, encoding)
+        body = bodies[encoding]
+    response = app.response_class(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['X-Analyze-Cache'] = cache_status
+    return response
+
+class ExportJobs:
+    """
+    后台导出任务管理
+    导出在工作线程中执行，请求立即返回任务ID；排队中和执行中的任务总数有上限
+    任务ID由输出文件名决定，同一份导出不会重复执行
+    指定status_folder时任务状态同时写入磁盘，多进程部署下任一进程都能查询任务状态
+    执行中的任务持有输出目录中的锁文件（O_CREAT|O_EXCL创建），多进程部署下同一份导出只由一个进程写出
     """
-    # 应用状态映射
-    df = apply_status_mapping(df)
     
-    # 如果指定了模块过滤
-    if selected_modules and '缺陷模块' in df.columns:
-        # 检查是否选中了"（空）"选项
-        if '（空）' in selected_modules:
-            # 移除"（空）"选项，单独处理
-            selected_modules_copy = [m for m in selected_modules if m != '（空）']
-            # 筛选：模块在选中列表中 或 模块为空
-            if selected_modules_copy:
-                df = df[df['缺陷模块'].isin(selected_modules_copy) | df['缺陷模块'].isna()]
-            else:
-                # 只选中了"（空）"
-                df = df[df['缺陷模块'].isna()]
-        else:
-            # 没有选中"（空）"，按正常逻辑过滤
-            df = df[df['缺陷模块'].isin(selected_modules)]
+    # 已结束任务的保留时间（秒）
+    FINISHED_TTL = 3600
+    # 锁文件超过该时间（秒）未刷新时视为持有进程已退出
+    LOCK_STALE_SECONDS = 300
     
-    # 如果指定了状态过滤
-    # selected_statuses 是映射后的状态（如"待修复"），需要转换为原始状态进行筛选
-    if selected_statuses:
-        # 创建反向映射：从映射后的状态找到所有对应的原始状态
-        reverse_mapping = {}
-        for original_status, mapped_status in STATUS_MAPPING.items():
-            if mapped_status not in reverse_mapping:
-                reverse_mapping[mapped_status] = []
-            reverse_mapping[mapped_status].append(original_status)
-        
-        # 将映射后的状态转换为原始状态列表
-        original_statuses = []
-        status_col = '原始状态' if '原始状态' in df.columns else '状态'
+    def __init__(self, workers, queue_size, status_folder=None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.status_folder = status_folder
+    
+    def submit(self, job_id, filepath, write_func, on_failure=None):
+        """
+        提交导出任务：write_func(path, progress)负责写出文件并通过progress(比例)报告进度，
+        失败时调用on_failure()
+        先写入临时文件，完成后重命名，下载时不会拿到不完整的文件
+        任务已存在（排队、执行中或已完成，包括其他进程中的任务）时直接返回；队列已满时返回None
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job and (job['status'] in ('queued', 'running') or
+                        (job['status'] == 'done' and os.path.exists(filepath))):
+                return job_id
+            if job is None:
+                # 其他进程已完成的任务：读取磁盘上的状态
+                other = self._read_status(job_id)
+                if other is not None and other['status'] == 'done' and os.path.exists(filepath):
+                    return job_id
+            if not self._slots.acquire(blocking=False):
+                return None
+            if not self._acquire_file_lock(filepath):
+                # 其他进程正在写出同一份导出，任务状态从磁盘读取
+                self._slots.release()
+                return job_id
+            self._jobs[job_id] = {
+                'status': 'queued',
+                'progress': 0.0,
+                'filename': os.path.basename(filepath),
+                'partial_path': None,
+                'error': None,
+                'finished_at': None
+            }
+            self._save_status(job_id)
+        self._executor.submit(self._run, job_id, filepath, write_func, on_failure)
+        return job_id
+    
+    def counts(self):
+        """本进程中各状态（queued/running/done/failed）的任务数"""
+        with self._lock:
+            result = {}
+            for job in self._jobs.values():
+                result[job['status']] = result.get(job['status'], 0) + 1
+            return result
+    
+    def _run(self, job_id, filepath, write_func, on_failure):
+        job = self._jobs[job_id]
+        job['status'] = 'running'
+        # 临时文件保留扩展名（写出引擎按扩展名判断格式），且不带下载前缀
+        directory, filename = os.path.split(filepath)
+        tmp_path = os.path.join(directory, f'tmp_{uuid.uuid4().hex[:8]}_{filename}')
+        job['partial_path'] = tmp_path
+        self._save_status(job_id)
         
-        if status_col in df.columns:
-            # 获取所有原始状态
-            all_original_statuses = df[status_col].dropna().unique().tolist()
-            
-            for mapped_status in selected_statuses:
-                if mapped_status in reverse_mapping:
-                    # 找到映射到这个状态的所有原始状态
-                    original_statuses.extend(reverse_mapping[mapped_status])
-                else:
-                    # 如果不在映射表中，说明本身就是原始状态（如"已关闭"、"已解决"等）
-                    if mapped_status in all_original_statuses:
-                        original_statuses.append(mapped_status)
-            
-            # 去重并筛选
-            if original_statuses:
-                original_statuses = list(set(original_statuses))
-                df = df[df[status_col].isin(original_statuses)]
+        def report(fraction):
+            # 重命名完成前进度最多到99%
+            job['progress'] = round(min(fraction, 0.99), 4)
+            self._save_status(job_id)
+            self._refresh_file_lock(filepath)
+        
+        # 导出在工作线程中执行，单独记录各环节耗时，完成后保存在任务状态中
+        recorder = StageRecorder()
+        token = _current_stages.set(recorder)
+        try:
+            write_func(tmp_path, report)
+            with record_stage('export.replace'):
+                self._replace(tmp_path, filepath)
+            job['progress'] = 1.0
+            job['status'] = 'done'
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+            app.logger.exception('导出任务 %s 失败', job_id)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            if on_failure is not None:
+                on_failure()
+        finally:
+            _current_stages.reset(token)
+            job['timings'] = recorder.as_list()
+            job['finished_at'] = time.time()
+            self._save_status(job_id)
+            self._release_file_lock(filepath)
+            self._slots.release()
     
-    stats = {}
-    current_date = datetime.now()
+    @staticmethod
+    def _lock_path(filepath):
+        # 以"."开头，不会被当作导出文件下载
+        directory, filename = os.path.split(filepath)
+        return os.path.join(directory, f'.{filename}.lock')
     
-    # 1. 不同状态下，统计缺陷数量【count(标题)】
-    # 使用映射后状态，将新建、修复中、待修复合并显示为"待修复"
-    if '映射后状态' in df.columns and '标题' in df.columns:
-        status_count = df.groupby('映射后状态')['标题'].count().to_dict()
-        stats['status_count'] = status_count
-    elif '状态' in df.columns and '标题' in df.columns:
-        status_count = df.groupby('状态')['标题'].count().to_dict()
-        stats['status_count'] = status_count
-    else:
-        stats['status_count'] = {}
+    def _acquire_file_lock(self, filepath):
+        """创建任务的锁文件，已被其他进程持有时返回False；持有进程超时未刷新的锁文件会被清除"""
+        path = self._lock_path(filepath)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    stale = time.time() - os.path.getmtime(path) > self.LOCK_STALE_SECONDS
+                except OSError:
+                    stale = True  # 锁文件刚被删除，重试
+                if not stale:
+                    return False
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
     
-    # 2. 缺陷停留时长
-    # 统计状态为待修复的缺陷（新建、修复中、待修复等已映射为待修复）
-    # 停留时长 = 当前时间所在天 - 创建时间所在天（单位：天）
-    if '映射后状态' in df.columns and '创建时间' in df.columns and '标题' in df.columns:
-        # 筛选映射后状态为'待修复'的缺陷（包括原始的新建、修复中等）
-        pending_defects = df[df['映射后状态'] == '待修复'].copy()
-        if len(pending_defects) > 0:
-            # 解析创建时间为日期
-            pending_defects['创建时间_dt'] = pd.to_datetime(pending_defects['创建时间'], errors='coerce')
-            # 计算停留天数：当前日期 - 创建日期
-            pending_defects['停留天数'] = pending_defects['创建时间_dt'].apply(
-                lambda x: (current_date.date() - x.date()).days if pd.notna(x) else None
-            )
-            # 过滤掉None值（创建时间解析失败的）
-            pending_defects = pending_defects[pending_defects['停留天数'].notna()]
-            # 按停留天数分组，统计每个天数对应的缺陷数量
-            if len(pending_defects) > 0:
-                stay_duration = pending_defects.groupby('停留天数')['标题'].count().to_dict()
-                # 转换为字符串键，方便JSON序列化
-                stats['stay_duration'] = {str(int(k)): int(v) for k, v in sorted(stay_duration.items())}
-            else:
-                stats['stay_duration'] = {}
-        else:
-            stats['stay_duration'] = {}
-    else:
-        stats['stay_duration'] = {}
+    def _refresh_file_lock(self, filepath):
+        try:
+            os.utime(self._lock_path(filepath))
+        except OSError:
+            pass
     
-    # 3. 每日新增/修复缺陷情况
-    daily_stats = {}
+    def _release_file_lock(self, filepath):
+        try:
+            os.remove(self._lock_path(filepath))
+        except OSError:
+            pass
     
-    # 每日新增：创建时间为对应天的缺陷数量
-    if '创建时间' in df.columns and '标题' in df.columns:
-        df_copy = df.copy()
-        # 将创建时间转换为日期（去掉时分秒）
-        df_copy['创建日期'] = pd.to_datetime(df_copy['创建时间'], errors='coerce').dt.date
-        # 按创建日期分组统计缺陷数量，过滤掉空日期
-        df_copy = df_copy[df_copy['创建日期'].notna()]
-        if len(df_copy) > 0:
-            daily_new = df_copy.groupby('创建日期')['标题'].count().to_dict()
-            # 按日期排序并格式化
-            daily_stats['daily_new'] = {k.strftime('%Y-%m-%d'): int(v) for k, v in sorted(daily_new.items())}
-        else:
-            daily_stats['daily_new'] = {}
-    else:
-        daily_stats['daily_new'] = {}
+    @staticmethod
+    def _replace(src, dst, attempts=20):
+        # Windows下文件正被边生成边下载读取时重命名会暂时失败，稍后重试
+        for attempt in range(attempts):
+            try:
+                os.replace(src, dst)
+                return
+            except PermissionError:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.1)
     
-    # 每日修复：待验证状态且更新时间为对应天 + 已关闭状态且完成时间为对应天
-    # 使用原始状态列进行统计
-    daily_fixed = {}
+    def _status_path(self, job_id):
+        return os.path.join(self.status_folder, job_id + '.json')
     
-    # 1) 待验证状态的缺陷，使用更新时间
-    status_col = '原始状态' if '原始状态' in df.columns else '状态'
-    if status_col in df.columns and '更新时间' in df.columns and '标题' in df.columns:
-        pending_verify = df[df[status_col] == '待验证'].copy()
-        if len(pending_verify) > 0:
-            # 将更新时间转换为日期
-            pending_verify['更新日期'] = pd.to_datetime(pending_verify['更新时间'], errors='coerce').dt.date
-            # 过滤掉空日期
-            pending_verify = pending_verify[pending_verify['更新日期'].notna()]
-            if len(pending_verify) > 0:
-                # 按更新日期统计
-                for date, count in pending_verify.groupby('更新日期')['标题'].count().items():
-                    date_str = date.strftime('%Y-%m-%d')
-                    daily_fixed[date_str] = daily_fixed.get(date_str, 0) + int(count)
-    
-    # 2) 已关闭状态的缺陷，使用完成时间
-    if status_col in df.columns and '完成时间' in df.columns and '标题' in df.columns:
-        closed = df[df[status_col] == '已关闭'].copy()
-        if len(closed) > 0:
-            # 将完成时间转换为日期
-            closed['完成日期'] = pd.to_datetime(closed['完成时间'], errors='coerce').dt.date
-            # 过滤掉空日期
-            closed = closed[closed['完成日期'].notna()]
-            if len(closed) > 0:
-                # 按完成日期统计
-                for date, count in closed.groupby('完成日期')['标题'].count().items():
-                    date_str = date.strftime('%Y-%m-%d')
-                    daily_fixed[date_str] = daily_fixed.get(date_str, 0) + int(count)
-    
-    # 按日期排序
-    daily_stats['daily_fixed'] = {k: v for k, v in sorted(daily_fixed.items())}
-    stats['daily_stats'] = daily_stats
+    def _save_status(self, job_id):
+        """将任务状态写入磁盘（先写临时文件再替换，读取方不会读到写了一半的内容）"""
+        if self.status_folder is None:
+            return
+        path = self._status_path(job_id)
+        tmp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+        try:
+            os.makedirs(self.status_folder, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._jobs[job_id], f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            app.logger.warning('导出任务状态写入失败: %s', e)
     
-    # 4. 缺陷分析归类统计（饼图）
-    if classification_mode == 'keyword' and keywords and '标题' in df.columns:
-        # 关键字匹配归类模式
-        df_analysis = df.copy()
-        df_analysis['关键字归类'] = '其他'  # 默认归类为"其他"
-        
-        # 对每一行进行关键字匹配
-        for idx in df_analysis.index:
-            matched_keywords = []
-            title = str(df_analysis.loc[idx, '标题']) if pd.notna(df_analysis.loc[idx, '标题']) else ''
-            
-            # 检查每个关键字是否匹配
-            for keyword in keywords:
-                if keyword and keyword.strip():
-                    keyword = keyword.strip()
-                    if keyword.lower() in title.lower():
-                        matched_keywords.append(keyword)
-            
-            # 如果匹配到多个关键字，随机选择一个
-            if matched_keywords:
-                df_analysis.loc[idx, '关键字归类'] = random.choice(matched_keywords)
-        
-        analysis_count = df_analysis.groupby('关键字归类')['标题'].count().to_dict()
-        stats['analysis_type_count'] = analysis_count
-        # 保存带关键字归类的数据框，用于后续导出Excel
-        stats['_df_with_keyword_classification'] = df_analysis
-    else:
-        # 人工归类模式（原有功能）
-        # 支持多种列名：缺陷分析类型、缺陷分析归类、缺陷分类
-        analysis_col = None
-        for col_name in ['缺陷分析类型', '缺陷分析归类', '缺陷分类']:
-            if col_name in df.columns:
-                analysis_col = col_name
-                break
-        
-        if analysis_col and '标题' in df.columns:
-            df_analysis = df.copy()
-            # 将空值替换为"（空）"，以便在图表中显示
-            df_analysis['分析类型_显示'] = df_analysis[analysis_col].fillna('（空）')
-            analysis_count = df_analysis.groupby('分析类型_显示')['标题'].count().to_dict()
-            stats['analysis_type_count'] = analysis_count
-        else:
-            stats['analysis_type_count'] = {}
+    def status(self, job_id):
+        """获取任务状态，本进程没有该任务时读取磁盘上的状态，任务不存在返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self._read_status(job_id)
     
-    return stats
+    def _read_status(self, job_id):
+        if self.status_folder is None:
+            return None
+        try:
+            with open(self._status_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job['finished_at'] and now - job['finished_at'] > self.FINISHED_TTL:
+                del self._jobs[job_id]
+                if self.status_folder is not None:
+                    try:
+                        os.remove(self._status_path(job_id))
+                    except OSError:
+                        pass
 
-def get_module_list(df):
-    """
-    获取缺陷模块列表（去重），包含空值选项
-    """
-    if '缺陷模块' in df.columns:
-        # 获取非空模块
-        modules = df['缺陷模块'].dropna().unique().tolist()
-        modules = sorted(modules)
-        
-        # 检查是否有空模块，如果有则添加"（空）"选项
-        has_empty = df['缺陷模块'].isna().any()
-        if has_empty:
-            modules.insert(0, '（空）')  # 在列表开头添加空选项
-        
-        return modules
-    return []
+export_jobs = ExportJobs(app.config['EXPORT_WORKERS'], app.config['EXPORT_QUEUE_SIZE'],
+                         status_folder=app.config['EXPORT_STATUS_FOLDER'])
 
-def get_status_list(df):
+class ChunkOffsetMismatch(Exception):
+    """分块的偏移量与服务端已接收的大小不一致（客户端应从received处续传）"""
+    
+    def __init__(self, received):
+        super().__init__(f'已接收 {received} 字节')
+        self.received = received
+
+class ChunkedUploads:
     """
-    获取状态列表（去重），返回映射后的状态
-    新建、修复中、待修复等会合并显示为"待修复"
+    分块续传上传
+    - 上传信息（文件名、总大小等）保存在<上传ID>.json，分块按偏移量依次追加到<上传ID>.part
+    - 每个分块带CRC32校验和，边读取请求边写入文件，校验失败时截断到分块开始前的位置
+    - 状态都保存在磁盘上，连接中断、服务重启或由其他工作进程处理后续分块时都能从已接收的位置续传
+    - 完成时将.part文件原地重命名为上传文件并直接解析，不再复制一份
     """
-    # 复制数据框避免修改原始数据
-    df_copy = df.copy()
-    # 先应用状态映射
-    df_copy = apply_status_mapping(df_copy)
-    
-    # 使用映射后的状态列
-    if '映射后状态' in df_copy.columns:
-        # 获取非空状态（映射后的）
-        statuses = df_copy['映射后状态'].dropna().unique().tolist()
-        statuses = sorted(statuses)
-        return statuses
-    elif '状态' in df_copy.columns:
-        # 如果没有映射后状态，使用原始状态
-        statuses = df_copy['状态'].dropna().unique().tolist()
-        statuses = sorted(statuses)
-        return statuses
-    return []
+    
+    # 读取请求体时每次读取的字节数
+    READ_SIZE = 1024 * 1024
+    
+    def __init__(self, folder, ttl):
+        self.folder = folder
+        self.ttl = ttl
+        self._locks = {}
+        self._hashes = {}  # 上传ID -> (已计算的字节数, SHA-256)，边接收边计算内容哈希
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def valid_id(upload_id):
+        return bool(re.fullmatch(r'[0-9a-f]{32}', upload_id or ''))
+    
+    def _path(self, upload_id, suffix):
+        return os.path.join(self.folder, upload_id + suffix)
+    
+    def _id_lock(self, upload_id):
+        with self._lock:
+            return self._locks.setdefault(upload_id, threading.Lock())
+    
+    def create(self, filename, size, all_sheets=False):
+        """创建上传任务，返回上传信息（含upload_id）"""
+        os.makedirs(self.folder, exist_ok=True)
+        self.prune()
+        upload_id = uuid.uuid4().hex
+        meta = {'upload_id': upload_id, 'filename': filename, 'size': size, 'all_sheets': all_sheets,
+                'created_at': datetime.now().isoformat(timespec='seconds')}
+        open(self._path(upload_id, '.part'), 'wb').close()
+        tmp_path = self._path(upload_id, '.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(upload_id, '.json'))
+        self._hashes[upload_id] = (0, hashlib.sha256())
+        return dict(meta, received=0)
+    
+    def get(self, upload_id):
+        """返回上传信息和已接收的字节数（received），不存在时返回None"""
+        if not self.valid_id(upload_id):
+            return None
+        try:
+            with open(self._path(upload_id, '.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['received'] = os.path.getsize(self._path(upload_id, '.part'))
+        except (OSError, ValueError):
+            return None
+        return meta
+    
+    @contextmanager
+    def _open_part(self, upload_id):
+        """打开.part文件，多进程时加文件锁（进程内由调用方持有该上传任务的锁）"""
+        with open(self._path(upload_id, '.part'), 'r+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield f
+    
+    def append(self, upload_id, offset, stream, length, crc32):
+        """
+        从stream读取length字节追加到offset处，返回已接收的总字节数
+        offset与已接收的大小不一致时抛出ChunkOffsetMismatch；超出文件大小、数据不完整或校验和不一致时抛出ValueError
+        """
+        meta = self.get(upload_id)
+        if meta is None:
+            raise KeyError(upload_id)
+        with self._id_lock(upload_id), self._open_part(upload_id) as f:
+            received = os.fstat(f.fileno()).st_size
+            if offset != received:
+                raise ChunkOffsetMismatch(received)
+            if received + length > meta['size']:
+                raise ValueError(f'分块超出文件大小（{meta["size"]} 字节）')
+            hashed, digest = self._hashes.get(upload_id, (None, None))
+            digest = digest.copy() if hashed == received else None
+            f.seek(received)
+            checksum = 0
+            written = 0
+            while written < length:
+                block = stream.read(min(self.READ_SIZE, length - written))
+                if not block:
+                    break
+                checksum = zlib.crc32(block, checksum)
+                if digest is not None:
+                    digest.update(block)
+                f.write(block)
+                written += len(block)
+            if written != length or checksum != crc32:
+                # 丢弃不完整或损坏的分块，客户端重新发送
+                f.truncate(received)
+                raise ValueError('分块数据不完整' if written != length else '分块校验和不一致')
+            f.flush()
+            if digest is not None:
+                self._hashes[upload_id] = (received + written, digest)
+            else:
+                # 之前的分块由其他进程接收，完成时再读取文件计算哈希
+                self._hashes.pop(upload_id, None)
+            return received + written
+    
+    def complete(self, upload_id, filepath, expected_sha256=None):
+        """
+        上传完成：校验内容哈希后将.part文件重命名为filepath，返回（上传信息, SHA-256）
+        未接收完整时抛出ChunkOffsetMismatch，哈希与expected_sha256不一致时抛出ValueError
+        """
+        meta = self.get(upload_id)
+        if meta is None:
+            raise KeyError(upload_id)
+        with self._id_lock(upload_id):
+            with self._open_part(upload_id) as f:
+                received = os.fstat(f.fileno()).st_size
+                if received != meta['size']:
+                    raise ChunkOffsetMismatch(received)
+                hashed, digest = self._hashes.get(upload_id, (None, None))
+                if hashed != received:
+                    digest = hashlib.sha256()
+                    for block in iter(lambda: f.read(self.READ_SIZE), b''):
+                        digest.update(block)
+            content_hash = digest.hexdigest()
+            if expected_sha256 and expected_sha256.lower() != content_hash:
+                raise ValueError('文件内容哈希不一致')
+            # 关闭后再重命名（Windows下无法重命名已打开的文件）
+            os.replace(self._path(upload_id, '.part'), filepath)
+        self._remove(upload_id)
+        return meta, content_hash
+    
+    def abort(self, upload_id):
+        """取消上传并删除已接收的数据，返回是否存在"""
+        if self.get(upload_id) is None:
+            return False
+        with self._id_lock(upload_id):
+            self._remove(upload_id, '.part')
+        return True
+    
+    def _remove(self, upload_id, *suffixes):
+        for suffix in ('.json',) + suffixes:
+            try:
+                os.remove(self._path(upload_id, suffix))
+            except OSError:
+                pass
+        self._hashes.pop(upload_id, None)
+        with self._lock:
+            self._locks.pop(upload_id, None)
+    
+    def prune(self):
+        """删除超过ttl未继续上传的任务（按上传信息和已接收数据的最后修改时间）"""
+        if not os.path.isdir(self.folder):
+            return
+        last_modified = {}
+        for entry in os.scandir(self.folder):
+            upload_id = entry.name.split('.', 1)[0]
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            last_modified[upload_id] = max(last_modified.get(upload_id, 0), mtime)
+        expire_before = time.time() - self.ttl
+        for upload_id, mtime in last_modified.items():
+            if mtime < expire_before:
+                self._remove(upload_id, '.part', '.json.tmp')
+
+chunked_uploads = ChunkedUploads(app.config['UPLOAD_PARTIAL_FOLDER'], app.config['UPLOAD_PARTIAL_TTL'])
 
-# 存储上传的文件数据（临时存储）
-uploaded_data = {}
+def get_keyword_classification(session_id, df, keywords):
+    """获取会话全量数据的关键字归类结果，每个（会话, 关键字集合）只计算一次"""
+    key = (session_id, tuple(sorted(_normalize_keywords(keywords))))
+    classification = keyword_classification_cache.get(key)
+    if classification is None:
+        with record_stage('keyword_classification', rows=len(df)):
+            classification = classify_keywords_deterministic(df['标题'], keywords)
+        keyword_classification_cache.put(key, classification)
+    return classification
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def _ingest_upload(uploads, all_sheets=False):
+    """
+    读取并预处理上传的Excel文件，相同内容的文件直接从解析缓存加载；返回（数据, 读取统计）
+    uploads为[(文件路径, 原始文件名, 内容哈希)]；多个文件或读取全部工作表时并行解析并增加来源列
+    """
+    ingest_all = app.config['INGEST_ALL_COLUMNS']
+    columns = None if ingest_all else INGEST_COLUMNS
+    multi = len(uploads) > 1 or all_sheets
+    if multi:
+        # 来源列包含文件名，缓存键同时包含文件名
+        signature = json.dumps([[name, content_hash] for _, name, content_hash in uploads], ensure_ascii=False)
+        digest = hashlib.sha256(signature.encode('utf-8')).hexdigest()
+        cache_key = f"multi_{digest}_{'sheets' if all_sheets else 'first'}_{'all' if ingest_all else 'core'}"
+    else:
+        cache_key = f"{uploads[0][2]}_{'all' if ingest_all else 'core'}"
+    start = time.perf_counter()
+    with record_stage('cache_load') as stage:
+        df = load_cached_frame(cache_key)
+        stage.rows = None if df is None else len(df)
+    if df is not None:
+        ingest_stats = {
+            'rows': len(df),
+            'columns': list(df.columns),
+            'seconds': round(time.perf_counter() - start, 3),
+            'cached': True
+        }
+        return df, ingest_stats
+    
+    # 流式读取Excel文件（INGEST_ALL_COLUMNS为False时只保留统计分析用到的列）
+    with record_stage('parse') as stage:
+        if multi:
+            df, ingest_stats = read_defect_sources(
+                [(path, name) for path, name, _ in uploads], columns=columns, all_sheets=all_sheets,
+                processes=app.config['INGEST_PROCESSES'], parallel_min_bytes=app.config['INGEST_PARALLEL_MIN_BYTES']
+            )
+        else:
+            df, ingest_stats = read_defect_excel(uploads[0][0], columns=columns)
+        stage.rows = len(df)
+    for source in ingest_stats.get('sources', []):
+        app.logger.info('读取 %s/%s: %d 行, 耗时 %.2f 秒%s', source['file'], source['sheet'],
+                        source['rows'], source['seconds'], '（跳过）' if source['skipped'] else '')
+    # 一次性预处理（时间解析、状态映射、类型转换），缓存的是预处理后的数据
+    normalize_defect_frame(df)
+    ingest_stats['cached'] = False
+    app.logger.info(
+        '读取 %s: %d 行, 耗时 %.2f 秒, %s 行/秒, 峰值内存 %s MB',
+        ', '.join(name for _, name, _ in uploads), ingest_stats['rows'], ingest_stats['seconds'],
+        ingest_stats['rows_per_sec'], ingest_stats['peak_memory_mb']
+    )
+    try:
+        with record_stage('cache_store', rows=len(df)):
+            store_cached_frame(cache_key, df)
+    except OSError as e:
+        app.logger.warning('写入解析缓存失败: %s', e)
+    return df, ingest_stats
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """上传文件并返回模块列表"""
-    if 'file' not in request.files:
-        return jsonify({'error': '没有选择文件'}), 400
-    
-    file = request.files['file']
-    
-    if file.filename == '':
+    # 支持一次上传多个文件，all_sheets=1时读取每个文件的全部工作表
+    files = [file for file in request.files.getlist('file') if file.filename != '']
+    if not files:
         return jsonify({'error': '没有选择文件'}), 400
     
-    if not file.filename.endswith('.xlsx'):
-        return jsonify({'error': '请上传Excel文件(.xlsx格式)'}), 400
+    for file in files:
+        if not file.filename.endswith('.xlsx'):
+            return jsonify({'error': '请上传Excel文件(.xlsx格式)'}), 400
+    all_sheets = request.form.get('all_sheets') in ('1', 'true')
     
     try:
-        # 保存上传的文件
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"defect_data_{timestamp}.xlsx"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # 读取Excel文件
-        df = pd.read_excel(filepath)
+        # 保存上传的文件（会话ID包含随机后缀，同一秒内的上传互不覆盖）
+        timestamp = SessionStore.new_id()
+        uploads = []
+        with record_stage('save'):
+            for i, file in enumerate(files):
+                filepath = _upload_filepath(timestamp, i)
+                uploads.append((filepath, file.filename, _save_upload(file, filepath)))
+        return jsonify(_create_session(timestamp, uploads, all_sheets))
         
-        # 获取模块列表和状态列表
+    except Exception as e:
+        return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
+
+def _upload_filepath(timestamp, index):
+    filename = f"defect_data_{timestamp}.xlsx" if index == 0 else f"defect_data_{timestamp}_{index}.xlsx"
+    return os.path.join(app.config['UPLOAD_FOLDER'], filename)
+
+def _create_session(timestamp, uploads, all_sheets=False):
+    """解析已保存的上传文件并创建会话，返回上传接口的响应内容"""
+    df, ingest_stats = _ingest_upload(uploads, all_sheets)
+    
+    # 获取模块列表和状态列表
+    with record_stage('lists', rows=len(df)):
         modules = get_module_list(df)
         statuses = get_status_list(df)
-        
-        # 存储数据（使用timestamp作为key）
+    
+    # 存储数据（使用timestamp作为key）
+    with record_stage('store_session', rows=len(df)):
         uploaded_data[timestamp] = {
-            'filepath': filepath,
+            'filepath': uploads[0][0],
+            'filepaths': [path for path, _, _ in uploads],
             'dataframe': df,
             'modules': modules,
             'statuses': statuses
         }
+    # 上传时建立过滤位图索引，之后的每次/analyze只做位运算
+    with record_stage('filter_index', rows=len(df)) as stage:
+        get_filter_index(timestamp, df)
+    ingest_stats['filter_index_seconds'] = round(stage.seconds, 3)
+    
+    return {
+        'success': True,
+        'timestamp': timestamp,
+        'modules': modules,
+        'statuses': statuses,
+        'total_records': len(df),
+        'ingest': ingest_stats
+    }
+
+@app.route('/upload/chunked', methods=['POST'])
+def chunked_upload_init():
+    """
+    分块上传第1步：创建上传任务，请求体为{"filename": 文件名, "size": 字节数}
+    之后按offset依次PUT各分块，全部上传后调用/upload/chunked/finalize
+    """
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename') or ''
+    size = data.get('size')
+    if not filename.endswith('.xlsx'):
+        return jsonify({'error': '请上传Excel文件(.xlsx格式)'}), 400
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return jsonify({'error': '文件大小无效'}), 400
+    if size > app.config['UPLOAD_MAX_BYTES']:
+        return jsonify({'error': f"文件超过大小上限（{app.config['UPLOAD_MAX_BYTES'] // 1024 // 1024}MB）"}), 413
+    upload = chunked_uploads.create(os.path.basename(filename), size)
+    upload['chunk_size'] = min(app.config['UPLOAD_CHUNK_BYTES'], app.config['MAX_CONTENT_LENGTH'])
+    return jsonify(upload)
+
+@app.route('/upload/chunked/<upload_id>', methods=['GET'])
+def chunked_upload_status(upload_id):
+    """查询已接收的字节数（received），连接中断后从该位置续传"""
+    upload = chunked_uploads.get(upload_id)
+    if upload is None:
+        return jsonify({'error': '上传任务不存在或已过期'}), 404
+    return jsonify(upload)
+
+@app.route('/upload/chunked/<upload_id>', methods=['PUT'])
+def chunked_upload_append(upload_id):
+    """
+    分块上传第2步：请求体为分块的原始数据，查询参数offset为分块在文件中的起始位置，
+    请求头X-Chunk-CRC32为分块的CRC32（十六进制）
+    偏移量与已接收的大小不一致时返回409和已接收的字节数
+    """
+    try:
+        offset = int(request.args.get('offset', ''))
+        crc32 = int(request.headers.get('X-Chunk-CRC32', ''), 16)
+    except ValueError:
+        return jsonify({'error': '缺少offset参数或X-Chunk-CRC32请求头'}), 400
+    length = request.content_length
+    if length is None:
+        return jsonify({'error': '缺少Content-Length请求头'}), 411
+    try:
+        with record_stage('upload_chunk'):
+            received = chunked_uploads.append(upload_id, offset, request.stream, length, crc32)
+    except KeyError:
+        return jsonify({'error': '上传任务不存在或已过期'}), 404
+    except ChunkOffsetMismatch as e:
+        return jsonify({'error': '分块偏移量与已接收的大小不一致', 'received': e.received}), 409
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'success': True, 'received': received})
+
+@app.route('/upload/chunked/<upload_id>', methods=['DELETE'])
+def chunked_upload_abort(upload_id):
+    """取消分块上传并删除已接收的数据"""
+    if not chunked_uploads.abort(upload_id):
+        return jsonify({'error': '上传任务不存在或已过期'}), 404
+    return jsonify({'success': True})
+
+@app.route('/upload/chunked/finalize', methods=['POST'])
+def chunked_upload_finalize():
+    """
+    分块上传第3步：请求体为{"upload_ids": [...], "all_sheets": 是否读取全部工作表, "sha256": {上传ID: 哈希}（可选）}
+    已接收的数据原地重命名为上传文件后解析，返回内容与/upload相同
+    """
+    data = request.get_json(silent=True) or {}
+    upload_ids = data.get('upload_ids')
+    if not isinstance(upload_ids, list) or not upload_ids:
+        return jsonify({'error': '没有选择文件'}), 400
+    expected = data.get('sha256') or {}
+    for upload_id in upload_ids:
+        upload = chunked_uploads.get(upload_id)
+        if upload is None:
+            return jsonify({'error': '上传任务不存在或已过期', 'upload_id': upload_id}), 404
+        if upload['received'] != upload['size']:
+            return jsonify({'error': '文件尚未上传完整', 'upload_id': upload_id,
+                            'received': upload['received']}), 409
+    
+    try:
+        timestamp = SessionStore.new_id()
+        uploads = []
+        with record_stage('save'):
+            for i, upload_id in enumerate(upload_ids):
+                filepath = _upload_filepath(timestamp, i)
+                upload, content_hash = chunked_uploads.complete(upload_id, filepath, expected.get(upload_id))
+                uploads.append((filepath, upload['filename'], content_hash))
+        return jsonify(_create_session(timestamp, uploads, bool(data.get('all_sheets'))))
+    except ChunkOffsetMismatch as e:
+        return jsonify({'error': '文件尚未上传完整', 'received': e.received}), 409
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'处理文件时出错: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
+
+@app.route('/upload/delta', methods=['POST'])
+def upload_delta():
+    """
+    增量上传：将新增/修改的缺陷合并到已有会话（按事项ID更新，无事项ID时按整行去重）
+    只解析增量文件，模块和状态列表增量更新，该会话的分析结果缓存随数据更新失效
+    同一会话的多个增量上传在会话的update_lock内依次合并（文件的保存和解析不加锁），不会丢失彼此的数据
+    """
+    timestamp = request.form.get('timestamp')
+    if not SessionStore.valid_id(timestamp):
+        return jsonify({'error': '无效的会话ID'}), 400
+    if uploaded_data.get(timestamp) is None:
+        return jsonify({'error': '数据不存在或已过期'}), 400
+    
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'error': '没有选择文件'}), 400
+    if not file.filename.endswith('.xlsx'):
+        return jsonify({'error': '请上传Excel文件(.xlsx格式)'}), 400
+    
+    try:
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'],
+                                f"defect_data_{timestamp}_delta_{uuid.uuid4().hex[:8]}.xlsx")
+        with record_stage('save'):
+            content_hash = _save_upload(file, filepath)
+        delta, ingest_stats = _ingest_upload([(filepath, file.filename, content_hash)])
+        
+        with uploaded_data.update_lock(timestamp):
+            # 在锁内重新读取会话，基于最新的数据（可能刚被其他请求或进程合并过）合并
+            session = uploaded_data.get(timestamp)
+            if session is None:
+                return jsonify({'error': '数据不存在或已过期'}), 400
+            
+            base = session['dataframe']
+            start = time.perf_counter()
+            with record_stage('merge', rows=len(delta)):
+                merged, replaced, merge_stats = merge_delta_frame(base, delta, key_index=merge_key_cache.get(timestamp))
+            key_index = merge_stats.pop('_key_index')
+            changed_rows = merge_stats.pop('_changed_rows')
+            with record_stage('lists', rows=len(delta)):
+                modules, statuses = update_session_lists(session, merged, replaced, delta)
+            merge_stats['seconds'] = round(time.perf_counter() - start, 3)
+            
+            # 替换会话数据（会触发该会话派生缓存的清理），会话ID不变
+            session.update({
+                'dataframe': merged,
+                'modules': modules,
+                'statuses': statuses,
+                'delta_filepaths': session.get('delta_filepaths', []) + [filepath]
+            })
+            # 会话数据替换时缓存的索引随之失效，先取出合并前数据的位图索引
+            filter_index = filter_index_cache.get(timestamp)
+            with record_stage('store_session', rows=len(merged)):
+                uploaded_data[timestamp] = session
+            # 只有修改和追加的行变化时增量更新位图索引，否则按合并后的数据重新建立
+            if changed_rows is not None and filter_index is not None and filter_index.rows == len(base):
+                with record_stage('filter_index', rows=len(changed_rows)):
+                    filter_index_cache.put(timestamp, filter_index.updated(merged, changed_rows))
+            else:
+                with record_stage('filter_index', rows=len(merged)):
+                    get_filter_index(timestamp, merged)
+            if key_index is not None:
+                merge_key_cache.put(timestamp, key_index)
         
         return jsonify({
             'success': True,
             'timestamp': timestamp,
             'modules': modules,
             'statuses': statuses,
-            'total_records': len(df)
+            'total_records': len(merged),
+            'ingest': ingest_stats,
+            'delta': merge_stats
         })
-        
     except Exception as e:
-        return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
+        return jsonify({'error': f'处理增量文件时出错: {str(e)}'}), 500
 
 @app.route('/analyze', methods=['POST'])
 def analyze_data():
@@ -340,64 +3100,97 @@ def analyze_data():
     try:
         data = request.json
         timestamp = data.get('timestamp')
+        if not SessionStore.valid_id(timestamp):
+            return jsonify({'error': '无效的会话ID'}), 400
         selected_modules = data.get('modules', [])
         selected_statuses = data.get('statuses', [])
+        # 关键字模式下导出文件的格式
+        export_format = data.get('export_format', 'xlsx')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'error': f'不支持的导出格式: {export_format}'}), 400
+        # 每日统计的日期范围和粒度
+        date_from = data.get('date_from') or None
+        date_to = data.get('date_to') or None
+        granularity = data.get('granularity')
+        if granularity is not None and granularity not in DAILY_GRANULARITIES:
+            return jsonify({'error': f'不支持的统计粒度: {granularity}'}), 400
+        try:
+            day_from, day_to = parse_day(date_from), parse_day(date_to)
+        except (ValueError, TypeError):
+            return jsonify({'error': '日期格式错误，应为YYYY-MM-DD'}), 400
+        if day_from is not None and day_to is not None and day_from > day_to:
+            return jsonify({'error': '开始日期不能晚于结束日期'}), 400
         
-        if not timestamp or timestamp not in uploaded_data:
-            return jsonify({'error': '数据不存在或已过期'}), 400
+        # 相同会话和过滤条件的结果直接从缓存返回
+        cache_key = analyze_cache_key(timestamp, data)
+        if uploaded_data.touch(timestamp):
+            cached_bodies = analyze_result_cache.get(cache_key)
+            if cached_bodies is not None:
+                return _analyze_response(cached_bodies, 'HIT')
         
-        # 获取存储的原始数据（未过滤的完整数据）
-        df_original = uploaded_data[timestamp]['dataframe'].copy()
+        with record_stage('session_load'):
+            session = uploaded_data.get(timestamp)
+        if session is None:
+            return jsonify({'error': '数据不存在或已过期'}), 400
         
-        # 用于图表统计的过滤后数据
-        df = df_original.copy()
+        # 存储的完整数据（只读，过滤通过布尔掩码完成，不复制）
+        df = session['dataframe']
         
         # 如果没有选择模块，使用全部模块
         if not selected_modules:
-            selected_modules = uploaded_data[timestamp]['modules']
+            selected_modules = session['modules']
         
         # 如果没有选择状态，使用全部状态
         if not selected_statuses:
-            selected_statuses = uploaded_data[timestamp].get('statuses', [])
+            selected_statuses = session.get('statuses', [])
         
         # 获取归类方式和关键字
         classification_mode = data.get('classification_mode', 'manual')
         keywords = data.get('keywords', [])
+        # 是否返回按区间分段的缺陷停留时长
+        stay_buckets = bool(data.get('stay_buckets', False))
+        # 是否返回列式的停留时长和每日统计数据
+        compact = bool(data.get('compact', False))
+        
+        # 关键字匹配模式：对完整数据归类一次并缓存，图表统计和导出共用同一份结果
+        keyword_classification = None
+        if classification_mode == 'keyword' and keywords and '标题' in df.columns:
+            keyword_classification = get_keyword_classification(timestamp, df, keywords)
         
         # 生成统计数据（使用过滤后的数据进行图表统计）
-        stats = analyze_defect_data(df, selected_modules, selected_statuses, classification_mode, keywords)
+        with record_stage('filter_index', rows=len(df)):
+            filter_index = get_filter_index(timestamp, df)
+        stats = analyze_defect_data(df, selected_modules, selected_statuses, classification_mode, keywords,
+                                    keyword_classification=keyword_classification, stay_buckets=stay_buckets,
+                                    compact=compact, filter_index=filter_index,
+                                    date_from=date_from, date_to=date_to, granularity=granularity)
         
-        # 如果是关键字匹配模式，对原始完整数据进行关键字归类并生成新文件
-        if classification_mode == 'keyword' and keywords and '标题' in df_original.columns:
-            # 对原始完整数据进行关键字归类（不进行模块和状态过滤，处理所有行）
-            df_with_keyword = df_original.copy()
-            df_with_keyword['关键字归类'] = '其他'  # 默认归类为"其他"
+        # 如果是关键字匹配模式，在后台生成带关键字归类的完整数据文件
+        if keyword_classification is not None:
+            # 文件名包含会话ID、关键字集合的签名和会话数据版本（不同关键字集合的导出互不覆盖，
+            # 增量合并后数据版本变化，重新导出而不是返回合并前的文件）；任务ID即输出文件名
+            keyword_digest = hashlib.sha256('\n'.join(sorted(_normalize_keywords(keywords))).encode('utf-8'))
+            output_filename = (f"defect_data_with_keyword_{timestamp}_{keyword_digest.hexdigest()[:8]}"
+                               f"_v{session.get('version', 0)}{EXPORT_FORMATS[export_format]}")
+            output_filepath = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
             
-            # 对每一行进行关键字匹配
-            for idx in df_with_keyword.index:
-                matched_keywords = []
-                title = str(df_with_keyword.loc[idx, '标题']) if pd.notna(df_with_keyword.loc[idx, '标题']) else ''
-                
-                # 检查每个关键字是否匹配
-                for keyword in keywords:
-                    if keyword and keyword.strip():
-                        keyword = keyword.strip()
-                        if keyword.lower() in title.lower():
-                            matched_keywords.append(keyword)
-                
-                # 如果匹配到多个关键字，随机选择一个
-                if matched_keywords:
-                    df_with_keyword.loc[idx, '关键字归类'] = random.choice(matched_keywords)
+            def run_export(path, progress, df=df, classification=keyword_classification):
+                # 完整数据（不进行模块和状态过滤，包含所有行），分块流式写出
+                write_export(df, path, export_format, {'关键字归类': classification}, progress)
             
-            # 生成新文件，文件名包含时间戳
-            output_filename = f"defect_data_with_keyword_{timestamp}.xlsx"
-            output_filepath = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-            df_with_keyword.to_excel(output_filepath, index=False, engine='openpyxl')
-            # 保存输出文件路径，供前端下载
-            stats['_output_excel_path'] = output_filename
+            # 导出失败时丢弃该会话关键字模式的缓存结果，下次分析重新提交导出
+            def discard_cached(session_id=timestamp):
+                analyze_result_cache.discard_if(lambda key: key[0] == session_id and key[1] == 'keyword')
+            
+            if export_jobs.submit(output_filename, output_filepath, run_export, discard_cached):
+                # 保存输出文件名和任务ID，前端查询任务状态，完成后再显示下载链接
+                stats['_output_excel_path'] = output_filename
+                stats['_export_job'] = output_filename
+            else:
+                stats['_export_error'] = '导出任务过多，请稍后重新生成'
         
-        # 转换为JSON可序列化的格式（移除不能序列化的DataFrame）
-        result_stats = {k: v for k, v in stats.items() if not k.startswith('_df_')}
+        # 转换为JSON可序列化的格式（移除内部使用的字段）
+        result_stats = {k: v for k, v in stats.items() if not k.startswith('_')}
         result = {
             'success': True,
             'stats': result_stats,
@@ -409,40 +3202,231 @@ def analyze_data():
         # 如果有输出Excel文件，添加下载路径
         if '_output_excel_path' in stats:
             result['output_excel_path'] = stats['_output_excel_path']
+            result['export_job'] = stats['_export_job']
+            result['export_format'] = export_format
+            # CSV类格式可以在生成过程中开始下载
+            result['export_streamable'] = export_format in STREAMABLE_EXPORT_FORMATS
         
-        return jsonify(result)
+        with record_stage('serialize'):
+            bodies = {'identity': json_dumps_bytes(result)}
+        if '_export_error' in stats:
+            # 导出未能提交时不缓存结果，下次请求重新尝试提交
+            result['export_error'] = stats['_export_error']
+            return _analyze_response({'identity': json_dumps_bytes(result)}, 'MISS')
+        analyze_result_cache.put(cache_key, bodies)
+        return _analyze_response(bodies, 'MISS')
         
     except Exception as e:
         return jsonify({'error': f'分析数据时出错: {str(e)}'}), 500
 
+@app.route('/rows', methods=['POST'])
+def get_rows():
+    """
+    图表明细：返回图表中某一部分对应的缺陷记录，按游标分页
+    请求参数与/analyze相同（timestamp、modules、statuses、classification_mode、keywords），另外：
+        segment: 图表中的部分，见segment_mask
+        columns: 返回的列（默认为上传数据中的全部列，关键字模式下可包含"关键字归类"）
+        limit: 每页行数；cursor: 上一页返回的next_cursor，不传时从第一行开始
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        timestamp = data.get('timestamp')
+        if not SessionStore.valid_id(timestamp):
+            return jsonify({'error': '无效的会话ID'}), 400
+        if not isinstance(data.get('segment'), dict):
+            return jsonify({'error': '缺少segment参数'}), 400
+        try:
+            limit = int(data.get('limit') or app.config['ROWS_PAGE_SIZE'])
+            cursor = int(data.get('cursor') or 0)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit或cursor参数格式错误'}), 400
+        if limit <= 0 or cursor < 0:
+            return jsonify({'error': 'limit或cursor参数格式错误'}), 400
+        limit = min(limit, app.config['ROWS_MAX_PAGE_SIZE'])
+        
+        with record_stage('session_load'):
+            session = uploaded_data.get(timestamp)
+        if session is None:
+            return jsonify({'error': '数据不存在或已过期'}), 400
+        df = session['dataframe']
+        
+        # 模块、状态、归类方式的默认值与/analyze相同
+        selected_modules = data.get('modules') or session['modules']
+        selected_statuses = data.get('statuses') or session.get('statuses', [])
+        keywords = data.get('keywords', [])
+        keyword_classification = None
+        if data.get('classification_mode', 'manual') == 'keyword' and keywords and '标题' in df.columns:
+            keyword_classification = get_keyword_classification(timestamp, df, keywords)
+        extra_columns = {'关键字归类': keyword_classification} if keyword_classification is not None else {}
+        
+        columns = data.get('columns') or [col for col in df.columns if col not in DERIVED_COLUMNS]
+        unknown = [col for col in columns if col not in df.columns and col not in extra_columns]
+        if unknown:
+            return jsonify({'error': f"不存在的列: {', '.join(map(str, unknown))}"}), 400
+        
+        # 匹配的行号按过滤条件缓存，翻页时不再重新计算
+        cache_key = rows_cache_key(timestamp, data)
+        rows = rows_selection_cache.get(cache_key)
+        if rows is None:
+            with record_stage('rows.select', rows=len(df)) as stage:
+                filter_index = get_filter_index(timestamp, df)
+                try:
+                    rows = select_segment_rows(df, data['segment'], selected_modules, selected_statuses,
+                                               filter_index, keyword_classification)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                stage.rows = len(rows)
+            rows_selection_cache.put(cache_key, rows)
+        
+        # 游标为下一页第一行的行号
+        start = int(np.searchsorted(rows, cursor))
+        page = rows[start:start + limit]
+        with record_stage('rows.page', rows=len(page)):
+            records = rows_to_records(df, page, columns, extra_columns)
+        next_cursor = str(int(rows[start + limit])) if start + limit < len(rows) else None
+        
+        return jsonify({
+            'success': True,
+            'total': len(rows),
+            'offset': start,
+            'columns': columns,
+            'rows': records,
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'error': f'查询明细时出错: {str(e)}'}), 500
+
 # 关键字文件路径
 KEYWORDS_FILE = 'keywords.json'
 
-def load_keywords():
-    """从文件加载关键字列表"""
-    if os.path.exists(KEYWORDS_FILE):
+class KeywordVersionConflict(Exception):
+    """关键字列表的当前版本与请求中的版本不一致"""
+
+class KeywordRegistry:
+    """
+    关键字列表注册表
+    - 关键字列表保存在内存中，只在文件的修改时间/大小变化时重新读取（例如被其他进程修改）
+    - 修改在锁内完成（多进程时同时使用文件锁），先写临时文件再原子替换，不会留下写了一半的文件
+    - 每次修改版本号加1并写入文件，下游缓存以版本号作为键的一部分
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._keywords = []
+        self._version = 0
+        self._stat = None
+        self._lock = threading.RLock()
+    
+    def _file_stat(self):
         try:
-            with open(KEYWORDS_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('keywords', [])
-        except:
-            return []
-    return []
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _reload_if_changed(self):
+        """文件变化时重新读取；文件损坏时保留内存中的列表"""
+        stat = self._file_stat()
+        if stat == self._stat:
+            return
+        if stat is None:
+            keywords, version = [], self._version + 1
+        else:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                keywords = _normalize_keywords(data.get('keywords', []))
+                version = int(data.get('version', 0))
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                app.logger.warning('关键字文件读取失败，继续使用内存中的关键字: %s', e)
+                self._stat = stat
+                return
+            # 手工编辑文件时版本号可能没有变化，内容变化时同样递增版本号
+            if keywords != self._keywords and version <= self._version:
+                version = self._version + 1
+        self._keywords, self._version, self._stat = keywords, version, stat
+    
+    def snapshot(self):
+        """返回（关键字列表副本, 版本号）"""
+        with self._lock:
+            self._reload_if_changed()
+            return list(self._keywords), self._version
+    
+    @property
+    def version(self):
+        return self.snapshot()[1]
+    
+    def _file_lock(self):
+        """跨进程的文件锁（不支持fcntl的系统上只使用进程内的锁）"""
+        if fcntl is None:
+            return None
+        handle = open(self.path + '.lock', 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+    
+    def update(self, func, expected_version=None):
+        """
+        在锁内以最新的关键字列表调用func(keywords)，func返回新的列表（返回None表示不修改）
+        有修改时原子写入文件并递增版本号，返回（关键字列表, 版本号, 是否修改）
+        expected_version不为None且与当前版本不一致时抛出KeywordVersionConflict
+        """
+        with self._lock:
+            handle = self._file_lock()
+            try:
+                self._reload_if_changed()
+                if expected_version is not None and int(expected_version) != self._version:
+                    raise KeywordVersionConflict(self._version)
+                new_keywords = func(list(self._keywords))
+                if new_keywords is None:
+                    return list(self._keywords), self._version, False
+                new_keywords = _normalize_keywords(new_keywords)
+                if new_keywords == self._keywords:
+                    return list(self._keywords), self._version, False
+                version = self._version + 1
+                self._write({'keywords': new_keywords, 'version': version})
+                self._keywords, self._version, self._stat = new_keywords, version, self._file_stat()
+            finally:
+                if handle is not None:
+                    handle.close()
+        # 关键字列表变化后，关键字归类模式的分析结果缓存失效
+        analyze_result_cache.discard_if(lambda key: key[1] == 'keyword')
+        return list(new_keywords), version, True
+    
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp_path = os.path.join(directory, f'.{os.path.basename(self.path)}.{uuid.uuid4().hex[:8]}.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
 
-def save_keywords(keywords):
-    """保存关键字列表到文件"""
-    try:
-        with open(KEYWORDS_FILE, 'w', encoding='utf-8') as f:
-            json.dump({'keywords': keywords}, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        return False
+keyword_registry = KeywordRegistry(KEYWORDS_FILE)
+
+def _keywords_response(keywords, version, **extra):
+    return jsonify({'success': True, 'keywords': keywords, 'version': version, **extra})
+
+def _bulk_keywords_param(data):
+    """批量接口的关键字参数：列表，或每行一个关键字的文本"""
+    keywords = data.get('keywords')
+    if isinstance(keywords, str):
+        keywords = keywords.splitlines()
+    if not isinstance(keywords, list):
+        return None
+    return _normalize_keywords(keywords)
 
 @app.route('/api/keywords', methods=['GET'])
 def get_keywords():
     """获取关键字列表"""
-    keywords = load_keywords()
-    return jsonify({'success': True, 'keywords': keywords})
+    keywords, version = keyword_registry.snapshot()
+    return _keywords_response(keywords, version)
 
 @app.route('/api/keywords', methods=['POST'])
 def add_keyword():
@@ -454,15 +3438,13 @@ def add_keyword():
         if not keyword:
             return jsonify({'error': '关键字不能为空'}), 400
         
-        keywords = load_keywords()
-        if keyword not in keywords:
-            keywords.append(keyword)
-            if save_keywords(keywords):
-                return jsonify({'success': True, 'keywords': keywords})
-            else:
-                return jsonify({'error': '保存关键字失败'}), 500
-        else:
+        keywords, version, changed = keyword_registry.update(
+            lambda keywords: keywords + [keyword] if keyword not in keywords else None)
+        if not changed:
             return jsonify({'error': '关键字已存在'}), 400
+        return _keywords_response(keywords, version)
+    except OSError as e:
+        return jsonify({'error': f'保存关键字失败: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'添加关键字失败: {str(e)}'}), 500
 
@@ -476,24 +3458,184 @@ def delete_keyword():
         if not keyword:
             return jsonify({'error': '关键字不能为空'}), 400
         
-        keywords = load_keywords()
-        if keyword in keywords:
-            keywords.remove(keyword)
-            if save_keywords(keywords):
-                return jsonify({'success': True, 'keywords': keywords})
-            else:
-                return jsonify({'error': '保存关键字失败'}), 500
-        else:
+        keywords, version, changed = keyword_registry.update(
+            lambda keywords: [k for k in keywords if k != keyword] if keyword in keywords else None)
+        if not changed:
             return jsonify({'error': '关键字不存在'}), 400
+        return _keywords_response(keywords, version)
+    except OSError as e:
+        return jsonify({'error': f'保存关键字失败: {str(e)}'}), 500
     except Exception as e:
         return jsonify({'error': f'删除关键字失败: {str(e)}'}), 500
 
+@app.route('/api/keywords/import', methods=['POST'])
+def import_keywords():
+    """批量导入关键字（追加到现有列表，已存在的跳过），一次请求只写一次文件"""
+    try:
+        new_keywords = _bulk_keywords_param(request.json or {})
+        if new_keywords is None:
+            return jsonify({'error': 'keywords参数应为列表或每行一个关键字的文本'}), 400
+        
+        added = []
+        
+        def merge(keywords):
+            added.extend(k for k in new_keywords if k not in keywords)
+            return keywords + added if added else None
+        
+        keywords, version, _ = keyword_registry.update(merge)
+        return _keywords_response(keywords, version, added=len(added), skipped=len(new_keywords) - len(added))
+    except OSError as e:
+        return jsonify({'error': f'保存关键字失败: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'导入关键字失败: {str(e)}'}), 500
+
+@app.route('/api/keywords', methods=['PUT'])
+def replace_keywords():
+    """
+    用新列表替换全部关键字
+    请求中带version时，只有与当前版本一致才替换（避免覆盖他人同时做的修改），否则返回409
+    """
+    try:
+        data = request.json or {}
+        new_keywords = _bulk_keywords_param(data)
+        if new_keywords is None:
+            return jsonify({'error': 'keywords参数应为列表或每行一个关键字的文本'}), 400
+        keywords, version, _ = keyword_registry.update(lambda keywords: new_keywords, data.get('version'))
+        return _keywords_response(keywords, version)
+    except KeywordVersionConflict:
+        keywords, version = keyword_registry.snapshot()
+        return jsonify({'error': '关键字已被修改，请刷新后重试', 'keywords': keywords, 'version': version}), 409
+    except OSError as e:
+        return jsonify({'error': f'保存关键字失败: {str(e)}'}), 500
+    except Exception as e:
+        return jsonify({'error': f'替换关键字失败: {str(e)}'}), 500
+
+@app.route('/api/analyze_cache', methods=['GET'])
+def get_analyze_cache_stats():
+    """获取分析结果缓存的命中/未命中次数"""
+    hits = analyze_result_cache.hits
+    misses = analyze_result_cache.misses
+    return jsonify({
+        'success': True,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'size': len(analyze_result_cache)
+    })
+
+def _gauge_lines(name, help_text, samples):
+    """Prometheus仪表盘指标，samples为[(标签字典, 数值)]，数值为None的样本跳过"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+    lines.extend(f'{name}{_prometheus_labels(labels)} {value}' for labels, value in samples if value is not None)
+    return lines
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Prometheus文本格式的运行指标：请求和各处理环节的耗时直方图、缓存命中情况、会话存储内存、导出任务
+    多进程部署时每个工作进程分别统计（指标来自处理本次请求的进程）
+    """
+    lines = []
+    for metric in (REQUEST_SECONDS, STAGE_SECONDS, STAGE_ROWS, STAGE_BYTES):
+        lines.extend(metric.render())
+    
+    caches = {
+        'analyze_result': analyze_result_cache,
+        'keyword_classification': keyword_classification_cache,
+        'filter_index': filter_index_cache,
+        'merge_key': merge_key_cache
+    }
+    lines.extend(['# HELP defect_tool_cache_hits_total 缓存命中次数', '# TYPE defect_tool_cache_hits_total counter'])
+    lines.extend(f'defect_tool_cache_hits_total{_prometheus_labels({"cache": name})} {cache.hits}'
+                 for name, cache in caches.items())
+    lines.extend(['# HELP defect_tool_cache_misses_total 缓存未命中次数', '# TYPE defect_tool_cache_misses_total counter'])
+    lines.extend(f'defect_tool_cache_misses_total{_prometheus_labels({"cache": name})} {cache.misses}'
+                 for name, cache in caches.items())
+    lines.extend(_gauge_lines('defect_tool_cache_hit_ratio', '缓存命中率', [
+        ({'cache': name}, round(cache.hits / (cache.hits + cache.misses), 4) if cache.hits + cache.misses else None)
+        for name, cache in caches.items()
+    ]))
+    lines.extend(_gauge_lines('defect_tool_cache_entries', '缓存项数量',
+                              [({'cache': name}, len(cache)) for name, cache in caches.items()]))
+    
+    lines.extend(_gauge_lines('defect_tool_session_memory_bytes', '驻留内存的会话数据大小（字节）',
+                              [({}, uploaded_data.memory_usage())]))
+    lines.extend(_gauge_lines('defect_tool_session_memory_budget_bytes', '会话数据的内存预算（字节）',
+                              [({}, uploaded_data.memory_budget)]))
+    lines.extend(_gauge_lines('defect_tool_sessions', '会话数（按数据所在位置）',
+                              [({'location': location}, count)
+                               for location, count in uploaded_data.session_counts().items()]))
+    lines.extend(_gauge_lines('defect_tool_export_jobs', '导出任务数（按状态）',
+                              [({'status': status}, count) for status, count in sorted(export_jobs.counts().items())]))
+    
+    peak_mb = _peak_memory_mb()
+    lines.extend(_gauge_lines('defect_tool_process_resident_memory_bytes', '进程当前常驻内存（字节）',
+                              [({}, _resident_memory_bytes())]))
+    lines.extend(_gauge_lines('defect_tool_process_peak_memory_bytes', '进程峰值内存（字节）',
+                              [({}, None if peak_mb is None else int(peak_mb * 1024 * 1024))]))
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain',
+                              headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+@app.route('/export/status/<job_id>', methods=['GET'])
+def export_status(job_id):
+    """查询后台导出任务的状态和进度（任务ID即输出文件名）"""
+    job = export_jobs.status(job_id)
+    if job is None:
+        # 任务记录已清理，但文件已经生成
+        if (job_id.startswith('defect_data_with_keyword_') and
+                os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], job_id))):
+            job = {'status': 'done', 'progress': 1.0, 'filename': job_id, 'error': None}
+        else:
+            return jsonify({'error': '导出任务不存在'}), 404
+    job.pop('finished_at', None)
+    job.pop('partial_path', None)
+    return jsonify({'success': True, 'job_id': job_id, **job})
+
+def _follow_export(job_id, filepath, chunk_size=1 << 16):
+    """
+    边生成边读取导出文件：任务进行中读取临时文件，读到末尾时等待新数据，
+    任务结束后从最终文件读完剩余部分。每次读取都重新打开文件，不妨碍任务完成时的重命名
+    """
+    offset = 0
+    while True:
+        job = export_jobs.status(job_id)
+        finished = job is None or job['status'] in ('done', 'failed')
+        path = filepath if finished else job['partial_path']
+        data = b''
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read(chunk_size)
+            except OSError:
+                # 临时文件尚未创建或刚被重命名，下一轮重新判断
+                pass
+        if data:
+            offset += len(data)
+            yield data
+        elif finished:
+            if job is not None and job['status'] == 'failed':
+                app.logger.warning('导出任务 %s 失败，下载内容不完整', job_id)
+            return
+        else:
+            time.sleep(0.2)
+
 @app.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
-    """下载生成的Excel文件"""
+    """下载生成的导出文件，CSV类格式在生成过程中即可开始下载"""
     try:
+        if not filename.startswith('defect_data_with_keyword_'):
+            return jsonify({'error': '文件不存在'}), 404
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        if os.path.exists(filepath) and filename.startswith('defect_data_with_keyword_'):
+        job = export_jobs.status(filename)
+        if job is not None and job['status'] in ('queued', 'running'):
+            if not filename.endswith(tuple(EXPORT_FORMATS[fmt] for fmt in STREAMABLE_EXPORT_FORMATS)):
+                return jsonify({'error': '文件正在生成中，请稍后下载'}), 409
+            mimetype = 'application/gzip' if filename.endswith('.gz') else 'text/csv'
+            response = app.response_class(_follow_export(filename, filepath), mimetype=mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        if os.path.exists(filepath):
             from flask import send_file
             return send_file(filepath, as_attachment=True, download_name=filename)
         else:
@@ -501,90 +3643,67 @@ def download_file(filename):
     except Exception as e:
         return jsonify({'error': f'下载文件失败: {str(e)}'}), 500
 
-if __name__ == '__main__':
-    import sys
-    import socket
-    import webbrowser
-    from datetime import datetime
-    
-    # 创建日志目录
-    log_dir = 'logs'
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # 设置日志文件
-    log_file = os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
-    
-    def log(message):
-        """记录日志到文件和控制台"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        log_message = f'[{timestamp}] {message}'
-        print(log_message)
-        try:
-            with open(log_file, 'a', encoding='utf-8') as f:
-                f.write(log_message + '\n')
-        except:
-            pass
+def serve(host='0.0.0.0', port=5000, workers=1, threads=8, log=print):
+    """
+    生产模式运行：workers个工作进程共享同一个监听端口，每个进程使用threads个线程处理请求
+    多进程时会话数据写入共享的列式存储（见SessionStore的shared参数）；
+    不支持fork的系统（Windows）只运行单个进程
+    """
+    if workers > 1 and not hasattr(os, 'fork'):
+        log('当前系统不支持多进程模式，使用单进程运行')
+        workers = 1
+    if workers == 1:
+        PooledWSGIServer(host, port, app, threads).serve_forever()
+        return
     
-    def check_port(port):
-        """检查端口是否可用"""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(1)
-        try:
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
-            return result != 0  # 返回True表示端口可用
-        except:
-            return False
+    import signal
+    uploaded_data.shared = True
+    # 主进程创建监听套接字，工作进程继承后各自accept
+    listener = BaseWSGIServer(host, port, app)
+    children = set()
+    stopping = False
     
-    try:
-        log('='*60)
-        log('Excel缺陷数据统计分析工具启动中...')
-        log('='*60)
-        
-        # 检查端口
-        port = 5000
-        if not check_port(port):
-            log(f'警告: 端口 {port} 已被占用，尝试使用其他端口...')
-            for test_port in range(5001, 5010):
-                if check_port(test_port):
-                    port = test_port
-                    log(f'使用端口: {port}')
-                    break
-            else:
-                log('错误: 无法找到可用端口 (5000-5009 都被占用)')
-                log('请关闭其他占用端口的程序后重试')
-                input('\n按回车键退出...')
-                sys.exit(1)
-        
-        log(f'启动Web服务器...')
-        log(f'访问地址: http://localhost:{port}')
-        log(f'日志文件: {log_file}')
-        log('='*60)
-        log('服务器运行中... 按 Ctrl+C 停止服务')
-        log('='*60)
-        
-        # 自动打开浏览器
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            try:
+                PooledWSGIServer(host, port, app, threads, fd=listener.fileno()).serve_forever()
+            finally:
+                os._exit(0)
+        children.add(pid)
+    
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+    
+    for _ in range(workers):
+        spawn()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    log(f'已启动 {workers} 个工作进程，每个进程 {threads} 个线程')
+    
+    while children:
         try:
-            webbrowser.open(f'http://localhost:{port}')
-            log('已自动打开浏览器')
-        except:
-            log('无法自动打开浏览器，请手动访问上述地址')
-        
-        # 启动Flask应用
-        app.run(debug=False, host='0.0.0.0', port=port, use_reloader=False)
-        
-    except KeyboardInterrupt:
-        log('\n服务器已停止')
-    except Exception as e:
-        log(f'错误: {str(e)}')
-        log(f'详细错误信息: {repr(e)}')
-        import traceback
-        log('完整错误堆栈:')
-        log(traceback.format_exc())
-        log('='*60)
-        log('程序遇到错误，请查看上述日志信息')
-        log(f'日志已保存到: {log_file}')
-        input('\n按回车键退出...')
-        sys.exit(1)
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            log(f'工作进程 {pid} 意外退出，重新启动')
+            spawn()
+    listener.server_close()
 
+if __name__ == '__main__':
+    # 打包为exe后，多进程解析工作表的子进程需要由此进入
+    multiprocessing.freeze_support()
+    
+    # 命令行参数、日志和端口检查见launcher.py；直接运行app.py时先完成全部导入再监听端口
+    import launcher
+    launcher.main(app_module=sys.modules[__name__])
@@ -0,0 +1,147 @@
+"""
+统计分析性能对比：旧版analyze_defect_data（多次groupby + 数据框复制） vs 聚合引擎
+
+测试数据使用create_sample_data.py的生成逻辑，默认规模为1万、10万、100万行
+
+用法:
+    python benchmark_analyze.py
+    python benchmark_analyze.py --sizes 10000 100000 --repeat 5
+"""
+import argparse
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from app import STATUS_MAPPING, analyze_defect_data, apply_status_mapping, get_module_list, normalize_defect_frame
+from create_sample_data import generate_defect_data
+
+def legacy_analyze_defect_data(df, selected_modules=None, selected_statuses=None):
+    """旧实现（人工归类模式），用于对比"""
+    df = apply_status_mapping(df)
+
+    if selected_modules and '缺陷模块' in df.columns:
+        if '（空）' in selected_modules:
+            selected_modules_copy = [m for m in selected_modules if m != '（空）']
+            if selected_modules_copy:
+                df = df[df['缺陷模块'].isin(selected_modules_copy) | df['缺陷模块'].isna()]
+            else:
+                df = df[df['缺陷模块'].isna()]
+        else:
+            df = df[df['缺陷模块'].isin(selected_modules)]
+
+    if selected_statuses:
+        reverse_mapping = {}
+        for original_status, mapped_status in STATUS_MAPPING.items():
+            reverse_mapping.setdefault(mapped_status, []).append(original_status)
+        original_statuses = []
+        status_col = '原始状态' if '原始状态' in df.columns else '状态'
+        if status_col in df.columns:
+            all_original_statuses = df[status_col].dropna().unique().tolist()
+            for mapped_status in selected_statuses:
+                if mapped_status in reverse_mapping:
+                    original_statuses.extend(reverse_mapping[mapped_status])
+                elif mapped_status in all_original_statuses:
+                    original_statuses.append(mapped_status)
+            if original_statuses:
+                df = df[df[status_col].isin(list(set(original_statuses)))]
+
+    stats = {}
+    current_date = datetime.now()
+
+    stats['status_count'] = df.groupby('映射后状态')['标题'].count().to_dict()
+
+    pending_defects = df[df['映射后状态'] == '待修复'].copy()
+    stats['stay_duration'] = {}
+    if len(pending_defects) > 0:
+        pending_defects['创建时间_dt'] = pd.to_datetime(pending_defects['创建时间'], errors='coerce')
+        pending_defects['停留天数'] = pending_defects['创建时间_dt'].apply(
+            lambda x: (current_date.date() - x.date()).days if pd.notna(x) else None
+        )
+        pending_defects = pending_defects[pending_defects['停留天数'].notna()]
+        if len(pending_defects) > 0:
+            stay_duration = pending_defects.groupby('停留天数')['标题'].count().to_dict()
+            stats['stay_duration'] = {str(int(k)): int(v) for k, v in sorted(stay_duration.items())}
+
+    daily_stats = {}
+    df_copy = df.copy()
+    df_copy['创建日期'] = pd.to_datetime(df_copy['创建时间'], errors='coerce').dt.date
+    df_copy = df_copy[df_copy['创建日期'].notna()]
+    daily_new = df_copy.groupby('创建日期')['标题'].count().to_dict()
+    daily_stats['daily_new'] = {k.strftime('%Y-%m-%d'): int(v) for k, v in sorted(daily_new.items())}
+
+    daily_fixed = {}
+    status_col = '原始状态'
+    pending_verify = df[df[status_col] == '待验证'].copy()
+    if len(pending_verify) > 0:
+        pending_verify['更新日期'] = pd.to_datetime(pending_verify['更新时间'], errors='coerce').dt.date
+        pending_verify = pending_verify[pending_verify['更新日期'].notna()]
+        for date, count in pending_verify.groupby('更新日期')['标题'].count().items():
+            date_str = date.strftime('%Y-%m-%d')
+            daily_fixed[date_str] = daily_fixed.get(date_str, 0) + int(count)
+    closed = df[df[status_col] == '已关闭'].copy()
+    if len(closed) > 0:
+        closed['完成日期'] = pd.to_datetime(closed['完成时间'], errors='coerce').dt.date
+        closed = closed[closed['完成日期'].notna()]
+        for date, count in closed.groupby('完成日期')['标题'].count().items():
+            date_str = date.strftime('%Y-%m-%d')
+            daily_fixed[date_str] = daily_fixed.get(date_str, 0) + int(count)
+    daily_stats['daily_fixed'] = {k: v for k, v in sorted(daily_fixed.items())}
+    stats['daily_stats'] = daily_stats
+
+    df_analysis = df.copy()
+    df_analysis['分析类型_显示'] = df_analysis['缺陷分析类型'].fillna('（空）')
+    stats['analysis_type_count'] = df_analysis.groupby('分析类型_显示')['标题'].count().to_dict()
+    return stats
+
+def best_of(func, repeat):
+    """执行repeat次，返回最短耗时（秒）和最后一次的结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description='统计分析性能对比')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-legacy', action='store_true', help='只测试聚合引擎')
+    args = parser.parse_args()
+
+    print(f"{'行数':>10} {'旧实现(秒)':>12} {'预处理(秒)':>12} {'聚合引擎(秒)':>14} {'加速比':>8}")
+    for size in args.sizes:
+        raw = generate_defect_data(size, seed=args.seed)
+        # 选择一半模块（含空模块）和部分状态，覆盖过滤逻辑
+        modules = get_module_list(raw)
+        modules = modules[:max(1, len(modules) // 2 + 1)]
+        statuses = ['待修复', '待验证', '已关闭']
+
+        # 预处理在上传时执行一次，单独计时
+        start = time.perf_counter()
+        normalized = normalize_defect_frame(raw.copy())
+        normalize_seconds = time.perf_counter() - start
+
+        engine_seconds, engine_stats = best_of(
+            lambda: analyze_defect_data(normalized, modules, statuses), args.repeat)
+
+        if args.skip_legacy:
+            print(f'{size:>10} {"-":>12} {normalize_seconds:>12.3f} {engine_seconds:>14.4f} {"-":>8}')
+            continue
+
+        legacy_seconds, legacy_stats = best_of(
+            lambda: legacy_analyze_defect_data(raw.copy(), modules, statuses), args.repeat)
+        # 结果一致性校验（旧实现会保留数量为0的项，比较前去除）
+        for key in ('status_count', 'stay_duration', 'analysis_type_count'):
+            assert {k: v for k, v in legacy_stats[key].items() if v} == engine_stats[key], key
+        for key in ('daily_new', 'daily_fixed'):
+            assert legacy_stats['daily_stats'][key] == engine_stats['daily_stats'][key], key
+        print(f'{size:>10} {legacy_seconds:>12.3f} {normalize_seconds:>12.3f} {engine_seconds:>14.4f} '
+              f'{legacy_seconds / engine_seconds:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
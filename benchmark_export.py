@@ -0,0 +1,81 @@
+"""
+导出性能对比：旧版to_excel（整个工作簿在内存中构建） vs 分块流式导出
+
+每种写出方式在独立子进程中执行，分别统计耗时和进程峰值内存（RSS）。
+峰值内存只在支持resource模块的平台（Linux/macOS）上统计。
+
+用法:
+    python benchmark_export.py
+    python benchmark_export.py --rows 200000 --formats to_excel xlsx csv csv.gz
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from app import (_peak_memory_mb, classify_keywords_deterministic, export_frame, load_frame,
+                 normalize_defect_frame, save_frame, write_export)
+from create_sample_data import generate_defect_data
+
+KEYWORDS = ['登录', '数据', '页面', '按钮', '保存']
+# 写出方式 -> 输出文件扩展名
+WRITERS = {'to_excel': '.xlsx', 'xlsx': '.xlsx', 'csv': '.csv', 'csv.gz': '.csv.gz'}
+
+def run_child(writer, frame_dir, output_dir):
+    """子进程：加载数据，执行一种写出方式，输出JSON结果"""
+    df = load_frame(frame_dir, mmap=False)
+    classification = classify_keywords_deterministic(df['标题'], KEYWORDS)
+    baseline_mb = _peak_memory_mb()
+    path = os.path.join(output_dir, 'export_' + writer.replace('.', '_') + WRITERS[writer])
+
+    start = time.perf_counter()
+    if writer == 'to_excel':
+        # 旧实现：复制整个数据框后由openpyxl在内存中构建工作簿再保存
+        df_with_keyword = export_frame(df)
+        df_with_keyword['关键字归类'] = classification
+        df_with_keyword.to_excel(path, index=False, engine='openpyxl')
+    else:
+        write_export(df, path, writer, {'关键字归类': classification})
+    seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'writer': writer,
+        'seconds': round(seconds, 3),
+        'baseline_mb': baseline_mb,
+        'peak_mb': _peak_memory_mb(),
+        'file_mb': round(os.path.getsize(path) / 1024 / 1024, 2)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description='导出性能对比')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--formats', nargs='+', default=list(WRITERS), choices=list(WRITERS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--child', nargs=3, metavar=('WRITER', 'FRAME_DIR', 'OUTPUT_DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 数据只生成一次，保存为列式存储供各子进程加载
+        frame_dir = os.path.join(tmp, 'frame')
+        save_frame(normalize_defect_frame(generate_defect_data(args.rows, seed=args.seed)), frame_dir)
+
+        print(f'行数: {args.rows}')
+        print(f"{'写出方式':<10} {'耗时(秒)':>10} {'加载后内存(MB)':>16} {'峰值内存(MB)':>14} {'导出增量(MB)':>14} {'文件(MB)':>10}")
+        for writer in args.formats:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', writer, frame_dir, tmp],
+                                    check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            baseline, peak = result['baseline_mb'], result['peak_mb']
+            delta = f'{peak - baseline:.1f}' if baseline is not None else '-'
+            print(f"{writer:<10} {result['seconds']:>10.3f} {baseline if baseline is not None else '-':>16} "
+                  f"{peak if peak is not None else '-':>14} {delta:>14} {result['file_mb']:>10}")
+
+if __name__ == '__main__':
+    main()
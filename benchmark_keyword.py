@@ -0,0 +1,89 @@
+"""
+关键字归类性能对比：逐行.loc循环（旧实现） vs 编译正则 + 向量化选择（classify_by_keywords）
+
+用法:
+    python benchmark_keyword.py --rows 20000 --keywords 200
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from app import classify_by_keywords
+
+WORDS = ['用户', '登录', '订单', '支付', '商品', '页面', '按钮', '数据', '接口', '超时',
+         '失败', '错误', '缓慢', '无响应', '保存', '显示', '导出', '权限', '同步', '崩溃',
+         'API', 'Token', 'Crash', 'Timeout', 'SQL', 'Cache', 'iOS', 'Android', 'Web', 'H5']
+TAGS = ['【二阶段】', '【三阶段】', '【紧急】', '【常规】']
+
+def legacy_classify(df, keywords):
+    """旧实现：逐行逐关键字匹配，并用.loc逐行写入"""
+    df_analysis = df.copy()
+    df_analysis['关键字归类'] = '其他'
+    for idx in df_analysis.index:
+        matched_keywords = []
+        title = str(df_analysis.loc[idx, '标题']) if pd.notna(df_analysis.loc[idx, '标题']) else ''
+        for keyword in keywords:
+            if keyword and keyword.strip():
+                keyword = keyword.strip()
+                if keyword.lower() in title.lower():
+                    matched_keywords.append(keyword)
+        if matched_keywords:
+            df_analysis.loc[idx, '关键字归类'] = random.choice(matched_keywords)
+    return df_analysis['关键字归类']
+
+def make_data(rows, num_keywords, seed):
+    rng = random.Random(seed)
+    titles = []
+    for _ in range(rows):
+        words = rng.sample(WORDS, rng.randint(2, 5))
+        titles.append(rng.choice(TAGS) + ''.join(words) + str(rng.randint(0, 999)))
+    # 关键字：单词 + 单词组合，数量不足时用组合补齐
+    keywords = list(WORDS)
+    while len(keywords) < num_keywords:
+        keyword = rng.choice(WORDS) + rng.choice(WORDS)
+        if keyword not in keywords:
+            keywords.append(keyword)
+    keywords = keywords[:num_keywords]
+    return pd.DataFrame({'标题': titles}), keywords
+
+def all_hits(title, keywords):
+    title = str(title).lower()
+    return {k for k in keywords if k.lower() in title}
+
+def main():
+    parser = argparse.ArgumentParser(description='关键字归类性能对比')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--keywords', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-legacy', action='store_true', help='数据量很大时跳过旧实现')
+    args = parser.parse_args()
+
+    df, keywords = make_data(args.rows, args.keywords, args.seed)
+    print(f'数据: {len(df)} 行, {len(keywords)} 个关键字')
+
+    start = time.perf_counter()
+    fast = classify_by_keywords(df['标题'], keywords, rng=np.random.default_rng(args.seed))
+    fast_seconds = time.perf_counter() - start
+    print(f'向量化实现: {fast_seconds:.3f} 秒')
+
+    # 校验语义：结果必须是标题命中的关键字之一，未命中时为"其他"
+    for title, label in zip(df['标题'], fast):
+        hits = all_hits(title, keywords)
+        assert (label in hits) if hits else (label == '其他'), (title, label)
+    print('✓ 归类结果与匹配规则一致')
+
+    if args.skip_legacy:
+        return
+    start = time.perf_counter()
+    legacy = legacy_classify(df, keywords)
+    legacy_seconds = time.perf_counter() - start
+    print(f'旧实现:     {legacy_seconds:.3f} 秒')
+    # 未命中的行两种实现必须一致（命中多个关键字时为随机选择）
+    assert ((legacy == '其他') == (fast == '其他')).all()
+    print(f'加速比: {legacy_seconds / fast_seconds:.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+启动耗时基准测试：测量各依赖模块的导入耗时，以及从启动进程到首次响应的时间
+
+测试项:
+    导入耗时        在新的Python进程中用 -X importtime 统计各模块（含其依赖）的累计导入耗时
+    首次响应时间    分别以以下方式启动服务，记录从启动进程到端口可连接（bind）、
+                    首页返回200（index）、需要分析模块的接口返回200（api，/api/keywords）的时间
+        script      python app.py（全部导入完成后监听端口）
+        launcher    python launcher.py（先监听端口，分析模块在后台加载）
+        exe         PyInstaller单目录打包结果（dist/excel-draw-tool/，以launcher.py为入口），存在时才测试
+
+用法:
+    python benchmark_startup.py
+    python benchmark_startup.py --repeat 5 --output startup_report.json
+    python benchmark_startup.py --modes launcher exe --exe dist/excel-draw-tool/excel-draw-tool.exe
+每次启动使用新的临时工作目录（日志、上传目录不影响当前目录），文件系统缓存未清空，结果为热启动耗时
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMPORT_MODULES = ['launcher', 'werkzeug.serving', 'flask', 'numpy', 'pandas', 'openpyxl', 'app']
+MODES = ['script', 'launcher', 'exe']
+DEFAULT_EXE = os.path.join(ROOT, 'dist', 'excel-draw-tool', 'excel-draw-tool' + ('.exe' if os.name == 'nt' else ''))
+
+def import_seconds(module):
+    """在新进程中导入模块，返回-X importtime统计的累计耗时（秒）"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=ROOT, check=True)
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f'未找到模块 {module} 的导入耗时')
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until(check, timeout):
+    """反复执行check直到返回True，超时抛出异常"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if check():
+            return
+        time.sleep(0.005)
+    raise RuntimeError(f'服务在{timeout}秒内未响应')
+
+def can_connect(port):
+    with socket.socket() as sock:
+        return sock.connect_ex(('127.0.0.1', port)) == 0
+
+def get_ok(url):
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError):
+        return False
+
+def first_response(command, timeout):
+    """启动服务进程，返回从启动到bind/index/api各阶段的耗时（秒）"""
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as cwd:
+        start = time.perf_counter()
+        process = subprocess.Popen(command + ['--host', '127.0.0.1', '--port', str(port), '--no-browser'], cwd=cwd,
+                                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            timings = {}
+            wait_until(lambda: can_connect(port), timeout)
+            timings['bind'] = time.perf_counter() - start
+            wait_until(lambda: get_ok(base_url + '/'), timeout)
+            timings['index'] = time.perf_counter() - start
+            wait_until(lambda: get_ok(base_url + '/api/keywords'), timeout)
+            timings['api'] = time.perf_counter() - start
+            return timings
+        finally:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description='启动耗时基准测试')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--exe', default=DEFAULT_EXE, help='单目录打包生成的可执行文件')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120, help='等待服务响应的最长时间（秒）')
+    parser.add_argument('--output', help='JSON报告的保存路径')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat
+        },
+        'imports': {},
+        'startup': {}
+    }
+
+    print(f"{'模块':<20} {'导入耗时(秒)':>14}")
+    for module in IMPORT_MODULES:
+        seconds = min(import_seconds(module) for _ in range(args.repeat))
+        report['imports'][module] = round(seconds, 4)
+        print(f'{module:<20} {seconds:>14.4f}')
+
+    commands = {
+        'script': [sys.executable, os.path.join(ROOT, 'app.py')],
+        'launcher': [sys.executable, os.path.join(ROOT, 'launcher.py')],
+        'exe': [args.exe]
+    }
+    print(f"\n{'启动方式':<10} {'bind(秒)':>10} {'index(秒)':>10} {'api(秒)':>10}  （{args.repeat}次中的最短耗时）")
+    for mode in args.modes:
+        if mode == 'exe' and not os.path.exists(args.exe):
+            print(f'{mode:<10} 未找到打包结果 {args.exe}，跳过（先运行 pyinstaller build.spec）')
+            continue
+        runs = [first_response(commands[mode], args.timeout) for _ in range(args.repeat)]
+        best = {stage: min(run[stage] for run in runs) for stage in runs[0]}
+        report['startup'][mode] = {'best': {k: round(v, 4) for k, v in best.items()},
+                                   'runs': [{k: round(v, 4) for k, v in run.items()} for run in runs]}
+        print(f"{mode:<10} {best['bind']:>10.3f} {best['index']:>10.3f} {best['api']:>10.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\n报告已保存: {args.output}')
+
+if __name__ == '__main__':
+    main()
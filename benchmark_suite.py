@@ -0,0 +1,199 @@
+"""
+性能基准测试套件：在不同规模的生成数据上测试上传、预处理、统计、关键字归类和导出各环节的耗时，
+结果保存为JSON报告，可与其他提交的报告对比以发现性能回归
+
+测试项（名称: 内容）:
+    ingest.read_excel / ingest.streaming   读取Excel：pd.read_excel / 流式读取（read_defect_excel）
+    apply_status_mapping, normalize         状态映射 / 上传时的完整预处理
+    get_module_list, get_status_list        模块/状态列表
+    filter_index                            建立模块/状态过滤位图索引
+    analyze.total, analyze.<环节>           统计分析总耗时及过滤、各项统计的耗时（见aggregate_chart_stats）
+    rows.select, rows.page                  图表明细：查找状态分布中某一状态对应的行 / 取出一页（100行）
+    keyword_classification                  关键字归类（全量数据）
+    export.<格式>                           导出带关键字归类的完整数据
+
+用法:
+    python benchmark_suite.py
+    python benchmark_suite.py --sizes 10000 1000000 5000000 --output report.json
+    python benchmark_suite.py --compare baseline.json --threshold 1.2
+读取Excel和导出xlsx较慢，分别只使用前--ingest-rows/--export-rows行
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app import (DERIVED_COLUMNS, FilterIndex, analyze_defect_data, apply_status_mapping,
+                 classify_keywords_deterministic, get_module_list, get_status_list, normalize_defect_frame,
+                 read_defect_excel, rows_to_records, select_segment_rows, write_export)
+from create_sample_data import generate_defect_data, write_excel
+
+KEYWORDS = ['登录', '数据', '页面', '按钮', '保存']
+EXPORT_FORMATS = ['csv', 'csv.gz', 'xlsx']
+
+def measure(func, repeat, setup=None):
+    """执行repeat次，返回（最短耗时, 平均耗时, 最后一次的结果）；setup的耗时不计入"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times), result
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_size(rows, args, tmp):
+    """在一种数据规模上执行全部测试项，返回结果列表"""
+    results = []
+
+    def record(name, n, best, mean):
+        results.append({'size': rows, 'name': name, 'rows': n, 'seconds': round(best, 6),
+                        'mean_seconds': round(mean, 6), 'rows_per_sec': int(n / best) if best > 0 else None})
+        print(f'{rows:>10} {name:<32} {n:>10} {best:>12.4f} {mean:>12.4f}', flush=True)
+
+    raw = generate_defect_data(rows, seed=args.seed, num_modules=args.modules)
+
+    # 读取Excel（写出文件的耗时不计入；行数相同的测试文件在各数据规模间复用）
+    ingest_rows = min(rows, args.ingest_rows)
+    path = os.path.join(tmp, f'ingest_{ingest_rows}.xlsx')
+    if not os.path.exists(path):
+        write_excel(raw.iloc[:ingest_rows], path)
+    best, mean, _ = measure(lambda: pd.read_excel(path), args.ingest_repeat)
+    record('ingest.read_excel', ingest_rows, best, mean)
+    best, mean, _ = measure(lambda: read_defect_excel(path), args.ingest_repeat)
+    record('ingest.streaming', ingest_rows, best, mean)
+
+    # 预处理（每次在数据副本上执行，复制的耗时不计入）
+    best, mean, _ = measure(apply_status_mapping, args.repeat, setup=lambda: (raw.copy(),))
+    record('apply_status_mapping', rows, best, mean)
+    best, mean, df = measure(normalize_defect_frame, args.repeat, setup=lambda: (raw.copy(),))
+    record('normalize', rows, best, mean)
+
+    best, mean, modules = measure(lambda: get_module_list(df), args.repeat)
+    record('get_module_list', rows, best, mean)
+    best, mean, statuses = measure(lambda: get_status_list(df), args.repeat)
+    record('get_status_list', rows, best, mean)
+    best, mean, index = measure(lambda: FilterIndex(df), args.repeat)
+    record('filter_index', rows, best, mean)
+
+    # 统计分析：选择一半模块（含空模块）和部分状态，覆盖过滤逻辑；各环节分别取最短耗时
+    selected_modules = modules[:max(1, len(modules) // 2 + 1)]
+    selected_statuses = [s for s in ('待修复', '待验证', '已关闭') if s in statuses]
+    sections = {}
+    totals = []
+    for _ in range(args.repeat):
+        timings = {}
+        start = time.perf_counter()
+        analyze_defect_data(df, selected_modules, selected_statuses, compact=True, filter_index=index, timings=timings)
+        totals.append(time.perf_counter() - start)
+        for name, seconds in timings.items():
+            sections.setdefault(name, []).append(seconds)
+    record('analyze.total', rows, min(totals), sum(totals) / len(totals))
+    for name, times in sections.items():
+        record(f'analyze.{name}', rows, min(times), sum(times) / len(times))
+
+    # 图表明细：与上面相同的过滤条件下，状态分布中"待修复"对应的行及第一页数据
+    segment = {'type': 'status', 'value': '待修复'}
+    best, mean, selected = measure(
+        lambda: select_segment_rows(df, segment, selected_modules, selected_statuses, index), args.repeat)
+    record('rows.select', rows, best, mean)
+    columns = [col for col in df.columns if col not in DERIVED_COLUMNS]
+    best, mean, _ = measure(lambda: rows_to_records(df, selected[:100], columns), args.repeat)
+    record('rows.page', min(100, len(selected)), best, mean)
+
+    best, mean, classification = measure(lambda: classify_keywords_deterministic(df['标题'], KEYWORDS), args.repeat)
+    record('keyword_classification', rows, best, mean)
+
+    # 导出（xlsx只导出前--export-rows行）
+    for export_format in args.export_formats:
+        n = min(rows, args.export_rows) if export_format == 'xlsx' else rows
+        subset, extra = (df, classification) if n == rows else (df.iloc[:n], classification.iloc[:n])
+        output = os.path.join(tmp, 'export.' + export_format)
+        best, mean, _ = measure(lambda: write_export(subset, output, export_format, {'关键字归类': extra}),
+                                args.export_repeat)
+        record(f'export.{export_format}', n, best, mean)
+    return results
+
+def compare(report, baseline, threshold):
+    """与基准报告对比，打印耗时比例，返回是否存在超过阈值的回归"""
+    previous = {(r['size'], r['name']): r['seconds'] for r in baseline['results']}
+    print(f"\n对比基准 {baseline['meta'].get('commit')}（{baseline['meta'].get('created_at')}）")
+    print(f"{'数据规模':>10} {'测试项':<32} {'基准(秒)':>12} {'当前(秒)':>12} {'比例':>8}")
+    regressed = False
+    for result in report['results']:
+        key = (result['size'], result['name'])
+        if key not in previous:
+            continue
+        ratio = result['seconds'] / previous[key] if previous[key] > 0 else float('inf')
+        flag = ''
+        # 很短的耗时（<1毫秒）波动大，不判定回归
+        if ratio > threshold and result['seconds'] >= 0.001:
+            flag = '  ← 回归'
+            regressed = True
+        print(f"{result['size']:>10} {result['name']:<32} {previous[key]:>12.4f} {result['seconds']:>12.4f} "
+              f"{ratio:>7.2f}x{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='性能基准测试套件')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--modules', type=int, default=120, help='生成数据的缺陷模块数量')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--ingest-rows', type=int, default=100000, help='读取Excel测试的最大行数')
+    parser.add_argument('--ingest-repeat', type=int, default=1)
+    parser.add_argument('--export-rows', type=int, default=50000, help='导出xlsx测试的最大行数')
+    parser.add_argument('--export-repeat', type=int, default=1)
+    parser.add_argument('--export-formats', nargs='+', default=EXPORT_FORMATS, choices=EXPORT_FORMATS)
+    parser.add_argument('--output', default='benchmark_report.json', help='JSON报告的保存路径')
+    parser.add_argument('--compare', help='用于对比的基准报告（JSON）')
+    parser.add_argument('--threshold', type=float, default=1.25, help='耗时超过基准的该倍数时判定为回归')
+    args = parser.parse_args()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'modules': args.modules,
+            'repeat': args.repeat
+        },
+        'results': []
+    }
+    print(f"{'数据规模':>10} {'测试项':<32} {'行数':>10} {'最短(秒)':>12} {'平均(秒)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.sizes:
+            report['results'].extend(run_size(rows, args, tmp))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'\n报告已保存: {args.output}')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
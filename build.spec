@@ -3,7 +3,7 @@
 block_cipher = None
 
 a = Analysis(
-    ['app.py'],
+    ['launcher.py'],  # 快速启动入口：先监听端口，app.py在后台线程中加载
     pathex=[],
     binaries=[],
     datas=[
@@ -16,6 +16,7 @@ a = Analysis(
         ('调试模式启动.bat', '.'),              # 中文调试脚本（备用）
     ],
     hiddenimports=[
+        'app',  # 由launcher.py在运行时导入
         'openpyxl',
         'pandas',
         'flask',
@@ -1,9 +1,21 @@
 """
 创建示例缺陷数据Excel文件
+
+不带参数运行时生成50条示例数据（sample_defect_data.xlsx），
+也可以生成大规模数据集用于性能测试（数据按列向量化生成，相同种子生成相同的数据）
+
+用法:
+    python create_sample_data.py
+    python create_sample_data.py --rows 1000000 --modules 120 --seed 1 --output defect_1m.xlsx
+    python create_sample_data.py --rows 5000000 --output defect_5m.csv
+超过Excel单个工作表行数上限（1048575行数据）时自动拆分为多个工作表
 """
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import random
 
 # 设置中文字体支持
 pd.set_option('display.unicode.ambiguous_as_wide', True)
@@ -11,67 +23,149 @@ pd.set_option('display.unicode.east_asian_width', True)
 
 # 准备示例数据
 status_list = ['新建', '修复中', '待修复', '待验证', '已关闭']
+# 状态分布：大部分缺陷已关闭，少量处于处理中
+status_weights = [0.12, 0.10, 0.13, 0.15, 0.50]
 category_list = ['功能缺陷', '性能问题', '界面问题', '兼容性问题', '安全问题']
 level_list = ['A', 'B', 'C', 'D']  # 缺陷级别
 tag_list = ['【二阶段】', '【三阶段】', '【紧急】', '【常规】']  # 标签
-module_list = ['用户模块', '订单模块', '支付模块', '商品模块', '系统设置', None, None]  # 包含空值
+title_list = ['用户无法登录', '数据显示错误', '页面加载缓慢', '按钮点击无响应', '数据保存失败']
+module_list = ['用户模块', '订单模块', '支付模块', '商品模块', '系统设置']
 handler_list = ['张三', '李四', '王五', '赵六', '钱七']
 reason_list = ['需求理解偏差', '代码逻辑错误', '测试不充分', '环境配置问题', '第三方接口问题']
-analysis_type_list = ['功能', '数据', '数据', '功能', None]  # 缺陷分析类型，包含空值
-
-# 生成50条示例数据
-num_records = 50
-data = []
+analysis_type_list = ['功能', '数据']  # 缺陷分析类型
 
 base_date = datetime(2020, 1, 1)
 
-for i in range(num_records):
-    record_id = f"55{600 + i:03d}"
-    status = random.choice(status_list)
-    tag = random.choice(tag_list)
-    title = f"{tag}{random.choice(['用户无法登录', '数据显示错误', '页面加载缓慢', '按钮点击无响应', '数据保存失败'])}"
-    category = random.choice(category_list)
-    level = random.choice(level_list)
-    module = random.choice(module_list)
-    handler = random.choice(handler_list)
-    reason = random.choice(reason_list)
-    
-    # 生成时间
-    create_days = random.randint(0, 365)
-    create_time = base_date + timedelta(days=create_days, hours=random.randint(8, 18), minutes=random.randint(0, 59))
-    update_time = create_time + timedelta(hours=random.randint(1, 72))
-    
-    # 如果已关闭，添加完成时间
-    complete_time = None
-    if status == '已关闭':
-        complete_time = update_time + timedelta(hours=random.randint(1, 48))
-    
-    data.append({
-        '事项ID': record_id,
+# Excel单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+# 写出Excel/CSV时每块的行数
+WRITE_CHUNK_ROWS = 50000
+
+def _choice(rng, values, size, weights=None, null_rate=0.0):
+    """按权重从取值表中抽样，null_rate的比例为空值（None）"""
+    values = np.array(list(values) + [None], dtype=object)
+    p = np.full(len(values) - 1, 1.0 / (len(values) - 1)) if weights is None else np.asarray(weights, dtype=float)
+    p = np.append(p / p.sum() * (1 - null_rate), null_rate)
+    return values[rng.choice(len(values), size=size, p=p)]
+
+def generate_defect_data(num_records=50, seed=None, num_modules=None, days=365, start_date=base_date,
+                         module_null_rate=2 / 7, analysis_null_rate=0.2):
+    """
+    生成示例缺陷数据（按列向量化生成，百万行级别只需数秒）
+
+    Args:
+        num_records: 记录条数
+        seed: 随机种子，相同种子生成相同的数据
+        num_modules: 缺陷模块数量，为None时使用默认的5个模块（均匀分布）；
+            指定时生成"模块001"...，按长尾（Zipf）分布，少数模块占大部分缺陷
+        days: 创建时间分布的天数（从start_date起）
+        start_date: 最早的创建日期
+        module_null_rate: 缺陷模块为空的比例
+        analysis_null_rate: 缺陷分析类型为空的比例
+    """
+    rng = np.random.default_rng(seed)
+    n = num_records
+
+    status = _choice(rng, status_list, n, status_weights)
+    tag_codes = rng.integers(0, len(tag_list), n)
+    title_codes = rng.integers(0, len(title_list), n)
+    # 标题 = 标签 + 描述，按组合预先拼接，按编码取值
+    titles = np.array([tag + title for tag in tag_list for title in title_list], dtype=object)
+    tags = np.array(tag_list, dtype=object)
+
+    if num_modules is None:
+        modules = _choice(rng, module_list, n, null_rate=module_null_rate)
+    else:
+        names = [f'模块{i + 1:03d}' for i in range(num_modules)]
+        modules = _choice(rng, names, n, weights=1.0 / np.arange(1, num_modules + 1), null_rate=module_null_rate)
+
+    # 生成时间：创建时间为工作时间，更新时间在1-72小时后，已关闭的缺陷完成时间再晚1-48小时
+    start = np.datetime64(start_date, 's')
+    create_time = (start
+                   + rng.integers(0, days + 1, n).astype('timedelta64[D]')
+                   + rng.integers(8, 19, n).astype('timedelta64[h]')
+                   + rng.integers(0, 60, n).astype('timedelta64[m]'))
+    update_time = create_time + rng.integers(1, 73, n).astype('timedelta64[h]')
+    complete_time = update_time + rng.integers(1, 49, n).astype('timedelta64[h]')
+    complete_time[status != '已关闭'] = np.datetime64('NaT')
+
+    return pd.DataFrame({
+        '事项ID': np.char.add('55', np.arange(600, 600 + n).astype(str)).astype(object),
         '事项类型': '缺陷',
-        '标签': tag,
-        '标题': title,
+        '标签': tags[tag_codes],
+        '标题': titles[tag_codes * len(title_list) + title_codes],
         '状态': status,
-        '创建时间': create_time.strftime('%Y-%m-%d %H:%M:%S'),
-        '更新时间': update_time.strftime('%Y-%m-%d %H:%M:%S'),
-        '完成时间': complete_time.strftime('%Y-%m-%d %H:%M:%S') if complete_time else '',
-        '处理人': handler,
-        '责任原因': reason,
-        '缺陷分类': category,
-        '缺陷级别': level,
-        '缺陷模块': module if module else None,  # 可能为空
-        '缺陷分析类型': random.choice(analysis_type_list)  # 可能为空
+        '创建时间': create_time,
+        '更新时间': update_time,
+        '完成时间': complete_time,
+        '处理人': _choice(rng, handler_list, n),
+        '责任原因': _choice(rng, reason_list, n),
+        '缺陷分类': _choice(rng, category_list, n),
+        '缺陷级别': _choice(rng, level_list, n),
+        '缺陷模块': modules,  # 可能为空
+        '缺陷分析类型': _choice(rng, analysis_type_list, n, null_rate=analysis_null_rate)  # 可能为空
     })
 
-# 创建DataFrame
-df = pd.DataFrame(data)
+def write_excel(df, path, sheet_name='缺陷数据', max_rows=EXCEL_MAX_ROWS):
+    """
+    以openpyxl的write_only模式分块写出Excel，内存占用与总行数无关
+    数据超过单个工作表的行数上限时拆分为多个工作表（缺陷数据、缺陷数据_2、...），每个工作表都有表头
+
+    Returns:
+        工作表数量
+    """
+    from openpyxl import Workbook
+
+    rows_per_sheet = max_rows - 1
+    workbook = Workbook(write_only=True)
+    sheets = max(1, -(-len(df) // rows_per_sheet))
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(sheet_name if sheet_index == 0 else f'{sheet_name}_{sheet_index + 1}')
+        sheet.append(list(df.columns))
+        sheet_end = min(len(df), (sheet_index + 1) * rows_per_sheet)
+        for start in range(sheet_index * rows_per_sheet, sheet_end, WRITE_CHUNK_ROWS):
+            chunk = df.iloc[start:min(start + WRITE_CHUNK_ROWS, sheet_end)]
+            # 空值（None/NaT）写为空单元格
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                sheet.append(row)
+    workbook.save(path)
+    return sheets
+
+def write_csv(df, path):
+    """分块写出CSV（UTF-8 BOM，Excel可直接打开），文件名以.gz结尾时压缩"""
+    compression = 'gzip' if path.endswith('.gz') else None
+    df.to_csv(path, index=False, encoding='utf-8-sig', chunksize=WRITE_CHUNK_ROWS,
+              date_format='%Y-%m-%d %H:%M:%S', compression=compression)
+
+def main():
+    parser = argparse.ArgumentParser(description='生成示例/大规模缺陷数据')
+    parser.add_argument('--rows', type=int, default=50, help='记录条数（默认50）')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--modules', type=int, default=None, help='缺陷模块数量（默认使用5个示例模块）')
+    parser.add_argument('--days', type=int, default=365, help='创建时间分布的天数')
+    parser.add_argument('--module-null-rate', type=float, default=2 / 7, help='缺陷模块为空的比例')
+    parser.add_argument('--output', default='sample_defect_data.xlsx', help='输出文件（.xlsx、.csv或.csv.gz）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    df = generate_defect_data(args.rows, seed=args.seed, num_modules=args.modules, days=args.days,
+                              module_null_rate=args.module_null_rate)
+    generate_seconds = time.perf_counter() - start
 
-# 保存到Excel
-output_file = 'sample_defect_data.xlsx'
-df.to_excel(output_file, index=False, sheet_name='缺陷数据')
+    start = time.perf_counter()
+    if args.output.endswith(('.csv', '.csv.gz')):
+        write_csv(df, args.output)
+        sheets = None
+    else:
+        sheets = write_excel(df, args.output)
+    write_seconds = time.perf_counter() - start
 
-print(f"示例数据已生成：{output_file}")
-print(f"共生成 {len(df)} 条缺陷记录")
-print("\n数据预览：")
-print(df.head(10))
+    print(f"示例数据已生成：{args.output}" + (f"（{sheets}个工作表）" if sheets and sheets > 1 else ''))
+    print(f"共生成 {len(df)} 条缺陷记录，生成耗时 {generate_seconds:.2f} 秒，写出耗时 {write_seconds:.2f} 秒")
+    if len(df) <= 1000:
+        print("\n数据预览：")
+        print(df.head(10))
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+程序入口（快速启动）：先监听端口并返回首页，较重的分析模块（app.py，依赖pandas/NumPy）在后台线程中加载
+
+直接运行app.py时，要等pandas、NumPy、Flask全部导入完成才开始监听端口，
+打包后的exe还要先解压，冷启动需要数秒。通过本文件启动时：
+    - 监听端口后立即在后台线程中加载app.py
+    - 加载完成前，首页（/）和静态文件（/static/...）由本文件直接返回
+    - 其他请求（上传、统计等）等待加载完成后交给app.py中的Flask应用处理
+    - 多进程模式（--workers大于1）或指定--preload时，先加载app.py再监听端口（与python app.py相同）
+本文件只依赖标准库和werkzeug，不导入pandas/NumPy；打包配置（build.spec）以本文件为入口
+
+用法:
+    python launcher.py
+    python launcher.py --port 8080 --no-browser
+    python launcher.py --workers 4 --threads 8
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import traceback
+import webbrowser
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from werkzeug.middleware.shared_data import SharedDataMiddleware
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# 模板和静态文件所在目录（打包后为解压目录）
+BASE_DIR = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+# 非首页请求等待分析模块加载的最长时间（秒），超时返回503
+LOAD_TIMEOUT = 300
+# 首页模板中引用静态文件的表达式，加载完成前替换为静态文件路径
+_STATIC_URL = re.compile(r"\{\{\s*url_for\('static',\s*filename='([^']+)'\)\s*\}\}")
+
+class _RequestHandler(WSGIRequestHandler):
+    # 每个请求处理完即关闭连接，空闲的长连接不会占用线程池中的线程
+    protocol_version = 'HTTP/1.0'
+
+class PooledWSGIServer(BaseWSGIServer):
+    """使用固定大小线程池处理请求的WSGI服务器；fd不为None时使用已经监听的套接字（多进程共享）"""
+
+    multithread = True
+
+    def __init__(self, host, port, wsgi_app, threads=8, fd=None):
+        super().__init__(host, port, wsgi_app, handler=_RequestHandler, fd=fd)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+def _json_response(start_response, status, payload, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    start_response(status, [('Content-Type', 'application/json'), ('Content-Length', str(len(body))), *headers])
+    return [body]
+
+class LazyApp:
+    """
+    在后台线程中加载app.py的WSGI应用
+    加载完成后所有请求交给Flask应用；加载完成前首页和静态文件直接返回，其他请求等待加载完成
+    """
+
+    def __init__(self, module='app', root=BASE_DIR, timeout=LOAD_TIMEOUT, on_load=None, log=print):
+        self.module = module
+        self.root = root
+        self.timeout = timeout
+        self.on_load = on_load  # 加载完成后以模块为参数调用，用于应用命令行参数
+        self.log = log
+        self.app = None
+        self.error = None
+        self.load_seconds = None
+        self._loaded = threading.Event()
+        self._template = None
+        self._static = SharedDataMiddleware(self._wait_for_app, {'/static': os.path.join(root, 'static')})
+
+    def start(self):
+        threading.Thread(target=self._load, name='app-loader', daemon=True).start()
+        return self
+
+    def wait(self, timeout=None):
+        """等待加载结束（成功或失败），返回是否已结束"""
+        return self._loaded.wait(timeout)
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            module = importlib.import_module(self.module)
+            if self.on_load is not None:
+                self.on_load(module)
+            self.app = module.app
+            self.load_seconds = time.perf_counter() - start
+            self.log(f'分析模块加载完成，耗时 {self.load_seconds:.2f} 秒')
+        except Exception as e:
+            self.error = e
+            self.log(f'错误: 分析模块加载失败: {e!r}')
+            self.log(traceback.format_exc())
+        finally:
+            self._loaded.set()
+
+    def _index(self, environ, start_response):
+        """不经过Flask渲染首页：模板中只有静态文件地址需要替换，含其他模板语法时返回None"""
+        if self._template is None:
+            with open(os.path.join(self.root, 'templates', 'index.html'), 'r', encoding='utf-8') as f:
+                self._template = f.read()
+        prefix = environ.get('SCRIPT_NAME', '').rstrip('/')
+        html = _STATIC_URL.sub(lambda m: f'{prefix}/static/{m.group(1)}', self._template)
+        if '{{' in html or '{%' in html:
+            return None
+        body = html.encode('utf-8')
+        start_response('200 OK', [('Content-Type', 'text/html; charset=utf-8'), ('Content-Length', str(len(body))),
+                                  ('Cache-Control', 'no-cache')])
+        return [] if environ['REQUEST_METHOD'] == 'HEAD' else [body]
+
+    def _wait_for_app(self, environ, start_response):
+        if not self._loaded.wait(self.timeout):
+            return _json_response(start_response, '503 Service Unavailable', {'error': '服务正在启动，请稍后重试'},
+                                  [('Retry-After', '5')])
+        if self.app is None:
+            return _json_response(start_response, '500 Internal Server Error',
+                                  {'error': f'加载分析模块失败: {self.error}'})
+        return self.app(environ, start_response)
+
+    def __call__(self, environ, start_response):
+        if self.app is not None:
+            return self.app(environ, start_response)
+        if not self._loaded.is_set() and environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            path = environ.get('PATH_INFO') or '/'
+            if path == '/':
+                response = self._index(environ, start_response)
+                if response is not None:
+                    return response
+            elif path.startswith('/static/'):
+                # 静态文件存在时直接返回，不存在时交给Flask应用（返回404）
+                return self._static(environ, start_response)
+        return self._wait_for_app(environ, start_response)
+
+def check_port(port):
+    """检查端口是否可用"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(1)
+    try:
+        result = sock.connect_ex(('127.0.0.1', port))
+        sock.close()
+        return result != 0  # 返回True表示端口可用
+    except:
+        return False
+
+def main(argv=None, app_module=None):
+    """
+    解析命令行参数并启动Web服务
+    app_module为已导入的app模块（python app.py）时直接使用，否则按启动模式加载
+    """
+    parser = argparse.ArgumentParser(description='Excel缺陷数据统计分析工具')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000, help='端口被占用时依次尝试后续9个端口')
+    parser.add_argument('--workers', type=int, default=1, help='工作进程数（大于1时会话数据在进程间共享）')
+    parser.add_argument('--threads', type=int, default=8, help='每个工作进程的请求处理线程数')
+    parser.add_argument('--no-browser', action='store_true', help='启动后不自动打开浏览器')
+    parser.add_argument('--profile', type=float, default=None, metavar='RATE',
+                        help='按比例（0-1）抽样用cProfile分析请求，结果保存到logs目录')
+    parser.add_argument('--preload', action='store_true', help='先加载分析模块再监听端口（不使用快速启动）')
+    args = parser.parse_args(argv)
+
+    def configure(module):
+        if args.profile is not None:
+            module.app.config['PROFILE_SAMPLE_RATE'] = args.profile
+
+    # 创建日志目录
+    log_dir = 'logs'
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    # 设置日志文件
+    log_file = os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+
+    def log(message):
+        """记录日志到文件和控制台"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        log_message = f'[{timestamp}] {message}'
+        print(log_message)
+        try:
+            with open(log_file, 'a', encoding='utf-8') as f:
+                f.write(log_message + '\n')
+        except:
+            pass
+
+    try:
+        log('='*60)
+        log('Excel缺陷数据统计分析工具启动中...')
+        log('='*60)
+
+        # 检查端口
+        port = args.port
+        if not check_port(port):
+            log(f'警告: 端口 {port} 已被占用，尝试使用其他端口...')
+            for test_port in range(args.port + 1, args.port + 10):
+                if check_port(test_port):
+                    port = test_port
+                    log(f'使用端口: {port}')
+                    break
+            else:
+                log(f'错误: 无法找到可用端口 ({args.port}-{args.port + 9} 都被占用)')
+                log('请关闭其他占用端口的程序后重试')
+                input('\n按回车键退出...')
+                sys.exit(1)
+
+        # 多进程模式需要在创建工作进程前加载完成，各进程共享已导入的模块
+        preload = app_module is not None or args.preload or args.workers > 1
+        if preload:
+            module = app_module if app_module is not None else importlib.import_module('app')
+            configure(module)
+            server = None
+        else:
+            # 先监听端口，分析模块在后台加载
+            lazy_app = LazyApp(on_load=configure, log=log)
+            server = PooledWSGIServer(args.host, port, lazy_app, args.threads)
+            lazy_app.start()
+
+        log(f'启动Web服务器...')
+        log(f'访问地址: http://localhost:{port}')
+        log(f'日志文件: {log_file}')
+        log('='*60)
+        log('服务器运行中... 按 Ctrl+C 停止服务')
+        log('='*60)
+
+        # 自动打开浏览器
+        if not args.no_browser:
+            try:
+                webbrowser.open(f'http://localhost:{port}')
+                log('已自动打开浏览器')
+            except:
+                log('无法自动打开浏览器，请手动访问上述地址')
+
+        if server is None:
+            # 启动Web服务（多进程 + 线程池）
+            module.serve(args.host, port, workers=args.workers, threads=args.threads, log=log)
+        else:
+            server.serve_forever()
+
+    except KeyboardInterrupt:
+        log('\n服务器已停止')
+    except Exception as e:
+        log(f'错误: {str(e)}')
+        log(f'详细错误信息: {repr(e)}')
+        log('完整错误堆栈:')
+        log(traceback.format_exc())
+        log('='*60)
+        log('程序遇到错误，请查看上述日志信息')
+        log(f'日志已保存到: {log_file}')
+        input('\n按回车键退出...')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    # 打包为exe后，多进程解析工作表的子进程需要由此进入
+    multiprocessing.freeze_support()
+    main()
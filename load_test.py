@@ -0,0 +1,134 @@
+"""
+/analyze本地压力测试：分别以1、2、4、8个工作进程启动服务，统计每秒请求数和延迟
+
+每轮测试启动一个新的服务进程（python app.py --workers N），上传同一份生成的数据后，
+由多个并发客户端在固定时长内发送模块/状态组合随机的/analyze请求。
+数据只上传到其中一个工作进程，其余进程需要从共享存储读取，请求失败会计入错误数。
+
+用法:
+    python load_test.py
+    python load_test.py --workers 1 4 --rows 20000 --duration 10 --concurrency 16
+"""
+import argparse
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+import uuid
+
+from app import STATUS_MAPPING, get_module_list
+from create_sample_data import generate_defect_data
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f'服务在{timeout}秒内未启动')
+
+def upload(base_url, content):
+    """以multipart/form-data上传Excel文件，返回会话ID"""
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="load_test.xlsx"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(f'{base_url}/upload', data=body,
+                                     headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.loads(response.read())['timestamp']
+
+def run_clients(base_url, session_id, modules, statuses, duration, concurrency, seed):
+    """并发发送/analyze请求，返回（延迟列表，错误数，缓存命中数）"""
+    latencies = []
+    errors = [0]
+    hits = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(index):
+        rng = random.Random(seed + index)
+        while time.time() < deadline:
+            # 随机的模块/状态组合，大部分请求不会命中结果缓存
+            payload = {
+                'timestamp': session_id,
+                'modules': rng.sample(modules, rng.randint(1, len(modules))),
+                'statuses': rng.sample(statuses, rng.randint(1, len(statuses))),
+                'compact': True
+            }
+            request = urllib.request.Request(f'{base_url}/analyze', data=json.dumps(payload).encode('utf-8'),
+                                             headers={'Content-Type': 'application/json'})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as response:
+                    response.read()
+                    hit = response.headers.get('X-Analyze-Cache') == 'HIT'
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    hits[0] += hit
+            except Exception:
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], hits[0]
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description='/analyze多进程压力测试')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--threads', type=int, default=8, help='每个工作进程的线程数')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--duration', type=float, default=15, help='每轮测试时长（秒）')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--port', type=int, default=5600)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    df = generate_defect_data(args.rows, seed=args.seed)
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    content = buffer.getvalue()
+    modules = get_module_list(df)
+    statuses = sorted(set(STATUS_MAPPING.values()) | set(df['状态'].dropna().unique()))
+
+    print(f'行数: {args.rows}  并发: {args.concurrency}  每进程线程数: {args.threads}  CPU核数: {os.cpu_count()}')
+    print(f"{'进程数':>6} {'请求数':>8} {'请求/秒':>10} {'P50(ms)':>10} {'P95(ms)':>10} {'错误':>6} {'缓存命中':>8}")
+    for workers in args.workers:
+        # 每轮使用独立的工作目录，上传数据和缓存互不影响
+        with tempfile.TemporaryDirectory() as workdir:
+            server = subprocess.Popen(
+                [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'),
+                 '--workers', str(workers), '--threads', str(args.threads),
+                 '--port', str(args.port), '--host', '127.0.0.1', '--no-browser'],
+                cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for_port(args.port)
+                base_url = f'http://127.0.0.1:{args.port}'
+                session_id = upload(base_url, content)
+                latencies, errors, hits = run_clients(base_url, session_id, modules, statuses,
+                                                      args.duration, args.concurrency, args.seed)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        count = len(latencies)
+        print(f'{workers:>6} {count:>8} {count / args.duration:>10.1f} {percentile(latencies, 0.5) * 1000:>10.1f} '
+              f'{percentile(latencies, 0.95) * 1000:>10.1f} {errors:>6} {hits / max(count, 1):>7.1%}')
+
+if __name__ == '__main__':
+    main()
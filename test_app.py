@@ -1,8 +1,50 @@
 """
 简单测试脚本，验证统计功能是否正常
 """
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import tracemalloc
+import numpy as np
 import pandas as pd
-from app import analyze_defect_data, get_module_list, apply_status_mapping
+from create_sample_data import generate_defect_data, write_excel
+from app import (analyze_defect_data, get_module_list, apply_status_mapping, read_defect_excel,
+                 save_frame, load_frame, SessionStore, classify_by_keywords,
+                 classify_keywords_deterministic, normalize_defect_frame, analyze_cache_key,
+                 ExportJobs, write_export, export_frame, json_dumps_bytes,
+                 KeywordRegistry, KeywordVersionConflict, merge_delta_frame, read_defect_sources,
+                 SOURCE_COLUMN, FilterIndex, build_filter_mask, get_status_list,
+                 StageRecorder, record_stage, Histogram, _current_stages, app)
+from contextlib import contextmanager
+
+@contextmanager
+def temp_upload_folders():
+    """测试期间将上传、解析缓存、会话、分块上传和导出状态目录指向临时目录，结束后恢复配置并删除"""
+    from app import uploaded_data, chunked_uploads, export_jobs
+    tmp = tempfile.mkdtemp()
+    folders = {
+        'UPLOAD_FOLDER': tmp,
+        'CACHE_FOLDER': os.path.join(tmp, 'cache'),
+        'SESSION_FOLDER': os.path.join(tmp, 'sessions'),
+        'UPLOAD_PARTIAL_FOLDER': os.path.join(tmp, 'partial'),
+        'EXPORT_STATUS_FOLDER': os.path.join(tmp, 'exports')
+    }
+    saved_config = {key: app.config[key] for key in folders}
+    saved_folders = (uploaded_data.folder, chunked_uploads.folder, export_jobs.status_folder)
+    app.config.update(folders)
+    uploaded_data.folder = folders['SESSION_FOLDER']
+    chunked_uploads.folder = folders['UPLOAD_PARTIAL_FOLDER']
+    export_jobs.status_folder = folders['EXPORT_STATUS_FOLDER']
+    try:
+        yield tmp
+    finally:
+        app.config.update(saved_config)
+        uploaded_data.folder, chunked_uploads.folder, export_jobs.status_folder = saved_folders
+        shutil.rmtree(tmp, ignore_errors=True)
 
 def test_analyze():
     print("=" * 60)
@@ -107,8 +149,1028 @@ def test_analyze():
     print("测试完成!")
     print("=" * 60)
 
-if __name__ == '__main__':
-    test_analyze()
+def test_streaming_ingest():
+    print("=" * 60)
+    print("测试流式读取Excel")
+    print("=" * 60)
+    
+    df_stream, ingest_stats = read_defect_excel('sample_defect_data.xlsx')
+    df_full = pd.read_excel('sample_defect_data.xlsx')
+    print(f"✓ 流式读取 {ingest_stats['rows']} 行, 耗时 {ingest_stats['seconds']} 秒, "
+          f"{ingest_stats['rows_per_sec']} 行/秒, 峰值内存 {ingest_stats['peak_memory_mb']} MB")
+    print(f"✓ 保留列: {ingest_stats['columns']}")
+    
+    assert len(df_stream) == len(df_full)
+    assert '处理人' not in df_stream.columns
+    assert str(df_stream['创建时间'].dtype).startswith('datetime64')
+    
+    # 流式读取与完整读取的统计结果应一致
+    assert analyze_defect_data(df_stream.copy()) == analyze_defect_data(df_full.copy())
+    print("✓ 统计结果与pd.read_excel一致")
+
+def test_frame_store():
+    print("=" * 60)
+    print("测试列式缓存读写")
+    print("=" * 60)
+    
+    df, _ = read_defect_excel('sample_defect_data.xlsx')
+    # 预处理后的数据包含category和日期序号列
+    df = normalize_defect_frame(df)
+    print(f"✓ 预处理后的列类型: {dict(df.dtypes.astype(str))}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = os.path.join(tmp_dir, 'frame')
+        save_frame(df, directory)
+        loaded = load_frame(directory)
+        print(f"✓ 缓存文件: {sorted(os.listdir(directory))}")
+        assert loaded.equals(df)
+        assert analyze_defect_data(loaded.copy()) == analyze_defect_data(df.copy())
+        # 释放内存映射，便于在Windows下删除临时目录
+        del loaded
+    print("✓ 缓存读写结果一致")
+    
+    # 格式版本过旧或数据文件缺失的解析缓存会被替换，不会一直未命中
+    from app import load_cached_frame, store_cached_frame, _cache_dir
+    with temp_upload_folders():
+        store_cached_frame('key', df)
+        meta_path = os.path.join(_cache_dir('key'), 'meta.json')
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, version=1), f)
+        assert load_cached_frame('key') is None
+        store_cached_frame('key', df)
+        assert load_cached_frame('key').equals(df)
+        
+        os.remove(os.path.join(_cache_dir('key'), '0.npy'))
+        assert load_cached_frame('key') is None
+        store_cached_frame('key', df)
+        assert load_cached_frame('key').equals(df)
+        assert os.listdir(app.config['CACHE_FOLDER']) == ['key']
+    print("✓ 过旧或损坏的缓存被替换")
+
+def test_session_store():
+    print("=" * 60)
+    print("测试会话存储（内存预算与溢出）")
+    print("=" * 60)
+    
+    df, _ = read_defect_excel('sample_defect_data.xlsx')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # 内存预算设为1字节：只保留最近访问的会话在内存中
+        store = SessionStore(tmp_dir, memory_budget=1, ttl=3600)
+        ids = [SessionStore.new_id() for _ in range(3)]
+        assert len(set(ids)) == 3
+        for session_id in ids:
+            store[session_id] = {'dataframe': df, 'modules': get_module_list(df)}
+        print(f"✓ 已溢出到磁盘的会话: {sorted(os.listdir(tmp_dir))}")
+        assert sorted(os.listdir(tmp_dir)) == sorted(ids[:2])
+        
+        # 溢出的会话可以懒加载回内存
+        entry = store[ids[0]]
+        assert entry['dataframe'].equals(df)
+        assert entry['modules'] == get_module_list(df)
+        del entry
+        
+        # 过期的会话被删除
+        store.ttl = -1
+        assert ids[0] not in store
+        assert len(store) == 0
+    print("✓ 会话溢出、懒加载和过期删除正常")
+    
+    # 共享模式：两个存储实例（模拟两个工作进程）使用同一目录
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        worker_a = SessionStore(tmp_dir, memory_budget=1 << 30, ttl=3600, shared=True)
+        worker_b = SessionStore(tmp_dir, memory_budget=1 << 30, ttl=3600, shared=True)
+        session_id = SessionStore.new_id()
+        worker_a[session_id] = {'dataframe': df, 'modules': get_module_list(df)}
+        entry = worker_b.get(session_id)
+        assert entry is not None and entry['dataframe'].equals(df)
+        assert entry['modules'] == get_module_list(df)
+        del entry
+        
+        # 一个进程中过期不会删除其他进程仍在使用的数据
+        worker_a._entries[session_id]['last_access'] -= 7200
+        worker_a._expire()
+        assert len(worker_a) == 0
+        worker_c = SessionStore(tmp_dir, memory_budget=1 << 30, ttl=3600, shared=True)
+        assert worker_c.get(session_id) is not None
+    print("✓ 共享模式下其他工作进程可以读取上传的数据")
+    
+    # 一个进程替换会话数据（增量合并）后，其他进程改用新版本的数据并清理派生缓存
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        worker_a = SessionStore(tmp_dir, memory_budget=1 << 30, ttl=3600, shared=True)
+        worker_b = SessionStore(tmp_dir, memory_budget=1 << 30, ttl=3600, shared=True)
+        evicted = []
+        worker_b.add_eviction_listener(evicted.append)
+        session_id = SessionStore.new_id()
+        worker_a[session_id] = {'dataframe': df, 'modules': get_module_list(df)}
+        assert len(worker_b.get(session_id)['dataframe']) == len(df)
+        worker_b._touch_disk(session_id)
+        assert worker_b.touch(session_id) and evicted == []
+        
+        worker_a[session_id] = {'dataframe': df.iloc[:40], 'modules': get_module_list(df)}
+        assert worker_b.touch(session_id) and evicted == [session_id]
+        entry = worker_b.get(session_id)
+        assert len(entry['dataframe']) == 40 and entry['version'] == 2
+        del entry
+        assert sorted(os.listdir(os.path.join(tmp_dir, session_id))) == ['session.json', 'v1', 'v2']
+        # 新版本号同时大于其他进程写入的版本号，只保留最近两个版本
+        worker_b[session_id] = {'dataframe': df.iloc[:30], 'modules': get_module_list(df)}
+        assert worker_b.get(session_id)['version'] == 3
+        assert len(worker_a.get(session_id)['dataframe']) == 30
+        assert sorted(os.listdir(os.path.join(tmp_dir, session_id))) == ['session.json', 'v2', 'v3']
+        
+        # 一个进程持有会话的更新锁时，其他进程的更新等待锁释放
+        acquired = threading.Event()
+        def update_in_b():
+            with worker_b.update_lock(session_id):
+                acquired.set()
+        with worker_a.update_lock(session_id):
+            thread = threading.Thread(target=update_in_b)
+            thread.start()
+            assert not acquired.wait(0.2)
+        thread.join(5)
+        assert acquired.is_set()
+    print("✓ 共享模式下会话数据更新后其他工作进程读取新版本")
+    
+    # 会话ID来自请求参数：只接受new_id生成的格式，不能指向会话目录以外的路径
+    assert SessionStore.valid_id(SessionStore.new_id())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SessionStore(os.path.join(tmp_dir, 'sessions'), memory_budget=1 << 30, ttl=3600)
+        for bad_id in ('..', '../x', '20240101_000000_0000000/', '20240101_000000_abcdefgh', 123, ['a'], None):
+            assert not SessionStore.valid_id(bad_id)
+            assert store.get(bad_id) is None and not store.touch(bad_id)
+        client = app.test_client()
+        for bad_id in ('../../app', 123, ['a']):
+            assert client.post('/analyze', json={'timestamp': bad_id}).status_code == 400
+            assert client.post('/rows', json={'timestamp': bad_id, 'segment': {'type': 'status', 'value': 'x'}}).status_code == 400
+        assert client.post('/upload/delta', data={'timestamp': '../x'}).status_code == 400
+    print("✓ 无效的会话ID返回400")
+
+def test_keyword_classification():
+    print("=" * 60)
+    print("测试关键字归类")
+    print("=" * 60)
+    
+    titles = pd.Series(['用户登录失败', 'API超时', '页面显示错误', None, '登录页API报错'])
+    keywords = ['登录', '登录失败', ' api ', '', '超时']
+    result = classify_by_keywords(titles, keywords)
+    print(f"✓ 归类结果: {result.tolist()}")
+    
+    # 重叠关键字都能命中，匹配不区分大小写，空标题归类为"其他"
+    assert result[0] in ('登录', '登录失败')
+    assert result[1] in ('api', '超时')
+    assert result[2] == '其他'
+    assert result[3] == '其他'
+    assert result[4] in ('登录', 'api')
+    
+    # 多次随机选择应覆盖所有命中的关键字
+    many = classify_by_keywords(pd.Series(['用户登录失败'] * 200), keywords)
+    assert set(many) == {'登录', '登录失败'}
+    print("✓ 关键字归类符合匹配规则")
+    
+    # 相同关键字集合（顺序无关）的归类结果是确定的
+    first = classify_keywords_deterministic(many, keywords)
+    second = classify_keywords_deterministic(many, list(reversed(keywords)))
+    assert first.equals(second)
+    
+    # 过滤后的图表统计与全量归类结果一致
+    df = pd.read_excel('sample_defect_data.xlsx')
+    keywords = ['登录', '页面', '数据', '失败']
+    full = classify_keywords_deterministic(df['标题'], keywords)
+    modules = get_module_list(df)[:2]
+    stats = analyze_defect_data(df.copy(), modules, classification_mode='keyword', keywords=keywords)
+    expected = full[df['缺陷模块'].isin(modules)].value_counts().to_dict()
+    assert stats['analysis_type_count'] == {k: v for k, v in expected.items() if v}
+    print("✓ 关键字归类结果确定，图表与导出一致")
+
+def test_analyze_memory():
+    print("=" * 60)
+    print("测试分析过程的内存峰值")
+    print("=" * 60)
+    
+    df, _ = read_defect_excel('sample_defect_data.xlsx')
+    df = normalize_defect_frame(pd.concat([df] * 2000, ignore_index=True))
+    base_bytes = df.memory_usage(deep=True).sum()
+    modules = get_module_list(df)[:3]
+    
+    tracemalloc.start()
+    try:
+        analyze_defect_data(df, modules, ['待修复', '已关闭'])
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    print(f"✓ 数据框 {base_bytes / 1e6:.1f} MB, 分析过程峰值分配 {peak / 1e6:.1f} MB")
+    
+    # 分析过程不复制数据框，峰值分配应明显小于数据框本身
+    assert peak < base_bytes
+    print("✓ 内存峰值在预期范围内")
+
+def test_stay_duration_buckets():
+    print("=" * 60)
+    print("测试缺陷停留时长分段统计")
+    print("=" * 60)
+    
+    df = pd.read_excel('sample_defect_data.xlsx')
+    stats = analyze_defect_data(df, stay_buckets=True)
+    buckets = stats['stay_duration_buckets']
+    print(f"✓ 分段统计: {buckets}")
+    
+    assert list(buckets) == ['0-3天', '4-7天', '8-14天', '15-30天', '30天以上']
+    assert sum(buckets.values()) == sum(stats['stay_duration'].values())
+    for days, count in stats['stay_duration'].items():
+        assert int(days) >= 0 and count > 0
+    print("✓ 分段统计与按天统计一致")
+
+def test_analyze_cache_key():
+    print("=" * 60)
+    print("测试分析结果缓存键")
+    print("=" * 60)
+    
+    key = analyze_cache_key('s1', {'modules': ['A', 'B'], 'statuses': ['待修复'],
+                                   'classification_mode': 'keyword', 'keywords': ['登录', 'API']})
+    # 模块、状态、关键字的顺序和关键字首尾空白不影响缓存键
+    same = analyze_cache_key('s1', {'modules': ['B', 'A'], 'statuses': ['待修复'],
+                                    'classification_mode': 'keyword', 'keywords': [' API', '登录']})
+    assert key == same
+    assert key != analyze_cache_key('s2', {'modules': ['A', 'B'], 'statuses': ['待修复'],
+                                           'classification_mode': 'keyword', 'keywords': ['登录', 'API']})
+    # 人工归类模式下关键字不影响缓存键
+    assert analyze_cache_key('s1', {'keywords': ['登录']}) == analyze_cache_key('s1', {'keywords': ['API']})
+    print("✓ 缓存键与参数顺序无关")
+    
+    # 停留天数按当天计算，日期变化后缓存键不同
+    import app as app_module
+    today = app_module._today_day_number
+    key_today = analyze_cache_key('s1', {'modules': ['A']})
+    try:
+        app_module._today_day_number = lambda: today() + 1
+        assert analyze_cache_key('s1', {'modules': ['A']}) != key_today
+    finally:
+        app_module._today_day_number = today
+    print("✓ 缓存键包含当前日期")
+
+def test_export_jobs():
+    print("=" * 60)
+    print("测试后台导出任务")
+    print("=" * 60)
+    
+    jobs = ExportJobs(workers=1, queue_size=2)
+    release = threading.Event()
+    failures = []
+    
+    def slow_write(path, progress):
+        release.wait(5)
+        with open(path, 'w') as f:
+            f.write('ok')
+    
+    def bad_write(path, progress):
+        release.wait(5)
+        raise RuntimeError('boom')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path_a = os.path.join(tmp, 'a.xlsx')
+        assert jobs.submit('a', path_a, slow_write) == 'a'
+        # 同一任务重复提交不会再次执行
+        assert jobs.submit('a', path_a, slow_write) == 'a'
+        assert jobs.submit('b', os.path.join(tmp, 'b.xlsx'), bad_write,
+                           lambda: failures.append('b')) == 'b'
+        # 队列已满
+        assert jobs.submit('c', os.path.join(tmp, 'c.xlsx'), slow_write) is None
+        print("✓ 排队任务数受上限控制")
+        
+        release.set()
+        jobs._executor.shutdown(wait=True)
+        assert jobs.status('a')['status'] == 'done' and os.path.exists(path_a)
+        assert jobs.status('b')['status'] == 'failed' and failures == ['b']
+        # 只留下最终文件，临时文件已清理
+        assert sorted(os.listdir(tmp)) == ['a.xlsx']
+        print("✓ 任务完成后文件就绪，失败任务已回调")
+    
+    # 多进程：两个任务管理器（模拟两个工作进程）共享状态目录，同一份导出只由一个进程写出
+    with tempfile.TemporaryDirectory() as tmp:
+        status_folder = os.path.join(tmp, 'exports')
+        worker_a = ExportJobs(workers=1, queue_size=2, status_folder=status_folder)
+        worker_b = ExportJobs(workers=1, queue_size=2, status_folder=status_folder)
+        release = threading.Event()
+        calls = []
+        
+        def write(path, progress):
+            calls.append(path)
+            release.wait(5)
+            with open(path, 'w') as f:
+                f.write('ok')
+        
+        path = os.path.join(tmp, 'd.csv')
+        assert worker_a.submit('d', path, write) == 'd'
+        assert worker_b.submit('d', path, write) == 'd'
+        assert worker_b.status('d')['status'] in ('queued', 'running')
+        release.set()
+        worker_a._executor.shutdown(wait=True)
+        assert worker_b.submit('d', path, write) == 'd'
+        worker_b._executor.shutdown(wait=True)
+        assert len(calls) == 1 and worker_b.status('d')['status'] == 'done'
+        assert sorted(os.listdir(tmp)) == ['d.csv', 'exports']
+        
+        # 持有进程已退出（锁文件长时间未刷新）时由其他进程重新执行
+        worker_c = ExportJobs(workers=1, queue_size=2, status_folder=status_folder)
+        lock_path = os.path.join(tmp, '.e.csv.lock')
+        open(lock_path, 'w').close()
+        assert worker_c.submit('e', os.path.join(tmp, 'e.csv'), write) == 'e'
+        assert len(calls) == 1
+        os.utime(lock_path, (0, 0))
+        assert worker_c.submit('e', os.path.join(tmp, 'e.csv'), write) == 'e'
+        worker_c._executor.shutdown(wait=True)
+        assert len(calls) == 2 and os.path.exists(os.path.join(tmp, 'e.csv')) and not os.path.exists(lock_path)
+    print("✓ 多进程下同一份导出只写出一次")
+
+def test_write_export():
+    print("=" * 60)
+    print("测试分块流式导出")
+    print("=" * 60)
+    
+    df = normalize_defect_frame(read_defect_excel('sample_defect_data.xlsx')[0])
+    classification = classify_keywords_deterministic(df['标题'], ['登录', '数据'])
+    expected = export_frame(df)
+    expected['关键字归类'] = classification.astype(object)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for export_format in ['xlsx', 'csv', 'csv.gz']:
+            path = os.path.join(tmp, 'export.' + export_format)
+            progress = []
+            # 块大小小于总行数，验证分块拼接
+            write_export(df, path, export_format, {'关键字归类': classification}, progress.append, chunk_rows=7)
+            if export_format == 'xlsx':
+                result = pd.read_excel(path)
+            else:
+                result = pd.read_csv(path, encoding='utf-8-sig')
+            assert list(result.columns) == list(expected.columns)
+            assert len(result) == len(df)
+            assert result['关键字归类'].tolist() == expected['关键字归类'].tolist()
+            assert result['标题'].tolist() == expected['标题'].tolist()
+            assert progress and progress[-1] == 1.0
+            print(f"✓ {export_format} 导出内容正确")
+
+def test_compact_payload():
+    print("=" * 60)
+    print("测试列式统计数据和JSON序列化")
+    print("=" * 60)
+    
+    df = normalize_defect_frame(read_defect_excel('sample_defect_data.xlsx')[0])
+    stats = analyze_defect_data(df)
+    compact = json.loads(json_dumps_bytes(analyze_defect_data(df, compact=True)))
+    
+    daily = compact['daily_stats']
+    assert daily['dates'] == sorted(set(stats['daily_stats']['daily_new']) | set(stats['daily_stats']['daily_fixed']))
+    assert daily['new'] == [stats['daily_stats']['daily_new'].get(d, 0) for d in daily['dates']]
+    assert daily['fixed'] == [stats['daily_stats']['daily_fixed'].get(d, 0) for d in daily['dates']]
+    stay = compact['stay_duration']
+    assert dict(zip(map(str, stay['days']), stay['counts'])) == stats['stay_duration']
+    print("✓ 列式数据与字典格式一致")
+
+def test_keyword_registry():
+    print("=" * 60)
+    print("测试关键字注册表")
+    print("=" * 60)
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'keywords.json')
+        registry = KeywordRegistry(path)
+        assert registry.snapshot() == ([], 0)
+        
+        keywords, version, changed = registry.update(lambda keywords: keywords + ['登录', ' API ', '登录'])
+        assert keywords == ['登录', 'API'] and version == 1 and changed
+        # 没有变化时不写文件、不增加版本号
+        assert registry.update(lambda keywords: None)[1:] == (1, False)
+        
+        # 其他实例（模拟其他进程）读取到同样的列表和版本号
+        assert KeywordRegistry(path).snapshot() == (['登录', 'API'], 1)
+        
+        try:
+            registry.update(lambda keywords: ['x'], expected_version=0)
+            assert False, '版本不一致时应抛出异常'
+        except KeywordVersionConflict:
+            pass
+        print("✓ 原子写入、版本号和并发冲突检测正常")
+        
+        # 文件损坏时保留内存中的关键字
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{broken')
+        assert registry.snapshot()[0] == ['登录', 'API']
+        # 外部修改文件后重新加载，版本号递增
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'keywords': ['超时']}, f)
+        assert registry.snapshot() == (['超时'], 2)
+        print("✓ 文件变化时重新加载，损坏的文件不会清空关键字")
+
+def test_merge_delta_frame():
+    print("=" * 60)
+    print("测试增量数据合并")
+    print("=" * 60)
+    
+    base = normalize_defect_frame(read_defect_excel('sample_defect_data.xlsx')[0])
+    # 前5行改为已关闭（更新），另加2行新数据（新模块），其中一行重复
+    changed = base.iloc[:5].copy()
+    changed['状态'] = '已关闭'
+    new_rows = base.iloc[:2].copy()
+    new_rows['事项ID'] = ['99001', '99002']
+    new_rows['缺陷模块'] = '新模块'
+    delta = normalize_defect_frame(export_frame(pd.concat([changed, new_rows, new_rows.iloc[1:]])))
+    
+    merged, replaced, stats = merge_delta_frame(base, delta)
+    assert stats['mode'] == 'key'
+    # 原本就是已关闭的行内容没有变化，不算修改
+    already_closed = int((base['状态'].iloc[:5] == '已关闭').sum())
+    assert (stats['inserted'], stats['updated'], stats['unchanged'], stats['duplicates']) == \
+        (2, 5 - already_closed, already_closed, 1)
+    assert len(merged) == len(base) + 2 and len(replaced) == 5 - already_closed
+    assert list(merged.columns) == list(base.columns)
+    # category列保持category类型，新取值追加到取值表
+    assert isinstance(merged['缺陷模块'].dtype, pd.CategoricalDtype)
+    assert '新模块' in merged['缺陷模块'].cat.categories
+    updated = merged[merged['事项ID'].astype(str).isin(changed['事项ID'].astype(str))]
+    assert (updated['映射后状态'] == '已关闭').all()
+    print(f"✓ 按主键合并: {stats}")
+    
+    # 合并结果的统计与整体重新上传一致
+    expected = normalize_defect_frame(export_frame(pd.concat([base.iloc[5:], delta.drop_duplicates('事项ID', keep='last')])))
+    assert analyze_defect_data(merged) == analyze_defect_data(expected)
+    print("✓ 合并后的统计与完整数据一致")
+    
+    # 重新上传相同的数据：全部未变化
+    same = normalize_defect_frame(export_frame(base.copy()))
+    _, replaced, stats = merge_delta_frame(base, same)
+    assert (stats['inserted'], stats['updated'], stats['unchanged']) == (0, 0, len(base)) and replaced.empty
+    print("✓ 内容相同的行计为未变化")
+    
+    # 修改的行原位更新，没有变化的列沿用已有数据的列；返回的行键索引用于下一次合并，结果与重新计算主键一致
+    updated_only = normalize_defect_frame(export_frame(changed))
+    merged, _, stats = merge_delta_frame(base, updated_only)
+    assert np.shares_memory(merged['缺陷模块'].array.codes, base['缺陷模块'].array.codes)
+    assert (merged['事项ID'] == base['事项ID']).all()
+    assert len(stats['_changed_rows']) == stats['updated'] and stats['_key_index'].rows == len(base)
+    second = normalize_defect_frame(export_frame(new_rows.assign(状态='已关闭')))
+    chained, _, chained_stats = merge_delta_frame(merged, second, key_index=stats['_key_index'])
+    expected_frame, _, _ = merge_delta_frame(merged, second)
+    pd.testing.assert_frame_equal(chained, expected_frame)
+    assert chained_stats['_key_index'].rows == len(chained) == len(base) + 2
+    print("✓ 使用上一次合并的行键索引合并结果一致")
+    
+    # 已有数据中主键重复：更新第一行并删除其余行，行号变化时不返回索引
+    duplicated = pd.concat([base, base.iloc[:3]], ignore_index=True)
+    merged, replaced, stats = merge_delta_frame(duplicated, updated_only)
+    assert len(merged) == len(base) and merged['事项ID'].is_unique and len(replaced) == stats['updated'] + 3
+    assert stats['_key_index'] is None and stats['_changed_rows'] is None
+    print("✓ 已有数据中重复的主键合并为一行")
+    
+    # 位图索引只按修改和追加的行增量更新，与按合并后的数据重新建立的索引一致
+    module = base['缺陷模块'].iloc[0]
+    renamed = base[base['缺陷模块'] == module].assign(缺陷模块='改名模块')
+    emptied = base[base['缺陷模块'] != module].iloc[:3].assign(缺陷模块=None, 标题=None)
+    modules_delta = normalize_defect_frame(export_frame(pd.concat([renamed, emptied, new_rows])))
+    merged, _, stats = merge_delta_frame(base, modules_delta)
+    index = FilterIndex(base).updated(merged, stats['_changed_rows'])
+    fresh = FilterIndex(merged)
+    assert set(index.modules) == set(fresh.modules) and module not in index.modules
+    assert set(index.statuses) == set(fresh.statuses)
+    selections = [([module], None), (['改名模块', '（空）'], None), (['新模块'], ['已关闭']),
+                  (get_module_list(merged), None), (None, get_status_list(merged)[:2])]
+    for selected_modules, selected_statuses in selections:
+        for require_title in (False, True):
+            assert np.array_equal(index.mask(selected_modules, selected_statuses, require_title),
+                                  fresh.mask(selected_modules, selected_statuses, require_title))
+    print("✓ 位图索引增量更新与重新建立一致")
+    
+    # 没有主键列时按整行去重
+    no_key = delta.drop(columns=['事项ID'])
+    _, _, stats = merge_delta_frame(base.drop(columns=['事项ID']), no_key)
+    assert stats['mode'] == 'fingerprint' and stats['updated'] == 0
+    # 原本就是已关闭的行内容没有变化，不会重复追加
+    assert stats['inserted'] == 7 - already_closed and stats['unchanged'] == already_closed
+    assert stats['duplicates'] == 1
+    print(f"✓ 按行指纹合并: {stats}")
 
+def test_read_defect_sources():
+    print("=" * 60)
+    print("测试多文件/多工作表读取")
+    print("=" * 60)
+    
+    raw = export_frame(read_defect_excel('sample_defect_data.xlsx', columns=None)[0])
+    with tempfile.TemporaryDirectory() as tmp:
+        # 第一个文件包含两个缺陷工作表和一个汇总表，第二个文件只有一个工作表
+        first = os.path.join(tmp, 'first.xlsx')
+        with pd.ExcelWriter(first) as writer:
+            raw.iloc[:30].to_excel(writer, sheet_name='一月', index=False)
+            raw.iloc[30:50].to_excel(writer, sheet_name='二月', index=False)
+            pd.DataFrame({'合计': [50]}).to_excel(writer, sheet_name='汇总', index=False)
+        second = os.path.join(tmp, 'second.xlsx')
+        raw.iloc[50:].to_excel(second, index=False)
+        sources = [(first, '缺陷.xlsx'), (second, '补充.xlsx')]
+        
+        df, stats = read_defect_sources(sources, all_sheets=True, processes=1)
+        assert len(df) == len(raw)
+        assert list(df[SOURCE_COLUMN].cat.categories) == ['缺陷.xlsx/一月', '缺陷.xlsx/二月', '补充.xlsx/Sheet1']
+        assert df[SOURCE_COLUMN].value_counts(sort=False).tolist() == [30, 20, len(raw) - 50]
+        assert [s['skipped'] for s in stats['sources']] == [False, False, True, False]
+        print(f"✓ 读取 {len(stats['sources'])} 个工作表, 共 {len(df)} 行")
+        
+        # 只读第一个工作表
+        df_first, _ = read_defect_sources(sources, processes=1)
+        assert len(df_first) == len(raw) - 20
+        
+        # 进程池并行解析的结果与依次解析一致
+        df_parallel, stats = read_defect_sources(sources, all_sheets=True, processes=2)
+        assert stats['processes'] == 2
+        pd.testing.assert_frame_equal(df, df_parallel)
+        print("✓ 并行解析结果与依次解析一致")
+        
+        # 合并后的统计与单个文件一致
+        assert analyze_defect_data(normalize_defect_frame(df)) == analyze_defect_data(normalize_defect_frame(raw.copy()))
+        print("✓ 合并后的统计与原始数据一致")
 
+def test_filter_index():
+    print("=" * 60)
+    print("测试模块/状态过滤位图索引")
+    print("=" * 60)
+    
+    df = normalize_defect_frame(read_defect_excel('sample_defect_data.xlsx')[0])
+    # 部分行模块为空，覆盖"（空）"选项
+    df.loc[df.index[::7], '缺陷模块'] = None
+    index = FilterIndex(df)
+    modules = get_module_list(df)
+    statuses = get_status_list(df)
+    assert '（空）' in modules and None in index.modules
+    
+    # 各种选择组合（含全选、空选择、不存在的取值、原始状态名）与逐行比较的结果一致
+    rng = np.random.default_rng(0)
+    selections = [(None, None), (modules, statuses), (['（空）'], None), (['不存在的模块'], ['待修复']),
+                  (None, ['新建', '已关闭'])]
+    for _ in range(50):
+        selections.append((list(rng.choice(modules, rng.integers(1, len(modules) + 1), replace=False)),
+                           list(rng.choice(statuses, rng.integers(1, len(statuses) + 1), replace=False))))
+    for selected_modules, selected_statuses in selections:
+        expected = build_filter_mask(df, selected_modules, selected_statuses)
+        actual = build_filter_mask(df, selected_modules, selected_statuses, index)
+        assert actual.dtype == bool and np.array_equal(expected, actual), (selected_modules, selected_statuses)
+    print(f"✓ {len(selections)} 种选择组合与逐行过滤结果一致")
+    
+    # 统计结果一致；行数不匹配的索引（数据已替换）不会被使用
+    assert analyze_defect_data(df, modules[:3], ['待修复'], filter_index=index) == \
+        analyze_defect_data(df, modules[:3], ['待修复'])
+    assert len(build_filter_mask(df.iloc[:10], modules[:1], None, index)) == 10
+    print(f"✓ 索引大小: {index.nbytes} 字节")
 
+def test_daily_rollup():
+    print("=" * 60)
+    print("测试每日统计的日期范围和粒度")
+    print("=" * 60)
+    
+    df = normalize_defect_frame(read_defect_excel('sample_defect_data.xlsx')[0])
+    created = pd.to_datetime(df.loc[df['标题'].notna(), '创建时间'], errors='coerce').dropna()
+    # 与pandas按周（周一开始）/按月重采样的结果一致，没有数据的周期补0
+    for granularity, rule, label_format in (('week', 'W-MON', '%Y-%m-%d'), ('month', 'MS', '%Y-%m')):
+        stats = analyze_defect_data(df, granularity=granularity, compact=True)
+        daily = stats['daily_stats']
+        assert daily['granularity'] == granularity
+        expected = created.to_frame('t').set_index('t').assign(n=1)['n'].resample(rule, label='left', closed='left').sum()
+        assert daily['dates'] == expected.index.strftime(label_format).tolist()
+        assert daily['new'].tolist() == expected.tolist()
+        print(f"✓ 按{granularity}汇总: {len(daily['dates'])} 个周期")
+    
+    # 日期范围：两端都包含，范围内没有数据的日期补0
+    window = analyze_defect_data(df, date_from='2020-03-01', date_to='2020-03-31', granularity='day')['daily_stats']
+    assert len(window['daily_new']) == 31 and list(window['daily_new'])[0] == '2020-03-01'
+    in_window = created[(created >= '2020-03-01') & (created < '2020-04-01')]
+    assert sum(window['daily_new'].values()) == len(in_window)
+    assert window['daily_new']['2020-03-22'] == int((in_window.dt.strftime('%Y-%m-%d') == '2020-03-22').sum())
+    print("✓ 日期范围截取并补0")
+    
+    # 自动粒度按跨度选择；不指定时保持原有格式（只包含有数据的日期）
+    assert analyze_defect_data(df, date_from='2020-01-01', date_to='2020-02-01', granularity='auto')['daily_stats']['granularity'] == 'day'
+    assert analyze_defect_data(df, date_from='2018-01-01', date_to='2020-12-31', granularity='auto')['daily_stats']['granularity'] == 'month'
+    assert 'granularity' not in analyze_defect_data(df)['daily_stats']
+    print("✓ 自动粒度")
+
+def test_generate_defect_data():
+    print("=" * 60)
+    print("测试示例数据生成")
+    print("=" * 60)
+    
+    df = generate_defect_data(20000, seed=7, num_modules=30)
+    # 相同种子生成相同的数据
+    pd.testing.assert_frame_equal(df, generate_defect_data(20000, seed=7, num_modules=30))
+    assert df['事项ID'].is_unique
+    assert 0.25 < df['缺陷模块'].isna().mean() < 0.32
+    # 只有已关闭的缺陷有完成时间，且完成时间晚于更新时间、更新时间晚于创建时间
+    closed = df['状态'] == '已关闭'
+    assert df.loc[~closed, '完成时间'].isna().all() and df.loc[closed, '完成时间'].notna().all()
+    assert (df.loc[closed, '完成时间'] > df.loc[closed, '更新时间']).all() and (df['更新时间'] > df['创建时间']).all()
+    # 长尾分布：第一个模块的缺陷最多
+    counts = df['缺陷模块'].value_counts()
+    assert counts.index[0] == '模块001' and len(counts) == 30
+    print(f"✓ 生成 {len(df)} 行, 模块为空比例 {df['缺陷模块'].isna().mean():.1%}")
+    
+    # 超过工作表行数上限时拆分为多个工作表，全部工作表读取后与原数据一致
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'split.xlsx')
+        assert write_excel(df.iloc[:250], path, max_rows=101) == 3
+        loaded, stats = read_defect_sources([(path, 'split.xlsx')], all_sheets=True, processes=1)
+        assert [s['rows'] for s in stats['sources']] == [100, 100, 50]
+        assert loaded['事项ID'].astype(str).tolist() == df['事项ID'].iloc[:250].tolist()
+        print("✓ 按工作表行数上限拆分")
+
+def test_stage_metrics():
+    print("=" * 60)
+    print("测试性能埋点和指标")
+    print("=" * 60)
+    
+    df = normalize_defect_frame(read_defect_excel('sample_defect_data.xlsx')[0])
+    # 没有进行中的记录时不做统计
+    with record_stage('noop') as stage:
+        pass
+    assert stage.seconds >= 0
+    
+    recorder = StageRecorder()
+    token = _current_stages.set(recorder)
+    try:
+        timings = {}
+        analyze_defect_data(df, timings=timings)
+        with record_stage('custom', rows=3):
+            pass
+    finally:
+        _current_stages.reset(token)
+    names = [name for name, _, _, _ in recorder.stages]
+    assert names == ['analyze.' + name for name in timings] + ['custom']
+    header = recorder.server_timing()
+    assert 'analyze.filter;dur=' in header and 'custom;dur=' in header and 'rows=3' in header
+    assert header.split(', ')[-1].startswith('total;dur=')
+    print(f"✓ Server-Timing: {header[:80]}...")
+    
+    histogram = Histogram('test_seconds', '测试', 'stage', (0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, 'a"b')
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="a\\"b",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a\\"b",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a\\"b",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a\\"b"} 3' in lines
+    
+    response = app.test_client().get('/metrics')
+    text = response.get_data(as_text=True)
+    assert response.status_code == 200 and response.headers['Content-Type'].startswith('text/plain')
+    assert 'Server-Timing' in response.headers
+    for name in ('defect_tool_stage_duration_seconds_bucket{stage="analyze.filter"', 'defect_tool_cache_hits_total',
+                 'defect_tool_session_memory_bytes', 'defect_tool_sessions{location="memory"}'):
+        assert name in text, name
+    # 每个样本行为"指标名{标签} 数值"
+    for line in text.splitlines():
+        if not line.startswith('#'):
+            float(line.rsplit(' ', 1)[1])
+    print(f"✓ /metrics: {len(text.splitlines())} 行")
+
+def test_lazy_launcher():
+    """测试快速启动：launcher不导入pandas，分析模块加载完成前直接返回首页和静态文件"""
+    print("\n" + "=" * 60)
+    print("测试快速启动")
+    print("=" * 60)
+    import subprocess
+    from werkzeug.test import Client
+    from launcher import LazyApp
+    
+    result = subprocess.run([sys.executable, '-c', 'import sys, launcher; print("pandas" in sys.modules)'],
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
+    print("✓ launcher未导入pandas")
+    
+    # 未开始加载：首页和静态文件直接返回，其他请求等待超时后返回503
+    lazy = LazyApp(timeout=0.05, log=lambda message: None)
+    client = Client(lazy)
+    response = client.get('/')
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200 and '/static/js/echarts.min.js' in html and '{{' not in html
+    assert client.get('/static/js/echarts.min.js').status_code == 200
+    response = client.get('/api/keywords')
+    assert response.status_code == 503 and response.headers['Retry-After'] == '5'
+    print("✓ 加载前: / 200, /static 200, /api/keywords 503")
+    
+    lazy.start()
+    assert lazy.wait(60) and lazy.error is None
+    from app import app
+    assert lazy.app is app
+    response = client.get('/api/keywords')
+    assert response.status_code == 200 and 'keywords' in response.get_json()
+    print(f"✓ 加载后请求交给Flask应用（加载耗时 {lazy.load_seconds:.3f} 秒）")
+    
+    broken = LazyApp(module='no_such_module', log=lambda message: None).start()
+    assert broken.wait(60) and isinstance(broken.error, ImportError)
+    assert Client(broken).get('/api/keywords').status_code == 500
+    print("✓ 加载失败时返回500")
+    
+    # 启动失败（线程数无效）时退出码不为0
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run([sys.executable, os.path.abspath('launcher.py'), '--port', '0', '--threads', '0',
+                                 '--no-browser'],
+                                cwd=tmp, input='\n', capture_output=True, text=True, timeout=60)
+    assert result.returncode == 1, result.stdout
+    print("✓ 启动失败时退出码为1")
+
+def test_chunked_upload():
+    """测试分块续传上传：校验和错误、偏移量不一致、续传和完成后解析"""
+    print("\n" + "=" * 60)
+    print("测试分块续传上传")
+    print("=" * 60)
+    import zlib
+    import hashlib
+    from app import chunked_uploads
+    
+    with open('sample_defect_data.xlsx', 'rb') as f:
+        content = f.read()
+    with temp_upload_folders():
+        chunk_size = 2000
+        client = app.test_client()
+    
+        def put(upload_id, offset, chunk, crc=None):
+            crc = zlib.crc32(chunk) if crc is None else crc
+            return client.put(f'/upload/chunked/{upload_id}?offset={offset}', data=chunk,
+                              headers={'X-Chunk-CRC32': f'{crc:08x}'})
+    
+        assert client.post('/upload/chunked', json={'filename': 'a.csv', 'size': 10}).status_code == 400
+        response = client.post('/upload/chunked', json={'filename': 'sample.xlsx', 'size': len(content)})
+        assert response.status_code == 200
+        upload_id = response.get_json()['upload_id']
+    
+        # 校验和错误的分块被丢弃
+        response = put(upload_id, 0, content[:chunk_size], crc=zlib.crc32(content[:chunk_size]) ^ 1)
+        assert response.status_code == 400
+        assert client.get(f'/upload/chunked/{upload_id}').get_json()['received'] == 0
+    
+        # 上传一半后"连接中断"：偏移量不一致时返回已接收的大小，从该位置续传
+        half = len(content) // 2
+        for offset in range(0, half, chunk_size):
+            assert put(upload_id, offset, content[offset:min(offset + chunk_size, half)]).status_code == 200
+        response = put(upload_id, 0, content[:chunk_size])
+        assert response.status_code == 409 and response.get_json()['received'] == half
+        assert client.post('/upload/chunked/finalize', json={'upload_ids': [upload_id]}).status_code == 409
+    
+        # 模拟后续分块由其他进程接收：完成时重新读取文件计算哈希
+        chunked_uploads._hashes.pop(upload_id, None)
+        received = client.get(f'/upload/chunked/{upload_id}').get_json()['received']
+        for offset in range(received, len(content), chunk_size):
+            response = put(upload_id, offset, content[offset:offset + chunk_size])
+            assert response.status_code == 200
+        assert response.get_json()['received'] == len(content)
+        print(f"✓ 分块上传 {len(content)} 字节（校验失败和偏移量不一致后续传）")
+    
+        sha256 = hashlib.sha256(content).hexdigest()
+        response = client.post('/upload/chunked/finalize', json={'upload_ids': [upload_id], 'sha256': {upload_id: sha256}})
+        data = response.get_json()
+        assert response.status_code == 200, data
+        expected = client.post('/upload', data={'file': (io.BytesIO(content), 'sample.xlsx')},
+                               content_type='multipart/form-data').get_json()
+        assert data['total_records'] == expected['total_records'] and data['modules'] == expected['modules']
+        # 与普通上传内容哈希相同，第二次命中解析缓存
+        assert expected['ingest']['cached']
+        assert not os.path.exists(os.path.join(chunked_uploads.folder, upload_id + '.part'))
+        assert client.get(f'/upload/chunked/{upload_id}').status_code == 404
+        print(f"✓ 完成后解析: {data['total_records']} 条记录")
+    
+        response = client.post('/upload/chunked', json={'filename': 'sample.xlsx', 'size': len(content)})
+        upload_id = response.get_json()['upload_id']
+        assert client.delete(f'/upload/chunked/{upload_id}').status_code == 200
+        assert client.get(f'/upload/chunked/{upload_id}').status_code == 404
+        assert client.get('/upload/chunked/../../app.py').status_code == 404
+        print("✓ 取消上传")
+
+def test_rows_drilldown():
+    """测试图表明细：各类图表部分的行数与统计结果一致，游标分页和列投影"""
+    print("\n" + "=" * 60)
+    print("测试图表明细")
+    print("=" * 60)
+    from datetime import datetime, timedelta
+    from app import select_segment_rows, STAY_DURATION_BUCKETS
+    
+    # 创建时间在最近两个月内，停留时长覆盖各个区间
+    raw = generate_defect_data(3000, seed=7, days=60, start_date=datetime.now() - timedelta(days=60))
+    df = normalize_defect_frame(raw.copy())
+    df.loc[df.index[::50], '标题'] = None
+    index = FilterIndex(df)
+    modules = get_module_list(df)[:3]
+    statuses = ['待修复', '待验证', '已关闭']
+    stats = analyze_defect_data(df, modules, statuses, filter_index=index, stay_buckets=True)
+    
+    def count(segment, **kwargs):
+        rows = select_segment_rows(df, segment, modules, statuses, index, **kwargs)
+        assert np.all(np.diff(rows) > 0)
+        return len(rows)
+    
+    for status, value in stats['status_count'].items():
+        assert count({'type': 'status', 'value': status}) == value
+    for days, value in stats['stay_duration'].items():
+        assert count({'type': 'stay', 'days': int(days)}) == value
+    for _, _, name in STAY_DURATION_BUCKETS:
+        assert count({'type': 'stay', 'bucket': name}) == stats['stay_duration_buckets'][name]
+    for kind in ('new', 'fixed'):
+        for date, value in stats['daily_stats'][f'daily_{kind}'].items():
+            assert count({'type': 'daily', 'date': date, 'kind': kind}) == value
+        for granularity in ('week', 'month'):
+            rollup = analyze_defect_data(df, modules, statuses, granularity=granularity)['daily_stats']
+            for date, value in rollup[f'daily_{kind}'].items():
+                assert count({'type': 'daily', 'date': date, 'kind': kind, 'granularity': granularity}) == value
+    for label, value in stats['analysis_type_count'].items():
+        assert count({'type': 'classification', 'value': label}) == value
+    keywords = ['登录', '数据']
+    classification = classify_keywords_deterministic(df['标题'], keywords)
+    keyword_stats = analyze_defect_data(df, modules, statuses, 'keyword', keywords, classification, filter_index=index)
+    for label, value in keyword_stats['analysis_type_count'].items():
+        assert count({'type': 'classification', 'value': label}, keyword_classification=classification) == value
+    print("✓ 状态、停留天数/区间、每日/周/月新增修复、归类的明细行数与统计结果一致")
+    
+    for segment in ({'type': 'unknown'}, {'type': 'stay', 'days': 'x'}, {'type': 'daily', 'date': '2024-13-01', 'kind': 'new'},
+                    {'type': 'daily', 'kind': 'new', 'granularity': 'day'}, {'type': 'daily', 'date': '', 'kind': 'fixed'},
+                    {'type': 'daily', 'kind': 'new', 'granularity': 'week'}, {'type': 'daily', 'kind': 'new', 'granularity': 'month'},
+                    {'type': 'daily', 'date': '2024-01-01', 'kind': 'other'}, {'type': 'stay', 'bucket': '不存在'}):
+        try:
+            count(segment)
+        except ValueError:
+            continue
+        raise AssertionError(segment)
+    print("✓ 参数错误时抛出ValueError")
+    
+    # 接口：按游标翻页取完全部行，与直接计算的行一致
+    with temp_upload_folders() as tmp:
+        path = os.path.join(tmp, 'rows.xlsx')
+        write_excel(raw, path)
+        client = app.test_client()
+        with open(path, 'rb') as f:
+            upload = client.post('/upload', data={'file': (f, 'rows.xlsx')}, content_type='multipart/form-data').get_json()
+        session_df = normalize_defect_frame(read_defect_excel(path)[0])
+        segment = {'type': 'status', 'value': '待修复'}
+        expected_rows = select_segment_rows(session_df, segment)
+        request = {'timestamp': upload['timestamp'], 'segment': segment, 'columns': ['事项ID', '创建时间'], 'limit': 250}
+        ids = []
+        cursor = None
+        while True:
+            response = client.post('/rows', json=dict(request, cursor=cursor))
+            data = response.get_json()
+            assert response.status_code == 200, data
+            assert data['total'] == len(expected_rows) and data['columns'] == ['事项ID', '创建时间']
+            assert len(data['rows']) <= 250 and all(len(row) == 2 for row in data['rows'])
+            ids.extend(row[0] for row in data['rows'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        assert ids == session_df['事项ID'].iloc[expected_rows].tolist()
+        assert len(data['rows'][0][1]) == len('2024-01-01 00:00:00')
+        print(f"✓ /rows 分页取出 {len(ids)} 行")
+    
+        assert client.post('/rows', json=dict(request, columns=['不存在的列'])).status_code == 400
+        assert client.post('/rows', json=dict(request, segment={'type': 'unknown'})).status_code == 400
+        assert client.post('/rows', json=dict(request, segment={'type': 'daily', 'kind': 'new'})).status_code == 400
+        assert client.post('/rows', json=dict(request, timestamp='missing')).status_code == 400
+        response = client.post('/rows', json={'timestamp': upload['timestamp'], 'segment': segment, 'limit': 1})
+        # 默认返回上传数据中的列，不包含预处理生成的列
+        columns = response.get_json()['columns']
+        assert '事项ID' in columns and '状态' in columns and '映射后状态' not in columns and '创建日' not in columns
+        print("✓ 默认列和参数校验")
+
+def wait_for_export(client, job_id, timeout=30):
+    """轮询导出任务状态直到结束，返回最终状态"""
+    import time
+    deadline = time.time() + timeout
+    while True:
+        job = client.get(f'/export/status/{job_id}').get_json()
+        if job['status'] in ('done', 'failed') or time.time() > deadline:
+            return job
+        time.sleep(0.05)
+
+def test_keyword_export_columns():
+    """测试关键字归类导出和图表明细包含上传文件中的全部列"""
+    print("\n" + "=" * 60)
+    print("测试导出数据的列")
+    print("=" * 60)
+    
+    source = pd.read_excel('sample_defect_data.xlsx')
+    with temp_upload_folders() as tmp:
+        client = app.test_client()
+        with open('sample_defect_data.xlsx', 'rb') as f:
+            upload = client.post('/upload', data={'file': (f, 'sample.xlsx')},
+                                 content_type='multipart/form-data').get_json()
+        assert upload['ingest']['columns'] == list(source.columns)
+        data = client.post('/analyze', json={'timestamp': upload['timestamp'], 'classification_mode': 'keyword',
+                                             'keywords': ['登录', '数据'], 'export_format': 'csv'}).get_json()
+        job = wait_for_export(client, data['export_job'])
+        assert job['status'] == 'done', job
+        exported = pd.read_csv(os.path.join(tmp, data['output_excel_path']))
+        print(f"✓ 导出的列: {list(exported.columns)}")
+        assert list(exported.columns) == list(source.columns) + ['关键字归类']
+        assert len(exported) == len(source)
+        assert exported['事项ID'].tolist() == source['事项ID'].tolist()
+        
+        response = client.post('/rows', json={'timestamp': upload['timestamp'], 'segment': {'type': 'status', 'value': '待修复'}})
+        assert response.get_json()['columns'] == list(source.columns)
+    print("✓ 导出和明细包含全部列")
+
+def test_delta_export():
+    """测试增量合并后重新导出的是合并后的数据"""
+    print("\n" + "=" * 60)
+    print("测试增量合并后的导出")
+    print("=" * 60)
+    
+    source = pd.read_excel('sample_defect_data.xlsx')
+    request = {'classification_mode': 'keyword', 'keywords': ['登录', '数据'], 'export_format': 'csv'}
+    with temp_upload_folders() as tmp:
+        client = app.test_client()
+        with open('sample_defect_data.xlsx', 'rb') as f:
+            upload = client.post('/upload', data={'file': (f, 'sample.xlsx')},
+                                 content_type='multipart/form-data').get_json()
+        first = client.post('/analyze', json=dict(request, timestamp=upload['timestamp'])).get_json()
+        assert wait_for_export(client, first['export_job'])['status'] == 'done'
+        assert len(pd.read_csv(os.path.join(tmp, first['output_excel_path']))) == len(source)
+        
+        # 增量文件中全部是新的事项ID
+        delta_path = os.path.join(tmp, 'delta.xlsx')
+        source.assign(事项ID=source['事项ID'] + 100000).to_excel(delta_path, index=False)
+        with open(delta_path, 'rb') as f:
+            merged = client.post('/upload/delta', data={'timestamp': upload['timestamp'], 'file': (f, 'delta.xlsx')},
+                                 content_type='multipart/form-data').get_json()
+        assert merged['total_records'] == 2 * len(source)
+        
+        second = client.post('/analyze', json=dict(request, timestamp=upload['timestamp'])).get_json()
+        assert second['output_excel_path'] != first['output_excel_path']
+        assert wait_for_export(client, second['export_job'])['status'] == 'done'
+        exported = pd.read_csv(os.path.join(tmp, second['output_excel_path']))
+        print(f"✓ 合并前导出 {len(source)} 行，合并后导出 {len(exported)} 行")
+        assert len(exported) == merged['total_records']
+    print("✓ 增量合并后导出合并后的数据")
+
+def test_concurrent_delta():
+    """测试同一会话的多个增量上传同时进行时不会丢失数据"""
+    print("\n" + "=" * 60)
+    print("测试并发增量上传")
+    print("=" * 60)
+    
+    from app import uploaded_data, filter_index_cache, merge_key_cache
+    source = pd.read_excel('sample_defect_data.xlsx')
+    with temp_upload_folders() as tmp:
+        client = app.test_client()
+        with open('sample_defect_data.xlsx', 'rb') as f:
+            upload = client.post('/upload', data={'file': (f, 'sample.xlsx')},
+                                 content_type='multipart/form-data').get_json()
+        # 每个增量文件都是不同的新事项ID
+        paths = []
+        for i in range(4):
+            path = os.path.join(tmp, f'delta_{i}.xlsx')
+            source.assign(事项ID=source['事项ID'] + 100000 * (i + 1)).to_excel(path, index=False)
+            paths.append(path)
+        
+        barrier = threading.Barrier(len(paths))
+        results = [None] * len(paths)
+        def post_delta(i):
+            with open(paths[i], 'rb') as f:
+                data = {'timestamp': upload['timestamp'], 'file': (f, f'delta_{i}.xlsx')}
+                barrier.wait()
+                results[i] = client.post('/upload/delta', data=data, content_type='multipart/form-data').get_json()
+        threads = [threading.Thread(target=post_delta, args=(i,)) for i in range(len(paths))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert all(result['delta']['inserted'] == len(source) for result in results)
+        # 各请求依次合并：合并后的行数各不相同，最后一个包含全部增量数据
+        assert sorted(result['total_records'] for result in results) == \
+            [len(source) * (i + 2) for i in range(len(paths))]
+        df = uploaded_data.get(upload['timestamp'])['dataframe']
+        assert len(df) == len(source) * (len(paths) + 1)
+        print(f"✓ {len(paths)} 个并发增量上传合并后共 {len(df)} 行")
+        
+        # 行键索引和位图索引随每次合并增量更新
+        assert merge_key_cache.get(upload['timestamp']).rows == len(df)
+        index = filter_index_cache.get(upload['timestamp'])
+        modules = get_module_list(df)
+        assert np.array_equal(index.mask(modules[:2], require_title=True), FilterIndex(df).mask(modules[:2], require_title=True))
+
+if __name__ == '__main__':
+    test_analyze()
+    test_streaming_ingest()
+    test_frame_store()
+    test_session_store()
+    test_keyword_classification()
+    test_analyze_memory()
+    test_stay_duration_buckets()
+    test_analyze_cache_key()
+    test_export_jobs()
+    test_write_export()
+    test_compact_payload()
+    test_keyword_registry()
+    test_merge_delta_frame()
+    test_read_defect_sources()
+    test_filter_index()
+    test_daily_rollup()
+    test_generate_defect_data()
+    test_stage_metrics()
+    test_lazy_launcher()
+    test_chunked_upload()
+    test_rows_drilldown()
+    test_keyword_export_columns()
+    test_delta_export()
+    test_concurrent_delta()